@@ -3,8 +3,19 @@ from .display import \
     TweetInteractiveClassifier, \
     prepare_google_credentials
 from .analysis import \
-    TweetAnalyzer,TweetMedia, TweetPhoto, TweetVideo
-from .session import TSess
+    TweetAnalyzer,TweetMedia, TweetPhoto, TweetVideo, \
+    TweetGif, LazyTweetAnalyzer, InternPool
+from .session import TSess, OfflineCacheMiss
+from .scheduler import Priority
 from .cache import Cache
+from .normalize import V2Response, normalize_v2
+from .batch import TweetBatch
+from .sidecar import SidecarIndex
+from .downloader import MediaDownloader, media_items
+from .graph import TweetGraph
+from .entityindex import EntityIndex
+from .aggregates import TweetAggregates
+from .templates import TweetTemplate
+from .ranking import rank, top_k, StreamingTopK
 
 __version__="0.0.1.7"
\ No newline at end of file
@@ -0,0 +1,251 @@
+import json
+from datetime import datetime, timezone, timedelta
+from typing import Union, List, Dict, Tuple, Iterable
+from .analysis import BaseTweetAnalyzer, scan_entities
+from .batch import V1_DATE_FORMAT, iter_cached_tweets
+from .cache import Cache
+from .snowflake import snowflake_ms
+
+"""
+Streaming aggregates of a corpus. `TweetAggregates` counts tweets per
+hashtag, user, mention, language and day as tweets arrive, so a new batch
+only updates the counts. The state is a plain dictionary: shards can be
+aggregated by different workers, saved and merged.
+
+    totals = TweetAggregates()
+    totals.append(iter_cached_tweets(session.cache))
+    session.indexes.append(totals)   # keep counting every tweet TSess stores
+    totals.top("hashtag", 10)
+
+    merged = TweetAggregates.load("shard-0.json").merge(TweetAggregates.load("shard-1.json"))
+"""
+
+# Capacity of the top-k summary of each dimension, None keeps exact counts.
+DEFAULT_DIMENSIONS: Dict[str, Union[int, None]] = {
+    "hashtag": 10000,
+    "user": 10000,
+    "mention": 10000,
+    "lang": None,
+    "day": None,
+}
+AGGREGATES_VERSION = 1
+
+
+class TopK:
+    def __init__(self, capacity: Union[int, None] = 1000):
+        """Mergeable top-k summary (batched Space-Saving).
+
+        Up to 2 * `capacity` keys are tracked; when full the least counted
+        keys are dropped down to `capacity` and `floor` becomes the highest
+        dropped count. A key seen again starts at `floor`, so every count
+        overestimates the true one by at most its error, which is never
+        more than `floor`. With `capacity` None counts are exact.
+
+        Args:
+            capacity (Union[int, None], optional): Keys guaranteed to be kept. Defaults to 1000.
+        """
+        self.capacity = capacity
+        self.counts: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        self.floor = 0
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    def add(self, key: str, n: int = 1):
+        count = self.counts.get(key)
+        if count is None:
+            self.counts[key] = self.floor + n
+            if self.floor:
+                self.errors[key] = self.floor
+            if self.capacity is not None and len(self.counts) > 2 * self.capacity:
+                self._prune()
+        else:
+            self.counts[key] = count + n
+
+    def _prune(self):
+        ranked = sorted(self.counts.items(), key=lambda item: item[1], reverse=True)
+        dropped = ranked[self.capacity:]
+        if dropped:
+            self.floor = max(self.floor, dropped[0][1])
+        self.counts = dict(ranked[:self.capacity])
+        self.errors = {key: error for key, error in self.errors.items() if key in self.counts}
+
+    def count(self, key: str) -> int:
+        """Estimated count of `key`, at most `floor` for keys not tracked."""
+        return self.counts.get(key, self.floor)
+
+    def top(self, k: int = 10) -> List[Tuple[str, int]]:
+        """The `k` highest counts, ties ordered by key."""
+        return sorted(self.counts.items(), key=lambda item: (-item[1], item[0]))[:k]
+
+    def guaranteed(self, k: int = 10) -> List[Tuple[str, int]]:
+        """Keys of `top(k)` whose lower bound (count minus error) is above
+        the next estimate, i.e. surely among the top k."""
+        ranked = self.top(k + 1)
+        threshold = max(ranked[k][1] if len(ranked) > k else 0, self.floor)
+        return [(key, count) for key, count in ranked[:k] if count - self.errors.get(key, 0) >= threshold]
+
+    def merge(self, other: "TopK") -> "TopK":
+        """Adds the counts of `other` in place. Keys missing from one summary
+        are assumed to have its floor, the merged floor is the sum of floors."""
+        for key in set(self.counts) | set(other.counts):
+            mine, theirs = key in self.counts, key in other.counts
+            self.errors[key] = (
+                (self.errors.get(key, 0) if mine else self.floor)
+                + (other.errors.get(key, 0) if theirs else other.floor))
+            self.counts[key] = self.counts.get(key, self.floor) + other.counts.get(key, other.floor)
+        self.errors = {key: error for key, error in self.errors.items() if error}
+        self.floor += other.floor
+        if self.capacity is not None and len(self.counts) > 2 * self.capacity:
+            self._prune()
+        return self
+
+    def as_dict(self) -> dict:
+        return {"capacity": self.capacity, "floor": self.floor, "counts": self.counts, "errors": self.errors}
+
+    @staticmethod
+    def from_dict(state: dict) -> "TopK":
+        summary = TopK(state["capacity"])
+        summary.floor = state["floor"]
+        summary.counts = dict(state["counts"])
+        summary.errors = dict(state.get("errors", {}))
+        return summary
+
+
+class TweetAggregates:
+    def __init__(
+        self, dimensions: Union[Dict[str, Union[int, None]], None] = None,
+        utc_offset_hours: float = 0
+    ):
+        """Tweet counts per dimension key plus corpus totals.
+
+        Tweets are counted each time they are added: shards must not share
+        tweets, and re-fetched tweets fed through `TSess.indexes` count again.
+
+        Args:
+            dimensions (Union[Dict[str, Union[int, None]], None], optional): Capacity of
+                each dimension, see DEFAULT_DIMENSIONS for the names. Defaults to all of them.
+            utc_offset_hours (float, optional): Offset of the local time used for
+                the "day" dimension, e.g. -4 for Puerto Rico. Defaults to 0.
+        """
+        dimensions = DEFAULT_DIMENSIONS if dimensions is None else dimensions
+        unknown = set(dimensions) - set(DEFAULT_DIMENSIONS)
+        assert not unknown, f"Unknown dimensions: {unknown}"
+        self.utc_offset_hours = utc_offset_hours
+        self.dimensions: Dict[str, TopK] = {name: TopK(capacity) for name, capacity in dimensions.items()}
+        self.totals: Dict[str, int] = {"tweets": 0, "retweets": 0, "quotes": 0, "with_media": 0}
+
+    def __len__(self) -> int:
+        return self.totals["tweets"]
+
+    def _day(self, data: dict) -> Union[str, None]:
+        ms = snowflake_ms(data.get("id_str", data.get("id", 0)))
+        if ms is not None:
+            created = datetime.fromtimestamp(ms / 1000, tz=timezone.utc)
+        elif data.get("created_at"):
+            try:
+                created = datetime.strptime(data["created_at"], V1_DATE_FORMAT).replace(tzinfo=timezone.utc)
+            except ValueError:
+                return None
+        else:
+            return None
+        return (created + timedelta(hours=self.utc_offset_hours)).strftime("%Y-%m-%d")
+
+    def keys(self, data: dict) -> Dict[str, List[str]]:
+        """Dimension keys of a tweet in the v1.1 shape. Hashtags and mentions
+        are lower case and counted once per tweet."""
+        entities = scan_entities(data, recursive=False)
+        user = data.get("user") or {}
+        lang = data.get("lang", "und")
+        day = self._day(data) if "day" in self.dimensions else None
+        return {
+            "hashtag": sorted({"#" + h.get("text", "").lower() for _, h in entities.hashtags}),
+            "user": [str(user.get("id_str", user.get("id")))] if user else [],
+            "mention": sorted({"@" + m.get("screen_name", "").lower() for _, m in entities.user_mentions}),
+            "lang": [lang if type(lang) is str else "und"],
+            "day": [day] if day is not None else [],
+        }
+
+    def update(self, tweet: Union[BaseTweetAnalyzer, dict]):
+        """Counts one tweet (analyzer or data dictionary in the v1.1 shape)."""
+        data = tweet.data if isinstance(tweet, BaseTweetAnalyzer) else tweet
+        self.totals["tweets"] += 1
+        if data.get("retweeted_status") is not None:
+            self.totals["retweets"] += 1
+        elif data.get("quoted_status") is not None:
+            self.totals["quotes"] += 1
+        entities = data.get("extended_entities") or data.get("entities") or {}
+        if entities.get("media"):
+            self.totals["with_media"] += 1
+        for name, keys in self.keys(data).items():
+            summary = self.dimensions.get(name)
+            if summary is not None:
+                for key in keys:
+                    summary.add(key)
+
+    def append(self, tweets: Iterable[Union[BaseTweetAnalyzer, dict]]) -> int:
+        """Counts many tweets. Same interface as the TSess indexes.
+
+        Returns:
+            int: Tweets counted.
+        """
+        n = 0
+        for tweet in tweets:
+            self.update(tweet)
+            n += 1
+        return n
+
+    @staticmethod
+    def from_cache(cache: Cache, **kwargs) -> "TweetAggregates":
+        """Aggregates of every tweet stored in a cache, see `__init__` for kwargs."""
+        aggregates = TweetAggregates(**kwargs)
+        aggregates.append(iter_cached_tweets(cache))
+        return aggregates
+
+    def merge(self, other: "TweetAggregates") -> "TweetAggregates":
+        """Adds the partial state of another shard in place."""
+        assert self.utc_offset_hours == other.utc_offset_hours, "Day buckets use different offsets."
+        for name, summary in other.dimensions.items():
+            if name in self.dimensions:
+                self.dimensions[name].merge(summary)
+            else:
+                self.dimensions[name] = TopK.from_dict(summary.as_dict())
+        for name, value in other.totals.items():
+            self.totals[name] = self.totals.get(name, 0) + value
+        return self
+
+    def top(self, dimension: str, k: int = 10) -> List[Tuple[str, int]]:
+        return self.dimensions[dimension].top(k)
+
+    def count(self, dimension: str, key: str) -> int:
+        return self.dimensions[dimension].count(key)
+
+    def counts(self, dimension: str) -> Dict[str, int]:
+        """Every tracked count of a dimension, exact when its capacity is None."""
+        return dict(self.dimensions[dimension].counts)
+
+    def as_dict(self) -> dict:
+        return {
+            "version": AGGREGATES_VERSION,
+            "utc_offset_hours": self.utc_offset_hours,
+            "totals": self.totals,
+            "dimensions": {name: summary.as_dict() for name, summary in self.dimensions.items()},
+        }
+
+    @staticmethod
+    def from_dict(state: dict) -> "TweetAggregates":
+        assert state.get("version") == AGGREGATES_VERSION, f"Unsupported aggregates version {state.get('version')}."
+        aggregates = TweetAggregates({}, state["utc_offset_hours"])
+        aggregates.totals = dict(state["totals"])
+        aggregates.dimensions = {name: TopK.from_dict(s) for name, s in state["dimensions"].items()}
+        return aggregates
+
+    def save(self, filename: str):
+        with open(filename, "w") as handler:
+            json.dump(self.as_dict(), handler)
+
+    @staticmethod
+    def load(filename: str) -> "TweetAggregates":
+        with open(filename, "r") as handler:
+            return TweetAggregates.from_dict(json.load(handler))
@@ -1,11 +1,23 @@
-import json
-from typing import Union, List
+import json, sys
+import warnings
+from . import jsonlib
+from bisect import bisect_left
+from typing import Union, List, Dict, Tuple
 from logging import log, warn, error, exception
 
 
 class TweetMedia:
-    def __init__(self, data: dict, source_tweet=None):
-        self.data = data
+    __slots__ = ("data", "id", "source_tweet", "type", "media_url", "expanded_url")
+
+    def __init__(self, data: dict, source_tweet=None, keep_data: bool = True):
+        """Media entity of a tweet. Fields are extracted once at construction.
+
+        Args:
+            data (dict): Media entity from `entities` or `extended_entities`.
+            source_tweet (optional): ID of the tweet the media belongs to. Defaults to None.
+            keep_data (bool, optional): Keep a reference to `data` at `self.data`,
+                when False it is set to None to save memory. Defaults to True.
+        """
         try:
             self.id: str = data["id_str"]
         except:
@@ -14,59 +26,90 @@ class TweetMedia:
             except:
                 raise
         self.source_tweet: Union[str, None] = source_tweet
+        self.type: str = data["type"]
+        self.media_url: Union[str, None] = data.get("media_url_https", None)
+        self.expanded_url: Union[str, None] = data.get("expanded_url", data.get("url", None))
+        self.data: Union[dict, None] = data if keep_data else None
 
     def mtype(self) -> str:
-        return self.data["type"]
+        return self.type
 
     def url(self) -> str:
-        return self.data["media_url_https"]
+        return self.media_url
 
     def __str__(self):
-        return self.mtype().upper() + ": " + self.url()
+        return self.mtype().upper() + ": " + str(self.url())
 
 
 class TweetPhoto(TweetMedia):
-    def __init__(self, data: dict, source_tweet=None):
-        super().__init__(data, source_tweet=source_tweet)
+    __slots__ = ("sizes",)
+
+    def __init__(self, data: dict, source_tweet=None, keep_data: bool = True):
+        super().__init__(data, source_tweet=source_tweet, keep_data=keep_data)
         assert self.mtype().lower() == "photo", "Not a photo media."
+        self.sizes = frozenset(data.get("sizes", {}).keys())
 
     def thumbnailURL(self):
-        if "thumb" in self.data["sizes"].keys():
+        if "thumb" in self.sizes:
             return self.url() + ":thumb"
         else:
             return self.url()
 
     def largeURL(self):
-        if "large" in self.data["sizes"].keys():
+        if "large" in self.sizes:
             return self.url() + ":large"
         else:
             return self.url()
 
     def mediumURL(self):
-        if "medium" in self.data["sizes"].keys():
+        if "medium" in self.sizes:
             return self.url() + ":medium"
         else:
             return self.url()
 
     def smallURL(self):
-        if "small" in self.data["sizes"].keys():
+        if "small" in self.sizes:
             return self.url() + ":small"
         else:
             return self.url()
 
 
 class TweetVideo(TweetMedia):
-    def __init__(self, data: dict, source_tweet=None):
-        super().__init__(data, source_tweet=source_tweet)
-        assert self.mtype().lower() == "video", "Not a video media."
-    
-    def getBitrates(self)->List[int]:
-        bitrates = []
-        for variant in self.getVariants():
-            bitrates.append(variant["bitrate"])
-        return bitrates
-    
-    def thumbnailUrl(self, size:str="thumb") -> Union[str, None]:       
+    __slots__ = (
+        "variants", "bitrates", "_order", "_additional_media_info",
+        "_video_info", "_embeddable",
+    )
+
+    def __init__(self, data: dict, source_tweet=None, keep_data: bool = True):
+        super().__init__(data, source_tweet=source_tweet, keep_data=keep_data)
+        assert self.mtype().lower() in ["video", "animated_gif"], "Not a video media."
+        self._additional_media_info: Union[dict, None] = data.get("additional_media_info", None)
+        self._video_info: Union[dict, None] = data.get("video_info", None)
+        try:
+            self.variants: List[dict] = self._video_info["variants"]
+        except:
+            self.variants = []
+        # Positions of the variants with a bitrate sorted by (bitrate, position)
+        # and their bitrates, for bisect lookups.
+        ranked = sorted(
+            (int(v["bitrate"]), position)
+            for position, v in enumerate(self.variants) if "bitrate" in v
+        )
+        self.bitrates: List[int] = [bitrate for bitrate, _ in ranked]
+        self._order: List[int] = [position for _, position in ranked]
+        embeddable = False
+        if self._additional_media_info:
+            # In theory if additional_media_info is present then it is never embeddable.
+            embeddable: bool = self._additional_media_info.get("embeddable", False)
+        elif self._video_info:
+            embeddable = True
+        self._embeddable = embeddable
+
+    def getBitrates(self) -> List[int]:
+        """Bitrates of the variants that have one, in ascending order."""
+        return list(self.bitrates)
+
+    def thumbnailUrl(self, size: str = "thumb") -> Union[str, None]:
         """Videos and Gif use media_url_https to store thumbnail URL.
 
         Args:
@@ -75,97 +118,375 @@ class TweetVideo(TweetMedia):
         Returns:
             Union[str, None]: URL to video/gif thumbnail.
         """
-        try:
-            assert size in ["thumb", "small", "medium", "large"], "Not a valid size"
-        except:
+        if size not in ["thumb", "small", "medium", "large"]:
             size = "thumb"
-        
-        url: Union[str, None]= self.data.get("media_url_https", None)
+        url = self.media_url
         if url:
             url = url + ":" + size
         return url
 
-    def getVariants(self):
-        try:
-            return self.data["video_info"]["variants"]
-        except:
-            return []
+    def getVariants(self) -> List[dict]:
+        return self.variants
 
     def additional_media_info(self) -> Union[dict, None]:
-        return self.data.get("additional_media_info", None)
-    
+        return self._additional_media_info
+
     def video_info(self) -> Union[dict, None]:
-        return self.data.get("video_info", None)
-    
+        return self._video_info
+
     def embeddable(self) -> bool:
-        embeddable = False
-        if self.additional_media_info():
-            # In theory if additional_media_info is present then it is never embeddable.
-            embeddable: bool = self.additional_media_info().get("embeddable", False)
-        elif self.video_info():
-            embeddable = True
-        return embeddable
+        return self._embeddable
 
     def url(self, bitrate=832000):
-        if self.embeddable():
+        if self._embeddable:
             # Return the video that closest match to the desired bitrate
             return self.getBestVariant(bitrate)['url']
         else:
             # If not embeddable then video can only be seen through Twitter.
-            return self.data.get(
-                "expanded_url",
-                self.data.get("url")
-            )
+            return self.expanded_url
 
     def getBestVariant(self, bitrate=832000):
-        from sys import maxsize as upperbound
-        closest = None
-        distance = upperbound
-        for v in self.getVariants():
-            if "bitrate" in v.keys():
-                if int(v["bitrate"]) == bitrate:
-                    return v
-                elif distance > abs(int(v["bitrate"])-bitrate):
-                    distance = abs(int(v["bitrate"])-bitrate)
-                    closest = v
-            else:
-                continue
-        if closest is not None:
-            # Return Closest
-            return closest
+        """Variant with the bitrate closest to `bitrate`. On ties the variant
+        listed first wins. Without bitrates the first variant is returned."""
+        bitrates = self.bitrates
+        if bitrates:
+            i = bisect_left(bitrates, bitrate)
+            candidates = [i] if i < len(bitrates) else []
+            if i > 0:
+                # First listed variant with the closest lower bitrate.
+                candidates.append(bisect_left(bitrates, bitrates[i - 1]))
+            _, position = min((abs(bitrates[c] - bitrate), self._order[c]) for c in candidates)
+            return self.variants[position]
         # Return first in list
-        return self.getVariants()[0]
+        return self.variants[0]
 
 
 # TODO: Create custom methods for Animated Gif and use in other classes
 # READ: https://developer.twitter.com/en/docs/twitter-api/v1/data-dictionary/object-model/extended-entities
 class TweetGif(TweetVideo):
-    def __init__(self, data: dict, source_tweet=None):
-        super().__init__(data, source_tweet=source_tweet)
+    __slots__ = ()
+
+    def __init__(self, data: dict, source_tweet=None, keep_data: bool = True):
+        super().__init__(data, source_tweet=source_tweet, keep_data=keep_data)
         assert self.mtype().lower() == "animated_gif", "Not an animated gif media."
 
-class TweetAnalyzer:
-    def __init__(self, data: Union[str, dict], localMedia: bool = True):
-        """This class facilitates accessing values from a tweet data dictionary.
+
+def build_media(media: dict, source_tweet=None, keep_data: bool = True) -> TweetMedia:
+    """Creates the `TweetMedia` subclass matching the type of a media entity."""
+    mtype = media["type"].lower()
+    if mtype == "photo":
+        return TweetPhoto(media, source_tweet, keep_data)
+    elif mtype == "video":
+        return TweetVideo(media, source_tweet, keep_data)
+    elif mtype == "animated_gif":
+        return TweetGif(media, source_tweet, keep_data)
+    return TweetMedia(media, source_tweet, keep_data)
+
+
+class InternPool:
+    def __init__(self, keep_media_data: bool = True):
+        """Corpus level registry of embedded tweets, users and media, keyed by
+        their IDs. Pass the same pool to every analyzer of a corpus so the
+        retweeted/quoted originals, their media objects and user dictionaries
+        are built and kept once, with their ID and name strings interned.
+
+        The first copy of an entity is kept: counts of embedded tweets seen
+        later (snapshots taken at another time) are not reflected. The
+        `user`, `retweeted_status` and `quoted_status` values of analyzed
+        data dictionaries are replaced with the shared copies.
 
         Args:
-            data (Union[str, dict]): Tweet Data in dictionary or JSON format.
-            localMedia (bool, optional): Include media from reference tweets as local. Defaults to True.
+            keep_media_data (bool, optional): Keep the media entity dictionaries
+                in the media objects (see TweetMedia). Defaults to True.
         """
-        self.data = data
-        self.onlyLocalMedia = localMedia
-        if type(self.data) is str:
-            self.data = json.loads(self.data)
-        self.extractMeta()
+        self.keep_media_data = keep_media_data
+        self.tweets: Dict[Tuple[type, str, bool], "BaseTweetAnalyzer"] = {}
+        self.users: Dict[str, dict] = {}
+        self.media_objects: Dict[Tuple[str, str], TweetMedia] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def string(value):
+        return sys.intern(value) if type(value) is str else value
+
+    def user(self, user: dict) -> dict:
+        """Shared copy of a user dictionary."""
+        user_id = str(user.get("id_str", user.get("id")))
+        shared = self.users.get(user_id, None)
+        if shared is None:
+            for key in ("id_str", "screen_name", "name"):
+                if key in user:
+                    user[key] = InternPool.string(user[key])
+            shared = self.users[user_id] = user
+        return shared
+
+    def media(self, media: dict, source_tweet=None) -> TweetMedia:
+        """Shared media object of a media entity, see `build_media`."""
+        key = (str(media.get("id_str", media.get("id"))), source_tweet)
+        shared = self.media_objects.get(key, None)
+        if shared is None:
+            shared = self.media_objects[key] = build_media(media, source_tweet, self.keep_media_data)
+        return shared
+
+    def analyzer(self, data: dict, localMedia: bool = True, cls=None) -> "BaseTweetAnalyzer":
+        """Shared analyzer of an embedded tweet.
+
+        Args:
+            data (dict): Tweet data dictionary.
+            localMedia (bool, optional): Same meaning as for TweetAnalyzer. Defaults to True.
+            cls (optional): Analyzer class. Defaults to TweetAnalyzer.
+        """
+        if cls is None:
+            cls = TweetAnalyzer
+        key = (cls, str(data.get("id_str", data.get("id"))), localMedia)
+        shared = self.tweets.get(key, None)
+        if shared is None:
+            self.misses += 1
+            shared = self.tweets[key] = cls(data, localMedia, pool=self)
+        else:
+            self.hits += 1
+        return shared
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "tweets": len(self.tweets),
+            "users": len(self.users),
+            "media": len(self.media_objects),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def clear(self):
+        self.tweets = {}
+        self.users = {}
+        self.media_objects = {}
+        self.hits = 0
+        self.misses = 0
+
+
+class TweetEntities:
+    def __init__(self):
+        """Media, hashtags, user mentions and URLs of a tweet and the tweets it
+        retweets or quotes. Every list holds (source tweet ID, entity) pairs, the
+        entities of the tweet itself first. `local_<kind>` counts those.
+        """
+        self.media: List[Tuple[str, dict]] = []
+        self.hashtags: List[Tuple[str, dict]] = []
+        self.user_mentions: List[Tuple[str, dict]] = []
+        self.urls: List[Tuple[str, dict]] = []
+        self.local_media = 0
+        self.local_hashtags = 0
+        self.local_user_mentions = 0
+        self.local_urls = 0
+
+
+def scan_entities(data: dict, recursive: bool = True) -> TweetEntities:
+    """Collects the entities of a tweet by walking its entity dictionaries once,
+    following `retweeted_status` (or `quoted_status` when it is not a retweet)
+    if `recursive`. Unlike searching `str(data)` for media keys, tweet text
+    never produces matches.
+
+    Args:
+        data (dict): Tweet data dictionary.
+        recursive (bool, optional): Include the retweeted or quoted tweets. Defaults to True.
+
+    Returns:
+        TweetEntities: Entities found, local entities first.
+    """
+    found = TweetEntities()
+    tweet = data
+    local = True
+    while tweet is not None:
+        source = tweet.get("id_str", tweet.get("id"))
+        entities: dict = tweet.get("entities") or {}
+        # Priority to extended_entities that has the correct media type
+        # READ: https://developer.twitter.com/en/docs/twitter-api/v1/data-dictionary/object-model/extended-entities
+        extended: dict = tweet.get("extended_entities") or {}
+        media = extended.get("media") if "media" in extended else entities.get("media")
+        for m in media or []:
+            found.media.append((source, m))
+        for h in entities.get("hashtags") or []:
+            found.hashtags.append((source, h))
+        for u in entities.get("user_mentions") or []:
+            found.user_mentions.append((source, u))
+        for u in entities.get("urls") or []:
+            found.urls.append((source, u))
+        if local:
+            found.local_media = len(found.media)
+            found.local_hashtags = len(found.hashtags)
+            found.local_user_mentions = len(found.user_mentions)
+            found.local_urls = len(found.urls)
+            local = False
+        if not recursive:
+            break
+        nested = tweet.get("retweeted_status", None)
+        if nested is None:
+            nested = tweet.get("quoted_status", None)
+        tweet = nested
+    return found
+
+
+class BaseTweetAnalyzer:
+    """Accessors shared by `TweetAnalyzer` and `LazyTweetAnalyzer`. Subclasses
+    provide `data` and the extracted attributes (`id`, `user_id`, `isRetweet`, ...).
+    """
+    __slots__ = ()
 
     def entities(self) -> dict:
         return self.data.get("entities", {})
-    
+
     def extended_entities(self) -> dict:
         return self.data.get('extended_entities', {})
-    
+
+    def isBasedOn(self) -> str:
+        """Returns the Tweet ID of the tweet it references.
+        For retweets returns the retweeted tweet even if 
+        another tweet is quoted inside the original.
+
+        Returns:
+            str: Tweet ID of original tweet
+        """
+        isBasedOn = ""
+        if self.isRetweet:
+            isBasedOn = self.retweeted_status.id
+        elif self.isQuote:
+            isBasedOn = self.quoted_status.id
+        return isBasedOn
+
+    def language(self) -> Union[str, None]:
+        """Extracts language suggested by Twitter.
+        A value of "und" is Twitter default value for undetermined language.
+
+        Returns:
+            Union[str, None]: [description]
+        """
+        # Use default "und" used by Twitter
+        lang = self.data.get("lang", "und")
+        return lang if lang != "und" and type(lang) is str else None
+
+    def text(self) -> str:
+        """Extracts the text of the tweet. Returns short version of full version missing.
+
+        Returns:
+            str: Text of the tweet (short version if long not available)
+        """
+        try:
+            return self.data["full_text"]
+        except Exception as _:
+            return self.data.get("text", "")
+
+    def url(self) -> str:
+        """Creates a URL to the tweet using only the tweet id.
+
+        Returns:
+            str: URL using template f"https://twitter.com/any_user/status/{self.id}"
+        """
+        return f"https://twitter.com/any_user/status/{self.id}"
+
+    def urlByIDs(self) -> str:
+        """Creates a URL to the tweet using both the tweet id and user id.
+
+        Returns:
+            str: URL using template f"https://twitter.com/{self.user_id}/status/{self.id}"
+        """
+        return f"https://twitter.com/{self.user_id}/status/{self.id}"
+
+    def user_mentions(self) -> List[dict]:
+        """Extracts user mentions from the data dictionary.
+
+        Returns:
+            List[dict]: User mentions in their original format.
+        """
+        entities: dict = self.data.get("entities", {})
+        return entities.get("user_mentions", [])
+
     def hashtags(self) -> List[dict]:
-        return self.entities().get("hashtags", [])
+        """Extracts hashtags from the data dictionary.
+
+        Returns:
+            List[dict]: Hashtags in their original format.
+        """
+        entities: dict = self.data.get("entities", {})
+        return entities.get("hashtags", [])
+
+    def __str__(self) -> str:
+        """Method to allow a print out of the tweet.
+
+        Returns:
+            str: Print out of the tweet with sum metadata.
+        """
+        output: str = f"ID: {self.id}\nText: {self.text()}\nURL: {self.urlByIDs()}\nRetweet:{str(self.isRetweet)}\nOriginal Tweet URL: {self.urlOriginalTweet}\nQuotes:{str(self.isQuote)}\nQuoted Tweet URL: {self.urlQuotedTweet}\nHas Media={str(self.hasMedia)}\nHas Local Media={str(self.hasLocalMedia)}\nMedia={str([str(m) for m in self.media])}"
+        return output
+
+    @staticmethod
+    def compare_by_favorite_count(set: bool = True):
+        """Deprecated: the comparison metric is shared by every thread, use
+        the `ranking` module (`rank`, `top_k`) with an explicit metric."""
+        warnings.warn(
+            "compare_by_favorite_count is deprecated, use tweet_requester.ranking with metric='favorite_count'.",
+            DeprecationWarning, stacklevel=2)
+        TweetAnalyzer._favorite_quoteCount = set
+
+    @staticmethod
+    def compare_by_retweet_count(set: bool = True):
+        """Deprecated: see `compare_by_favorite_count`."""
+        warnings.warn(
+            "compare_by_retweet_count is deprecated, use tweet_requester.ranking with metric='retweet_count'.",
+            DeprecationWarning, stacklevel=2)
+        TweetAnalyzer._favorite_quoteCount = not set
+
+    def _effective_size(self) -> int:
+        """Helper function for comparisons.
+        The class attribute `TweetAnalyzer._favorite_quoteCount` 
+        controls if retweetCount or favoriteCount is used.
+
+        Returns:
+            int: 0, retweetCount or quoteCount; -1 when the count is missing.
+        """
+        if self.isRetweet:
+            return 0
+        if getattr(TweetAnalyzer, "_favorite_quoteCount", False):
+            count = self.favoriteCount
+        else:
+            count = self.retweetCount
+        return count if count is not None else -1
+
+    def __lt__(self, other: "TweetAnalyzer") -> bool:
+        return self._effective_size() < other._effective_size()
+
+    def __le__(self, other: "TweetAnalyzer") -> bool:
+        return self._effective_size() == other._effective_size() or self < other
+
+    def __gt__(self, other: "TweetAnalyzer") -> bool:
+        return not self.__le__(other)
+
+    def __ge__(self, other: "TweetAnalyzer"):
+        return not self.__lt__(other)
+
+    def __eq__(self, other: "TweetAnalyzer"):
+        return self._effective_size() == other._effective_size()
+
+
+class TweetAnalyzer(BaseTweetAnalyzer):
+    def __init__(
+        self, data: Union[str, dict], localMedia: bool = True,
+        pool: Union[InternPool, None] = None
+    ):
+        """This class facilitates accessing values from a tweet data dictionary.
+
+        Args:
+            data (Union[str, dict]): Tweet Data in dictionary or JSON format.
+            localMedia (bool, optional): Include media from reference tweets as local. Defaults to True.
+            pool (Union[InternPool, None], optional): Pool sharing embedded tweets,
+                users and media across a corpus. Defaults to None.
+        """
+        self.data = data
+        self.onlyLocalMedia = localMedia
+        self.pool = pool
+        if type(self.data) in (str, bytes):
+            self.data = jsonlib.loads(self.data)
+        self.extractMeta()
 
     def extractMeta(self):
         """Upon receiving the data dictionary extracts multiple facts from it.
@@ -177,6 +498,9 @@ class TweetAnalyzer:
                 self.id = self.data["id"]
             except:
                 raise
+        if self.pool is not None:
+            self.id = self.pool.string(self.id)
+            self.data['user'] = self.pool.user(self.data['user'])
         # self.user_id = self.data['user']['id_str']
         try:
             self.user_screen_name = self.data['user']["screen_name"]
@@ -217,132 +541,25 @@ class TweetAnalyzer:
             except Exception as err:
                 exception(err)
                 
-        if not self.onlyLocalMedia:
-            self._hasMedia()
-        self._hasLocalMedia()
-
-    def isBasedOn(self) -> str:
-        """Returns the Tweet ID of the tweet it references.
-        For retweets returns the retweeted tweet even if 
-        another tweet is quoted inside the original.
-
-        Returns:
-            str: Tweet ID of original tweet
-        """
-        isBasedOn = ""
-        if self.isRetweet:
-            isBasedOn = self.retweeted_status.id
-        elif self.isQuote:
-            isBasedOn = self.quoted_status.id
-        return isBasedOn
-
-    def language(self) -> Union[str, None]:
-        """Extracts language suggested by Twitter.
-        A value of "und" is Twitter default value for undetermined language.
-
-        Returns:
-            Union[str, None]: [description]
-        """
-        # Use default "und" used by Twitter
-        lang = self.data.get("lang", "und")
-        return lang if lang != "und" and type(lang) is str else None
-
-    def _hasMedia(self):
-        """Part of initialization. Sets the value for self.hasMedia and
-        calls self.extractMedia() method.
-        """
-        data_str = str(self.data)
-        media_keys = ['media_url_https', 'media_url' ]
-        self.hasMedia = any(map(data_str.__contains__, media_keys))
-        self.extractMedia()
-            
-
-    def text(self) -> str:
-        """Extracts the text of the tweet. Returns short version of full version missing.
-
-        Returns:
-            str: Text of the tweet (short version if long not available)
-        """
-        try:
-            return self.data["full_text"]
-        except Exception as _:
-            return self.data.get("text", "")
-
-    def _hasLocalMedia(self):
-        """Part of initialization. Sets the value for self.hasLocalMedia,
-        sets self.hasMedia if not previously set and calls self.extractMedia() method.
-        """
-        entities_str = str(self.entities()) + str(self.extended_entities())
-        media_keys = ['media_url_https', 'media_url']
-        self.hasLocalMedia = any(map(entities_str.__contains__, media_keys))
-        # If hasMedia has not been set before
-        if not hasattr(self, "hasMedia"):
-            self.hasMedia = self.hasLocalMedia
-        self.extractMedia(recursive=False)
+        self.extractMedia(recursive=not self.onlyLocalMedia)
 
     def extractMedia(self, recursive: bool = True):
-        """Recursively or locally appends `TweetMedia`, `TweetPhoto` and `TweetVideo`
-        objects into a list stored at `self.media`.
+        """Sets `self.media`, `self.localMedia`, `self.hasMedia`, `self.hasLocalMedia`
+        and `self.tweetEntities` from a single walk of the entities.
 
         Args:
             recursive (bool, optional): boolean that determines if media lookup should 
                 dive into the quoted and retweeted tweet statuses. Defaults to True.
         """
-        media = []
-        # Priority to extended_entities that has the correct media type
-        # READ: https://developer.twitter.com/en/docs/twitter-api/v1/data-dictionary/object-model/extended-entities
-        if 'media' in self.extended_entities().keys():
-            for m in self.extended_entities().get('media', []):
-                if m["type"].lower() == "photo":
-                    media.append(TweetPhoto(m, self.id))
-                elif m["type"].lower() == "video":
-                    media.append(TweetVideo(m, self.id))
-                elif m["type"].lower() == "animated_gif":
-                    media.append(TweetGif(m, self.id))
-                else:
-                    media.append(TweetMedia(m, self.id))
-        elif 'media' in self.entities().keys():
-            # If media found in extended_entities then this values will be repeated.
-            for m in self.entities().get('media', []):
-                if m["type"].lower() == "photo":
-                    media.append(TweetPhoto(m, self.id))
-                elif m["type"].lower() == "video":
-                    media.append(TweetVideo(m, self.id))
-                elif m["type"].lower() == "animated_gif":
-                    media.append(TweetGif(m, self.id))
-                else:
-                    media.append(TweetMedia(m, self.id))
-
-        # Keep a shallow copy of the media list as the local media
-        self.localMedia: List[Union[TweetMedia, TweetVideo, TweetPhoto, TweetGif]] = media.copy()
-        
-        # If recursive process the internal media of retweeted or quoted status
-        if recursive:
-            if getattr(self, "retweeted_status", False):
-                if self.retweeted_status.hasMedia:
-                    media = media + self.retweeted_status.media
-            if getattr(self, "quoted_status", False):
-                if self.quoted_status.hasMedia:
-                    media = media + self.quoted_status.media
-            self.media: List[Union[TweetMedia, TweetVideo, TweetPhoto, TweetGif]] = media
-        else:
-            self.media = self.localMedia
-
-    def url(self) -> str:
-        """Creates a URL to the tweet using only the tweet id.
-
-        Returns:
-            str: URL using template f"https://twitter.com/any_user/status/{self.id}"
-        """
-        return f"https://twitter.com/any_user/status/{self.id}"
-
-    def urlByIDs(self) -> str:
-        """Creates a URL to the tweet using both the tweet id and user id.
-
-        Returns:
-            str: URL using template f"https://twitter.com/{self.user_id}/status/{self.id}"
-        """
-        return f"https://twitter.com/{self.user_id}/status/{self.id}"
+        self.tweetEntities = scan_entities(self.data, recursive)
+        build = build_media if self.pool is None else self.pool.media
+        self.media: List[Union[TweetMedia, TweetVideo, TweetPhoto, TweetGif]] = [
+            build(m, source) for source, m in self.tweetEntities.media
+        ]
+        self.localMedia: List[Union[TweetMedia, TweetVideo, TweetPhoto, TweetGif]] = \
+            self.media[:self.tweetEntities.local_media]
+        self.hasLocalMedia = len(self.localMedia) > 0
+        self.hasMedia = len(self.media) > 0
 
     def _urlQuotedTweet(self) -> str:
         """Helper method for self._isQuote method.
@@ -370,6 +587,16 @@ class TweetAnalyzer:
             return f"https://twitter.com/{self.ot_user_id}/status/{self.ot_id}"
         return "Not applicable"
 
+    def _nested(self, key: str) -> "TweetAnalyzer":
+        """Analyzer of the embedded tweet at `self.data[key]`, shared through
+        the pool when there is one."""
+        if self.pool is None:
+            return TweetAnalyzer(self.data[key], self.onlyLocalMedia)
+        nested = self.pool.analyzer(self.data[key], self.onlyLocalMedia)
+        # Keep a single copy of the embedded tweet data.
+        self.data[key] = nested.data
+        return nested
+
     def _isRetweet(self):
         """Part of initialization, Sets the `isRetweet` and urlOriginalTweet
         attributes.
@@ -382,8 +609,7 @@ class TweetAnalyzer:
         # If a tweet is a retweet it is not the quoting tweet.
         if "retweeted_status" in self.data.keys():
             if self.data["retweeted_status"] is not None:
-                self.retweeted_status = TweetAnalyzer(
-                    self.data["retweeted_status"], self.onlyLocalMedia)
+                self.retweeted_status = self._nested("retweeted_status")
                 self.urlOriginalTweet = self.retweeted_status.urlByIDs()
                 value = True
         self.isRetweet = value
@@ -398,73 +624,173 @@ class TweetAnalyzer:
         if not self.isRetweet:
             if "quoted_status" in self.data.keys():
                 if self.data["quoted_status"] is not None:
-                    self.quoted_status = TweetAnalyzer(
-                        self.data["quoted_status"], self.onlyLocalMedia)
+                    self.quoted_status = self._nested("quoted_status")
                     self.urlQuotedTweet = self.quoted_status.urlByIDs()
                     value = True
         self.isQuote = value
 
-    def user_mentions(self) -> List[dict]:
-        """Extracts user mentions from the data dictionary.
 
-        Returns:
-            List[dict]: User mentions in their original format.
-        """
-        entities: dict = self.data.get("entities", {})
-        return entities.get("user_mentions", [])
+class _lazy:
+    """Attribute computed on first access and stored in the slot `_<name>`."""
 
-    def hashtags(self) -> List[dict]:
-        """Extracts hashtags from the data dictionary.
+    def __init__(self, compute):
+        self.compute = compute
+        self.slot = "_" + compute.__name__
+        self.__doc__ = compute.__doc__
 
-        Returns:
-            List[dict]: Hashtags in their original format.
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        try:
+            return getattr(instance, self.slot)
+        except AttributeError:
+            value = self.compute(instance)
+            setattr(instance, self.slot, value)
+            return value
+
+    def __set__(self, instance, value):
+        setattr(instance, self.slot, value)
+
+
+class LazyTweetAnalyzer(BaseTweetAnalyzer):
+    __slots__ = (
+        "data", "onlyLocalMedia", "pool", "_id", "_user_id", "_user_screen_name",
+        "_retweeted_status", "_quoted_status", "_isRetweet", "_isQuote",
+        "_urlOriginalTweet", "_urlQuotedTweet", "_retweetCount", "_quoteCount",
+        "_favoriteCount", "_hasMedia", "_hasLocalMedia", "_media", "_localMedia",
+        "_tweetEntities",
+    )
+
+    def __init__(
+        self, data: Union[str, bytes, dict], localMedia: bool = True,
+        pool: Union[InternPool, None] = None
+    ):
+        """Same interface as `TweetAnalyzer`, but only stores the data dictionary.
+        Every attribute is extracted the first time it is accessed and kept, and
+        `__slots__` removes the per-instance `__dict__`. Meant for filtering large
+        amounts of tweets where most attributes are never read.
+
+        Args:
+            data (Union[str, bytes, dict]): Tweet Data in dictionary or JSON format.
+            localMedia (bool, optional): Include media from reference tweets as local. Defaults to True.
+            pool (Union[InternPool, None], optional): Pool sharing embedded tweets,
+                users and media across a corpus. Defaults to None.
         """
-        entities: dict = self.data.get("entities", {})
-        return entities.get("hashtags", [])
+        if type(data) in (str, bytes):
+            data = jsonlib.loads(data)
+        if pool is not None and data.get("user", None) is not None:
+            data["user"] = pool.user(data["user"])
+        self.data: dict = data
+        self.onlyLocalMedia = localMedia
+        self.pool = pool
 
-    def __str__(self) -> str:
-        """Method to allow a print out of the tweet.
+    @_lazy
+    def id(self) -> str:
+        try:
+            return self.data["id_str"]
+        except KeyError:
+            return self.data["id"]
 
-        Returns:
-            str: Print out of the tweet with sum metadata.
-        """
-        output: str = f"ID: {self.id}\nText: {self.text()}\nURL: {self.urlByIDs()}\nRetweet:{str(self.isRetweet)}\nOriginal Tweet URL: {self.urlOriginalTweet}\nQuotes:{str(self.isQuote)}\nQuoted Tweet URL: {self.urlQuotedTweet}\nHas Media={str(self.hasMedia)}\nHas Local Media={str(self.hasLocalMedia)}\nMedia={str([str(m) for m in self.media])}"
-        return output
+    @_lazy
+    def user_screen_name(self) -> str:
+        return self.data["user"]["screen_name"]
 
-    @staticmethod
-    def compare_by_favorite_count(set: bool = True):
-        TweetAnalyzer._favorite_quoteCount = set
+    @_lazy
+    def user_id(self) -> str:
+        try:
+            return self.data["user"]["id_str"]
+        except KeyError:
+            return self.data["user"]["id"]
 
-    @staticmethod
-    def compare_by_retweet_count(set: bool = True):
-        TweetAnalyzer._favorite_quoteCount = not set
+    @_lazy
+    def isRetweet(self) -> bool:
+        return self.data.get("retweeted_status", None) is not None
 
-    def _effective_size(self) -> int:
-        """Helper function for comparisons.
-        The class attribute `TweetAnalyzer._favorite_quoteCount` 
-        controls if retweetCount or favoriteCount is used.
+    @_lazy
+    def isQuote(self) -> bool:
+        return not self.isRetweet and self.data.get("quoted_status", None) is not None
 
-        Returns:
-            int: 0, retweetCount or quoteCount.
-        """
-        if self.isRetweet:
-            return 0
-        if getattr(TweetAnalyzer, "_favorite_quoteCount", False):
-            return self.favoriteCount
-        else:
-            return self.retweetCount
+    @_lazy
+    def retweeted_status(self) -> Union["LazyTweetAnalyzer", None]:
+        if not self.isRetweet:
+            return None
+        return self._nested("retweeted_status")
+
+    @_lazy
+    def quoted_status(self) -> Union["LazyTweetAnalyzer", None]:
+        if not self.isQuote:
+            return None
+        return self._nested("quoted_status")
+
+    def _nested(self, key: str) -> "LazyTweetAnalyzer":
+        if self.pool is None:
+            return LazyTweetAnalyzer(self.data[key], self.onlyLocalMedia)
+        nested = self.pool.analyzer(self.data[key], self.onlyLocalMedia, LazyTweetAnalyzer)
+        self.data[key] = nested.data
+        return nested
+
+    @_lazy
+    def urlOriginalTweet(self) -> str:
+        return self.retweeted_status.urlByIDs() if self.isRetweet else "Not applicable"
+
+    @_lazy
+    def urlQuotedTweet(self) -> str:
+        return self.quoted_status.urlByIDs() if self.isQuote else "Not applicable"
+
+    def _count(self, key: str) -> Union[int, None]:
+        count = self.data.get(key, None)
+        if count is not None:
+            try:
+                count = int(count)
+            except Exception as err:
+                exception(err)
+        return count
 
-    def __lt__(self, other: "TweetAnalyzer") -> bool:
-        return self._effective_size() < other._effective_size()
+    @_lazy
+    def retweetCount(self) -> Union[int, None]:
+        return self._count("retweet_count")
 
-    def __le__(self, other: "TweetAnalyzer") -> bool:
-        return self._effective_size() == other._effective_size() or self < other
+    @_lazy
+    def quoteCount(self) -> Union[int, None]:
+        return self._count("quote_count")
 
-    def __gt__(self, other: "TweetAnalyzer") -> bool:
-        return not self.__le__(other)
+    @_lazy
+    def favoriteCount(self) -> Union[int, None]:
+        return self._count("favorite_count")
 
-    def __ge__(self, other: "TweetAnalyzer"):
-        return not self.__lt__(other)
+    @_lazy
+    def tweetEntities(self) -> TweetEntities:
+        return scan_entities(self.data, recursive=not self.onlyLocalMedia)
 
-    def __eq__(self, other: "TweetAnalyzer"):
-        return self._effective_size() == other._effective_size()
+    @_lazy
+    def localMedia(self) -> List[Union[TweetMedia, TweetVideo, TweetPhoto, TweetGif]]:
+        # Priority to extended_entities that has the correct media type
+        media = self.extended_entities().get("media", None)
+        if media is None:
+            media = self.entities().get("media", [])
+        build = build_media if self.pool is None else self.pool.media
+        return [build(m, self.id) for m in media]
+
+    @_lazy
+    def hasLocalMedia(self) -> bool:
+        return bool(self.extended_entities().get("media", None) or self.entities().get("media", None))
+
+    @_lazy
+    def media(self) -> List[Union[TweetMedia, TweetVideo, TweetPhoto, TweetGif]]:
+        media = self.localMedia
+        if not self.onlyLocalMedia:
+            for status in (self.retweeted_status, self.quoted_status):
+                if status is not None and status.hasMedia:
+                    media = media + status.media
+        return media
+
+    @_lazy
+    def hasMedia(self) -> bool:
+        if self.hasLocalMedia:
+            return True
+        if self.onlyLocalMedia:
+            return False
+        return any(
+            status is not None and status.hasMedia
+            for status in (self.retweeted_status, self.quoted_status)
+        )
@@ -0,0 +1,244 @@
+import logging, zlib
+import numpy as np
+import pandas as pd
+from typing import Union, List, Dict, Iterable, Iterator
+from .cache import Cache
+from . import jsonlib
+
+"""
+Column oriented extraction of tweet fields. `TweetBatch` reads the fields
+`TweetAnalyzer` exposes one object at a time (counts, retweet/quote flags,
+media flag, language, user and creation date) from many tweets in one pass
+into typed NumPy arrays, so sorting, filtering and aggregation are array
+operations.
+
+    batch = TweetBatch.from_cache(session.cache)
+    originals = batch.filter(~batch["is_retweet"] & batch["has_media"])
+    top = originals.sort_by("retweet_count")[:10]
+    df = batch.to_dataframe()
+"""
+
+V1_DATE_FORMAT = '%a %b %d %H:%M:%S +0000 %Y'
+# Missing counts are stored as -1 in the NumPy columns.
+MISSING_COUNT = -1
+# `lang` code of undetermined languages, and the code returned by
+# `TweetBatch.language_code` for languages no tweet of the batch uses.
+UNDETERMINED_LANGUAGE = -1
+ABSENT_LANGUAGE = -2
+BATCH_COLUMNS = [
+    "id", "user_id", "created_at", "lang", "retweet_count", "favorite_count",
+    "quote_count", "is_retweet", "is_quote", "has_media", "retweeted_id", "quoted_id",
+]
+COUNT_COLUMNS = ["retweet_count", "favorite_count", "quote_count"]
+
+
+def _count(value) -> int:
+    if value is None:
+        return MISSING_COUNT
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return MISSING_COUNT
+
+
+def _int_id(value) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _media(tweet: dict) -> bool:
+    entities = tweet.get("extended_entities") or tweet.get("entities") or {}
+    return bool(entities.get("media"))
+
+
+def response_tweets(content: Union[dict, list]) -> List[dict]:
+    """Tweets of a decoded cache entry or API response in the v1.1 shape:
+    single tweets and lookup lists (v1.1) are returned as they are and v2
+    responses are normalized. Anything else (oEmbed, errors) gives no tweets.
+    """
+    from .normalize import normalize_v2
+
+    if type(content) is dict and "data" in content:
+        tweets = normalize_v2(content)
+    elif type(content) is dict:
+        tweets = [content]
+    elif type(content) is list:
+        tweets = content
+    else:
+        return []
+    return [
+        tweet for tweet in tweets
+        if type(tweet) is dict and "id_str" in tweet and "user" in tweet
+    ]
+
+
+def iter_cached_tweets(cache: Cache, unique: bool = True) -> Iterator[dict]:
+    """Yields every tweet stored in a cache in the v1.1 shape.
+
+    Cache entries are keyed by request hash, so every file is read and
+    recognized by its content (see `response_tweets`).
+
+    Args:
+        cache (Cache): Cache to scan.
+        unique (bool, optional): Only yield the first entry of each tweet ID. Defaults to True.
+    """
+    seen = set()
+    for filename in cache.files():
+        try:
+            content = jsonlib.loads(cache.read_file(filename))
+        except (OSError, ValueError, zlib.error) as err:
+            logging.debug(f"Skipping cache file {filename}: {err}")
+            continue
+        for tweet in response_tweets(content):
+            if unique:
+                if tweet["id_str"] in seen:
+                    continue
+                seen.add(tweet["id_str"])
+            yield tweet
+
+
+class TweetBatch:
+    def __init__(self, columns: Dict[str, np.ndarray], languages: List[str]):
+        """Tweet fields stored as NumPy columns, one row per tweet. Usually
+        created with `TweetBatch.from_tweets` or `TweetBatch.from_cache`.
+
+        Columns:
+            id, user_id, retweeted_id, quoted_id (int64): IDs, 0 when absent.
+            created_at (datetime64): Creation date in UTC, NaT when absent.
+            lang (int16): Code into `languages`, -1 for undetermined.
+            retweet_count, favorite_count, quote_count (int64): -1 when absent.
+            is_retweet, is_quote, has_media (bool): Same as the TweetAnalyzer attributes.
+
+        Args:
+            columns (Dict[str, np.ndarray]): Arrays of equal length by column name.
+            languages (List[str]): Language of each `lang` code.
+        """
+        self.columns = columns
+        self.languages = languages
+
+    @staticmethod
+    def from_tweets(
+        tweets: Iterable[Union[dict, str, bytes]], localMedia: bool = True
+    ) -> "TweetBatch":
+        """Extracts the batch columns from tweet data dictionaries in one pass.
+
+        Args:
+            tweets (Iterable[Union[dict, str, bytes]]): Tweets in the v1.1 shape, decoded or JSON.
+            localMedia (bool, optional): Same meaning as for TweetAnalyzer, when False
+                `has_media` includes media of the retweeted or quoted tweet. Defaults to True.
+
+        Returns:
+            TweetBatch: Extracted columns.
+        """
+        ids, user_ids, dates, langs = [], [], [], []
+        retweets, favorites, quotes = [], [], []
+        is_retweet, is_quote, has_media = [], [], []
+        retweeted_ids, quoted_ids = [], []
+        languages: Dict[str, int] = {}
+        for tweet in tweets:
+            if type(tweet) in (str, bytes):
+                tweet = jsonlib.loads(tweet)
+            ids.append(_int_id(tweet.get("id_str", tweet.get("id"))))
+            user = tweet.get("user") or {}
+            user_ids.append(_int_id(user.get("id_str", user.get("id"))))
+            dates.append(tweet.get("created_at"))
+            lang = tweet.get("lang", "und")
+            if lang == "und" or type(lang) is not str:
+                langs.append(UNDETERMINED_LANGUAGE)
+            else:
+                langs.append(languages.setdefault(lang, len(languages)))
+            retweets.append(_count(tweet.get("retweet_count")))
+            favorites.append(_count(tweet.get("favorite_count")))
+            quotes.append(_count(tweet.get("quote_count")))
+            retweeted = tweet.get("retweeted_status")
+            quoted = tweet.get("quoted_status") if retweeted is None else None
+            is_retweet.append(retweeted is not None)
+            is_quote.append(quoted is not None)
+            retweeted_ids.append(_int_id(retweeted.get("id_str", retweeted.get("id"))) if retweeted is not None else 0)
+            quoted_ids.append(_int_id(quoted.get("id_str", quoted.get("id"))) if quoted is not None else 0)
+            media = _media(tweet)
+            nested = retweeted if retweeted is not None else quoted
+            while not media and not localMedia and nested is not None:
+                media = _media(nested)
+                next_nested = nested.get("retweeted_status")
+                nested = next_nested if next_nested is not None else nested.get("quoted_status")
+            has_media.append(media)
+
+        created_at = pd.to_datetime(
+            pd.Series(dates, dtype=object), format=V1_DATE_FORMAT, errors="coerce"
+        ).to_numpy(dtype="datetime64[ns]")
+        columns = {
+            "id": np.array(ids, dtype=np.int64),
+            "user_id": np.array(user_ids, dtype=np.int64),
+            "created_at": created_at,
+            "lang": np.array(langs, dtype=np.int16),
+            "retweet_count": np.array(retweets, dtype=np.int64),
+            "favorite_count": np.array(favorites, dtype=np.int64),
+            "quote_count": np.array(quotes, dtype=np.int64),
+            "is_retweet": np.array(is_retweet, dtype=bool),
+            "is_quote": np.array(is_quote, dtype=bool),
+            "has_media": np.array(has_media, dtype=bool),
+            "retweeted_id": np.array(retweeted_ids, dtype=np.int64),
+            "quoted_id": np.array(quoted_ids, dtype=np.int64),
+        }
+        return TweetBatch(columns, list(languages.keys()))
+
+    @staticmethod
+    def from_cache(cache: Cache, localMedia: bool = True) -> "TweetBatch":
+        """Extracts the batch columns from every tweet stored in a cache."""
+        return TweetBatch.from_tweets(iter_cached_tweets(cache), localMedia)
+
+    def __len__(self) -> int:
+        return len(self.columns["id"])
+
+    def __getitem__(self, key: Union[str, slice, np.ndarray]) -> Union[np.ndarray, "TweetBatch"]:
+        """A column by name, or a new batch with the rows selected by a slice,
+        boolean mask or index array."""
+        if type(key) is str:
+            return self.columns[key]
+        return TweetBatch({name: values[key] for name, values in self.columns.items()}, self.languages)
+
+    def filter(self, mask: np.ndarray) -> "TweetBatch":
+        """Rows where the boolean `mask` is True."""
+        return self[np.asarray(mask, dtype=bool)]
+
+    def sort_by(self, column: str, descending: bool = True) -> "TweetBatch":
+        """Rows ordered by a column, stable for equal values."""
+        values = self.columns[column]
+        if not descending:
+            return self[np.argsort(values, kind="stable")]
+        # Reversing an ascending sort reverses ties, so the reversed column is
+        # sorted instead: ties keep their order once mapped back and reversed.
+        order = len(values) - 1 - np.argsort(values[::-1], kind="stable")
+        return self[order[::-1]]
+
+    def language_code(self, lang: str) -> int:
+        """`lang` column code of a language: UNDETERMINED_LANGUAGE (-1) for "und"
+        and ABSENT_LANGUAGE (-2), which matches no row, if no tweet of the batch uses it."""
+        if lang == "und":
+            return UNDETERMINED_LANGUAGE
+        try:
+            return self.languages.index(lang)
+        except ValueError:
+            return ABSENT_LANGUAGE
+
+    def to_numpy(self) -> Dict[str, np.ndarray]:
+        return dict(self.columns)
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Columns as a DataFrame. `lang` and `user_id` are categorical and
+        counts use the nullable Int64 dtype."""
+        frame = {}
+        for name in BATCH_COLUMNS:
+            values = self.columns[name]
+            if name == "lang":
+                frame[name] = pd.Categorical.from_codes(values, categories=self.languages)
+            elif name == "user_id":
+                frame[name] = pd.Categorical(values)
+            elif name in COUNT_COLUMNS:
+                frame[name] = pd.array(np.where(values == MISSING_COUNT, None, values), dtype="Int64")
+            else:
+                frame[name] = values
+        return pd.DataFrame(frame)
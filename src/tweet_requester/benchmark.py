@@ -0,0 +1,183 @@
+import argparse
+from time import perf_counter
+from typing import Union, Tuple, List, Dict, Callable
+from .analysis import TweetAnalyzer, TweetMedia, build_media, scan_entities
+from .mockserver import SyntheticTweets, synthetic_ids
+from .templates import TweetTemplate, AUTO_DETAIL_TEMPLATE
+
+"""
+Micro benchmarks of the tweet analysis code, run on `SyntheticTweets`
+so results can be compared between changes offline.
+
+    python -m tweet_requester.benchmark --tweets 5000
+"""
+
+MEDIA_KEYS = ['media_url_https', 'media_url']
+
+
+def legacy_media(data: dict, recursive: bool = True) -> Tuple[bool, bool, List[TweetMedia], List[TweetMedia]]:
+    """Media detection of `TweetAnalyzer` before `scan_entities`, kept as the
+    benchmark reference: `str()` of the whole tweet and of its entities is
+    searched for media keys and the media list is built once per search.
+    Nested tweets repeat the same steps, as their analyzers did.
+
+    Returns:
+        Tuple[bool, bool, List[TweetMedia], List[TweetMedia]]: hasMedia, hasLocalMedia, media and localMedia.
+    """
+    tweet_id = data.get("id_str", data.get("id"))
+    nested = data.get("retweeted_status", None)
+    if nested is None:
+        nested = data.get("quoted_status", None)
+    nested_media = legacy_media(nested, recursive) if nested is not None else None
+
+    def extract(recursive: bool) -> List[TweetMedia]:
+        entities, extended = data.get("entities", {}), data.get("extended_entities", {})
+        if 'media' in extended.keys():
+            media = [build_media(m, tweet_id) for m in extended.get('media', [])]
+        else:
+            media = [build_media(m, tweet_id) for m in entities.get('media', [])]
+        if recursive and nested_media is not None and nested_media[0]:
+            media = media + nested_media[2]
+        return media
+
+    has_media = None
+    media = []
+    if recursive:
+        data_str = str(data)
+        has_media = any(map(data_str.__contains__, MEDIA_KEYS))
+        media = extract(True)
+    entities_str = str(data.get("entities", {})) + str(data.get("extended_entities", {}))
+    has_local_media = any(map(entities_str.__contains__, MEDIA_KEYS))
+    if has_media is None:
+        has_media = has_local_media
+    local_media = extract(False)
+    if not recursive:
+        media = local_media
+    return has_media, has_local_media, media, local_media
+
+
+def structural_media(data: dict, recursive: bool = True) -> Tuple[bool, bool, List[TweetMedia], List[TweetMedia]]:
+    """Media detection of `TweetAnalyzer.extractMedia`, with the nested tweets
+    scanned again as their own analyzers do.
+    """
+    nested = data.get("retweeted_status", None)
+    if nested is None:
+        nested = data.get("quoted_status", None)
+    if nested is not None:
+        structural_media(nested, recursive)
+    found = scan_entities(data, recursive)
+    media = [build_media(m, source) for source, m in found.media]
+    local_media = media[:found.local_media]
+    return len(media) > 0, len(local_media) > 0, media, local_media
+
+
+def _time(function: Callable, items: list, repeat: int) -> float:
+    best = None
+    for _ in range(repeat):
+        start = perf_counter()
+        for item in items:
+            function(item)
+        elapsed = perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def benchmark_media_detection(
+    tweets: List[dict], localMedia: bool = False, repeat: int = 3
+) -> Dict[str, Union[int, float]]:
+    """Times `legacy_media` against `structural_media` and counts the tweets
+    where their hasMedia/hasLocalMedia flags disagree.
+
+    Args:
+        tweets (List[dict]): Tweet data dictionaries.
+        localMedia (bool, optional): Same meaning as for `TweetAnalyzer`. Defaults to False.
+        repeat (int, optional): Runs per implementation, the best is kept. Defaults to 3.
+
+    Returns:
+        Dict[str, Union[int, float]]: Seconds per implementation, speedup and disagreements.
+    """
+    recursive = not localMedia
+    legacy = _time(lambda t: legacy_media(t, recursive), tweets, repeat)
+    structural = _time(lambda t: structural_media(t, recursive), tweets, repeat)
+    analyzer = _time(lambda t: TweetAnalyzer(t, localMedia), tweets, repeat)
+    disagreements = sum(
+        1 for t in tweets
+        if legacy_media(t, recursive)[:2] != structural_media(t, recursive)[:2]
+    )
+    return {
+        "tweets": len(tweets),
+        "legacy_seconds": legacy,
+        "structural_seconds": structural,
+        "speedup": legacy / structural if structural > 0 else 0.0,
+        "analyzer_seconds": analyzer,
+        "flag_disagreements": disagreements,
+    }
+
+
+def analyzer_auto_detail(data: dict) -> tuple:
+    """Fields of `AUTO_DETAIL_TEMPLATE` read through `TweetAnalyzer`, as
+    `JsonLInteractiveClassifier.save_auto_details` stores them: the classifier
+    analyzes tweets with `localMedia=False`, so `has_media` includes the media
+    of the retweeted or quoted tweet."""
+    tweet = TweetAnalyzer(data, localMedia=False)
+    return (
+        tweet.id,
+        tweet.isBasedOn(),
+        tweet.user_id,
+        tweet.hasMedia,
+        tweet.language(),
+        tweet.retweetCount,
+        tweet.quoteCount,
+        tweet.favoriteCount,
+        tweet.text(),
+    )
+
+
+def benchmark_template(tweets: List[dict], repeat: int = 3) -> Dict[str, Union[int, float]]:
+    """Times the compiled `AUTO_DETAIL_TEMPLATE` against `analyzer_auto_detail`
+    and counts the tweets where their rows differ.
+
+    Returns:
+        Dict[str, Union[int, float]]: Seconds per implementation, speedup and disagreements.
+    """
+    template = TweetTemplate(AUTO_DETAIL_TEMPLATE)
+    analyzer = _time(analyzer_auto_detail, tweets, repeat)
+    compiled = _time(template.extract, tweets, repeat)
+    disagreements = sum(1 for t in tweets if analyzer_auto_detail(t) != template.extract(t))
+    return {
+        "tweets": len(tweets),
+        "analyzer_seconds": analyzer,
+        "template_seconds": compiled,
+        "speedup": analyzer / compiled if compiled > 0 else 0.0,
+        "row_disagreements": disagreements,
+    }
+
+
+def main(argv: Union[List[str], None] = None):
+    parser = argparse.ArgumentParser(description="Benchmark tweet analysis on synthetic tweets.")
+    parser.add_argument("--tweets", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    synthetic = SyntheticTweets(seed=args.seed)
+    tweets = [synthetic.v1(tweet_id) for tweet_id in synthetic_ids(args.tweets)]
+    tweets = [tweet for tweet in tweets if tweet is not None]
+    for localMedia in (False, True):
+        result = benchmark_media_detection(tweets, localMedia, args.repeat)
+        print(
+            f"media detection (localMedia={localMedia}): {result['tweets']} tweets | "
+            f"str scan {result['legacy_seconds']:.3f}s | structural {result['structural_seconds']:.3f}s | "
+            f"x{result['speedup']:.2f} | TweetAnalyzer {result['analyzer_seconds']:.3f}s | "
+            f"flag disagreements {result['flag_disagreements']}"
+        )
+    result = benchmark_template(tweets, args.repeat)
+    print(
+        f"auto detail fields: {result['tweets']} tweets | TweetAnalyzer {result['analyzer_seconds']:.3f}s | "
+        f"template {result['template_seconds']:.3f}s | x{result['speedup']:.2f} | "
+        f"row disagreements {result['row_disagreements']}"
+    )
+
+
+if __name__ == "__main__":
+    main()
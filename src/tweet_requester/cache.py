@@ -6,6 +6,8 @@ from enum import Enum
 from hashlib import md5, sha1
 from datetime import datetime
 from sys import getsizeof
+from time import perf_counter
+from .metrics import METRICS
 
 
 def get_size(obj: object, seen=None):
@@ -175,6 +177,28 @@ class Cache():
                 return True
         return False
 
+    def is_stale(self, tweet_request: Request, refresh_rate: float = None) -> bool:
+        """
+        Determines if a cached value is older than the refresh rate.
+        Unlike needs_update it does not depend on SOFT_RELOAD.
+
+        Args:
+            request (Request): Request object that references the resource.
+            refresh_rate (float, optional):
+                Custom refresh_rate in seconds. Defaults to None to use self.REFRESH_RATE.
+
+        Returns:
+            bool: True if the resource is cached and older than the refresh rate.
+        """
+        if refresh_rate is None:
+            refresh_rate = self.REFRESH_RATE
+        filename = self.request_filename(tweet_request=tweet_request)
+        try:
+            stamp = os.path.getmtime(filename)
+        except OSError:
+            return False
+        return datetime.now().timestamp() - stamp > refresh_rate
+
     def uri_filename(self, uri: str, method: str = "GET", params: dict = {}, headers: dict = {}):
         tweet_request = Cache.request_from_uri(uri, method, params, headers)
         return self.request_filename(tweet_request=tweet_request)
@@ -201,7 +225,10 @@ class Cache():
 
     def check(self, uri: str, method: str = "GET", params: dict = {}, headers: dict = {}):
         tweet_request = Cache.request_from_uri(uri, method, params, headers)
-        return self.available(tweet_request)
+        available = self.available(tweet_request)
+        if METRICS.enabled:
+            METRICS.inc("cache_hits_total" if available else "cache_misses_total")
+        return available
 
     def available(self, tweet_request: Request):
         try:
@@ -219,18 +246,43 @@ class Cache():
         if self.available(tweet_request):
             with open(self.request_filename(tweet_request), 'rb') as cache:
                 data = cache.read()
-            dc_data = zlib.decompress(data)
+            if METRICS.enabled:
+                start = perf_counter()
+                dc_data = zlib.decompress(data)
+                METRICS.observe("cache_decompress_seconds", perf_counter() - start)
+                METRICS.inc("cache_reads_total")
+                METRICS.inc("cache_read_bytes_total", len(data))
+            else:
+                dc_data = zlib.decompress(data)
             return dc_data.decode("utf-8")
         else:
             return "Unavailable"
 
     def store_bytes(self, uri: str, value: bytes, method: str = "GET", params: dict = {}, headers: dict = {}):
         tweet_request = Request(uri, method, params, headers)
-        data = zlib.compress(value, level=self.COMPRESS_LEVEL)
+        if METRICS.enabled:
+            start = perf_counter()
+            data = zlib.compress(value, level=self.COMPRESS_LEVEL)
+            METRICS.observe("cache_compress_seconds", perf_counter() - start)
+            METRICS.inc("cache_writes_total")
+            METRICS.inc("cache_write_bytes_total", len(data))
+        else:
+            data = zlib.compress(value, level=self.COMPRESS_LEVEL)
         with open(self.request_filename(tweet_request), "wb") as cache:
             cache.write(data)
         logging.debug(f"Stored at: {self.request_filename(tweet_request)}")
 
+    def files(self):
+        """Yields the path of every file in the cache directory."""
+        for root, _, filenames in os.walk(self.CACHE_DIR):
+            for filename in filenames:
+                yield os.path.join(root, filename)
+
+    def read_file(self, filename: str) -> bytes:
+        """Decompresses a cache file found with `files`."""
+        with open(filename, 'rb') as cache:
+            return zlib.decompress(cache.read())
+
     def store(self, uri: str,  value: str, method: str = "GET", params: dict = {}, headers: dict = {}):
         logging.debug("Storing...")
         self.store_bytes(uri, value.encode("utf-8"), method, params, headers)
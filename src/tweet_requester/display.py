@@ -1,12 +1,16 @@
 from os import environ
 import pandas as pd
 from sqlite3.dbapi2 import Cursor
-from typing import Tuple, List, Union
-from datetime import datetime
+from typing import Tuple, List, Set, Union, Iterable
+from datetime import datetime, timezone
 from google.cloud.translate_v3.types.translation_service import TranslateTextResponse
 from proto.fields import RepeatedField
 from .analysis import TweetAnalyzer, json
-from .session import TSess
+from .session import TSess, OfflineCacheMiss, OFFLINE_MISS_CODE
+from .scheduler import Priority
+from .metrics import METRICS, TimedCursor
+from .snowflake import snowflake_ms
+from .sqlitepool import SQLitePool
 from IPython.core.display import display, HTML, clear_output, Javascript
 import sqlite3
 from os.path import isfile
@@ -17,6 +21,9 @@ from queue import Queue
 from google.cloud import translate
 from google.oauth2 import service_account
 import logging
+import re
+from functools import wraps
+from contextlib import contextmanager
 
 """
 This module objective is to generate an interactive store for
@@ -44,11 +51,54 @@ def prepare_google_credentials(credentials_file="")\
         return None
 
 
+def session_priority(priority: Priority):
+    """Decorator for JsonLInteractiveClassifier methods that sets the priority
+    of every request sent through `self.tweet_session` during the call.
+
+    Args:
+        priority (Priority): Request priority used by the session scheduler.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.tweet_session.priority(priority):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
 PHOTO_MEDIA_TYPES = ["photo", "animated_gif"]
 VIDEO_MEDIA_TYPES = ["video"]
 AUDIO_MEDIA_TYPES = ["audio"]
 ALL_MEDIA_TYPES = PHOTO_MEDIA_TYPES + VIDEO_MEDIA_TYPES + AUDIO_MEDIA_TYPES
 
+# Full text search tables: name -> (source table, indexed column, extra columns).
+# FTS rows share the rowid of their source row and are kept in sync by triggers.
+FTS_TABLES = {
+    "text": ("tweet_auto_detail", "text", ["language"]),
+    "traduction": ("tweet_traduction", "traduction", ["target_language_code"]),
+    "description": ("tweet_user_detail", "description", []),
+}
+# Primary key of each FTS source table, used to drop the indexed text of a
+# row about to be replaced.
+FTS_KEYS = {
+    "text": ["tweet_id"],
+    "traduction": ["target_language_code", "tweet_id"],
+    "description": ["tweet_id"],
+}
+FTS_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# Sampling work order (database version 0.5): tweet.rand_key holds the lap in
+# its high bits and a random position within the lap in the low 32 bits.
+LAP_BITS = 32
+LAP_POSITIONS = (1 << LAP_BITS) - 1
+# Key of a tweet entering `state`: a random place among the tweets of the
+# state not sampled yet in its current lap.
+ENTRY_RAND_KEY_SQL = f"""(
+    SELECT front + (random() & 9223372036854775807) % max((((front >> {LAP_BITS}) + 1) << {LAP_BITS}) - front, 1)
+    FROM (SELECT coalesce(min(rand_key), 0) AS front FROM tweet
+          WHERE state = new.state AND rand_key IS NOT NULL AND rowid != new.rowid))"""
+
 
 class PROCESSING_STAGES(Enum):
     """Enumarator of the stages in processing a tweet
@@ -72,9 +122,13 @@ class TweetInteractiveClassifier(TweetAnalyzer):
             session (TSess): Twitter Session Object
         """
         self._session = session
-        data, code = session.load_tweet_11(tweet_id)
-        data = json.loads(data)[0]
+        data, code = session.load_tweet_11(tweet_id, decode=True)
+        if code == OFFLINE_MISS_CODE:
+            # Offline sessions created with offline_raise=False, the tweet is
+            # not unavailable, only missing from the cache.
+            raise OfflineCacheMiss(*session.tweet_request_11(tweet_id))
         assert code == 200, "Could not get response!"
+        data = data[0]
         super().__init__(data=data, localMedia=False)
         # Loading when required ( display or _repr_html_ )
         self.oEmbededCached = ""
@@ -83,11 +137,10 @@ class TweetInteractiveClassifier(TweetAnalyzer):
         self.oEmbededCached = self.oEmbeded()
 
     def oEmbeded(self) -> str:
-        base_url = "https://publish.twitter.com/oembed"
+        base_url = self._session.OEMBED_URL
         params = {"url": f"https://twitter.com/Interior/status/{self.id}"}
-        response, code = self._session.load_request(
-            base_url=base_url, params=params, is_tweet=False)
-        data: dict = json.loads(response)
+        data, code = self._session.load_request(
+            base_url=base_url, params=params, is_tweet=False, decode=True)
         if type(data) is dict:
             return data.get("html", "<h1>Failed to get embeding.</h1>")
         return "<h1>Failed to get embeding.</h1>"
@@ -103,6 +156,25 @@ class TweetInteractiveClassifier(TweetAnalyzer):
             self.load_oEmbed()
         return self.oEmbededCached
 
+class SaveReport:
+    def __init__(self):
+        """Outcome of `JsonLInteractiveClassifier.save_auto_details_batch`."""
+        self.details = 0
+        self.users = 0
+        self.media = 0
+        self.media_links = 0
+        # (record ID, table, error message); the ID is a tweet, media or user ID.
+        self.failed: List[Tuple[Union[str, None], str, str]] = []
+        # Tweets with any record in `failed`, their auto details are incomplete.
+        self.failed_tweets: Set[str] = set()
+
+    def __str__(self) -> str:
+        return (
+            f"Saved {self.details} tweets, {self.users} users, {self.media} new media and "
+            f"{self.media_links} media links; {len(self.failed)} failed records."
+        )
+
+
 class JsonLInteractiveClassifier:
     _delay = 5.0
     _MAX_RETRIES = 30
@@ -120,6 +192,8 @@ class JsonLInteractiveClassifier:
             session (TSess): A Twitter Session object used for all communications.
             pre_initialized (bool, optional): If true requires sqlite_db to be included and continues with the previous state  of the database. Defaults to False.
             sqlite_db (str, optional): A specific file address to store the SQLite database, in empty or None defaults to a name derived from tweet_ids_file. Defaults to "".
+            graph (TweetGraph, optional): Keyword argument, graph updated with every tweet whose auto details are saved.
+            pool_size (int, optional): Keyword argument, maximum SQLite connections. Defaults to 4.
         """
         # Set Translation Configuration
         self.google_credentials: service_account.Credentials = \
@@ -134,10 +208,14 @@ class JsonLInteractiveClassifier:
         
         # Set Tweet Session to request data
         self.tweet_session = session
+        self.graph = kwargs.get("graph", None)
 
         # Initialize variables for processing loop
         self._last_submit = time()
         self.db = None
+        self.pool: Union[SQLitePool, None] = None
+        self.pool_size: int = kwargs.get("pool_size", 4)
+        self._table_columns = {}
         self.current_tweet = None
         self.current_tweet_id = None
         self._next_tweet_id = Queue()
@@ -147,10 +225,10 @@ class JsonLInteractiveClassifier:
         if type(sqlite_db) is str and sqlite_db:
             self.sqlite_filename = sqlite_db
         else:
-            self.sqlite_filename = + tweet_ids_file + ".db"
+            self.sqlite_filename = tweet_ids_file + ".db"
 
         if not pre_initialized:
-            self.initialize(tweet_ids_file)
+            self.initialize()
         else:
             self.sqlite_filename = sqlite_db
             # Verify that the database exists and the class can connect.
@@ -183,6 +261,56 @@ class JsonLInteractiveClassifier:
         self.close()
         return db_version
     
+    def update_database_v04_v05(self, git_commit: str = ""):
+        """Update database to version 0.5 from 0.4: sampling work order.
+
+        Every tweet gets a `rand_key` (see `sample_tweet_ids`), indexed with
+        its state, and triggers key the tweets inserted or moved to another
+        state later. The full text search tables and triggers are brought up
+        to date too.
+        """
+        version = 0.5
+        expected_version = 0.4
+        db_version = self.get_database_version()
+        if db_version > expected_version:
+            logging.warning(
+                f"Database version is greater than expected {db_version} > {expected_version}. This update does not apply."
+            )
+            return
+        elif db_version < expected_version:
+            logging.warning(
+                f"Database version is {db_version} < {expected_version}. Try updating to version 0.4 first using 'update_database_v03_v04' method."
+            )
+            return
+        with self.transaction() as cur:
+            logging.debug("tweet ADD column rand_key INTEGER;")
+            cur.execute("""ALTER TABLE tweet ADD rand_key INTEGER;""")
+            # Every tweet starts at a random place of the first lap.
+            cur.execute(f"""UPDATE tweet SET rand_key = random() & {LAP_POSITIONS};""")
+            cur.execute("""CREATE INDEX tweet_state_rand_key ON tweet (state, rand_key);""")
+            cur.execute(f"""CREATE TRIGGER IF NOT EXISTS tweet_rand_key_insert
+                AFTER INSERT ON tweet WHEN new.rand_key IS NULL BEGIN
+                    UPDATE tweet SET rand_key = {ENTRY_RAND_KEY_SQL} WHERE rowid = new.rowid;
+                END;""")
+            cur.execute(f"""CREATE TRIGGER IF NOT EXISTS tweet_rand_key_state
+                AFTER UPDATE OF state ON tweet WHEN new.state IS NOT old.state BEGIN
+                    UPDATE tweet SET rand_key = {ENTRY_RAND_KEY_SQL} WHERE rowid = new.rowid;
+                END;""")
+            cur.execute(
+                """
+                INSERT INTO db_update
+                (
+                    "version",
+                    "git_commit",
+                    "timestamp"
+                ) VALUES (?, ?, ?);""",
+                (version, git_commit, datetime.now().timestamp())
+            )
+        self._table_columns = {}
+        self.close()
+        self.create_fts_tables(backfill=True)
+
+    @session_priority(Priority.BACKGROUND)
     def update_database_v03_v04(self, git_commit: str = ""):
         """Update database to version 0.4 from 0.3."""
         version = 0.4
@@ -210,9 +338,9 @@ class JsonLInteractiveClassifier:
         done = True
         for idx, (tweet_id,) in enumerate(tweet_ids):
             done = False
-            data, code = self.tweet_session.load_tweet_11(tweet_id)
-            data = json.loads(data)[0]
+            data, code = self.tweet_session.load_tweet_11(tweet_id, decode=True)
             assert code == 200, "Could not get response!"
+            data = data[0]
             favoriteCount: int = data.get("favorite_count", None)
             cur.execute("""UPDATE tweet_auto_detail
                 SET favoriteCount = ?
@@ -293,6 +421,7 @@ class JsonLInteractiveClassifier:
         )
         self.commit()
 
+    @session_priority(Priority.BACKGROUND)
     def update_database_v01_v02(self, dateCreated: float, git_commit: str = ""):
         if self.get_database_version() >= 0.2:
             logging.warning(
@@ -439,7 +568,7 @@ class JsonLInteractiveClassifier:
                 else:
                     break
             if len(records) > 0:
-                cur.execute(f"INSERT INTO tweet VALUES (?, ?);", records)
+                cur.executemany(f"INSERT OR REPLACE INTO tweet VALUES (?, ?);", records)
                 self.commit()
                 records = []
         logging.debug("Saving initial version.")
@@ -455,6 +584,8 @@ class JsonLInteractiveClassifier:
         )
         cur.close()
         self.close()
+        # Random sampling keys are assigned in one pass once the IDs are loaded.
+        self.update_database_v04_v05()
     
     def initialize_db_v4(self, **kwargs) -> float:
         """Prepares a new SQLite database for usage.
@@ -463,6 +594,7 @@ class JsonLInteractiveClassifier:
         """
         
         # Connect and initialize tables
+        self._table_columns = {}
         self.connect()
 
         cur = self.db.cursor()
@@ -498,6 +630,7 @@ class JsonLInteractiveClassifier:
             language TEXT,
             retweetCount INTEGER,
             quoteCount INTEGER,
+            favoriteCount INTEGER,
             text TEXT,
             PRIMARY KEY("tweet_id"));''')
         cur.execute("""CREATE INDEX tweet_auto_detail_has_media
@@ -544,34 +677,210 @@ class JsonLInteractiveClassifier:
             PRIMARY KEY("tweet_id", "slang"));''')
         self.commit()
 
+        cur.execute('''
+        CREATE TABLE IF NOT EXISTS db_update (
+            version REAL,
+            git_commit TEXT,
+            timestamp REAL,
+            PRIMARY KEY("version"));''')
+        self.commit()
+
         self.close()
 
-        
+        self.create_fts_tables(backfill=False)
 
         return 0.4
 
-    def connect(self):
+    @staticmethod
+    def fts_table(name: str) -> str:
+        return FTS_TABLES[name][0] + "_fts"
+
+    def create_fts_tables(self, backfill: bool = True):
+        """Creates the FTS5 tables used by `search` and the triggers that keep
+        them in sync with their source tables. Safe to call on existing
+        databases, which need it once with `backfill` to index their rows.
+
+        Args:
+            backfill (bool, optional): Rebuild the FTS tables from every
+                existing row. Defaults to True.
+        """
+        self.connect()
+        cur = self.cursor()
+        cur.execute("SELECT name FROM sqlite_master WHERE type = 'table';")
+        tables = {row[0] for row in cur.fetchall()}
+        for name, (source, column, extra) in FTS_TABLES.items():
+            if source not in tables:
+                logging.warning(f"Table {source} not found, skipping {name} full text search.")
+                continue
+            fts = JsonLInteractiveClassifier.fts_table(name)
+            columns = [column] + extra
+            fts_columns = ", ".join([column] + [f"{c} UNINDEXED" for c in extra])
+            new_values = ", ".join(f"new.{c}" for c in columns)
+            cur.execute(f"""CREATE VIRTUAL TABLE IF NOT EXISTS {fts}
+                USING fts5({fts_columns}, tokenize = 'unicode61 remove_diacritics 2');""")
+            cur.execute(f"""CREATE TRIGGER IF NOT EXISTS {fts}_insert
+                AFTER INSERT ON {source} BEGIN
+                    INSERT OR REPLACE INTO {fts} (rowid, {", ".join(columns)})
+                    VALUES (new.rowid, {new_values});
+                END;""")
+            # REPLACE only fires the delete trigger with recursive_triggers on,
+            # this one also covers connections without the pool pragmas.
+            same_key = " AND ".join(f"{k} = new.{k}" for k in FTS_KEYS[name])
+            cur.execute(f"""CREATE TRIGGER IF NOT EXISTS {fts}_replace
+                BEFORE INSERT ON {source} BEGIN
+                    DELETE FROM {fts} WHERE rowid IN (
+                        SELECT rowid FROM {source} WHERE {same_key});
+                END;""")
+            cur.execute(f"""CREATE TRIGGER IF NOT EXISTS {fts}_delete
+                AFTER DELETE ON {source} BEGIN
+                    DELETE FROM {fts} WHERE rowid = old.rowid;
+                END;""")
+            cur.execute(f"""CREATE TRIGGER IF NOT EXISTS {fts}_update
+                AFTER UPDATE ON {source} BEGIN
+                    DELETE FROM {fts} WHERE rowid = old.rowid;
+                    INSERT OR REPLACE INTO {fts} (rowid, {", ".join(columns)})
+                    VALUES (new.rowid, {new_values});
+                END;""")
+            if backfill:
+                logging.debug(f"Backfilling {fts} from {source}.")
+                cur.execute(f"DELETE FROM {fts};")
+                cur.execute(f"""INSERT INTO {fts} (rowid, {", ".join(columns)})
+                    SELECT rowid, {", ".join(columns)} FROM {source}
+                    WHERE {column} IS NOT NULL;""")
+                cur.execute(f"INSERT INTO {fts} ({fts}) VALUES ('optimize');")
+            self.commit()
+        cur.close()
         self.close()
-        self.db = sqlite3.connect(self.sqlite_filename)
+
+    @staticmethod
+    def fts_query(text: str, any_word: bool = False) -> str:
+        """FTS5 query matching the words of free text, each one quoted so
+        punctuation never breaks the query syntax.
+
+        Args:
+            text (str): Free text.
+            any_word (bool, optional): Match any word instead of all of them. Defaults to False.
+        """
+        words = ['"' + word + '"' for word in FTS_TOKEN_RE.findall(text)]
+        return (" OR " if any_word else " ").join(words)
+
+    def search(
+        self, query: str, table: str = "text", limit: int = 20,
+        raw: bool = False, any_word: bool = False, exclude: Union[str, None] = None
+    ) -> List[Tuple[str, str, float]]:
+        """Full text search ranked by BM25, best matches first.
+
+        Args:
+            query (str): Words to search, or an FTS5 query when `raw`.
+            table (str, optional): "text" (tweet text), "traduction" or
+                "description" (annotator descriptions). Defaults to "text".
+            limit (int, optional): Maximum results. Defaults to 20.
+            raw (bool, optional): Use `query` as FTS5 syntax (phrases, NEAR, prefix*). Defaults to False.
+            any_word (bool, optional): Match any word of `query` instead of all of them. Defaults to False.
+            exclude (Union[str, None], optional): Tweet ID left out of the results.
+
+        Returns:
+            List[Tuple[str, str, float]]: (tweet ID, highlighted snippet, bm25 score);
+                lower scores are better matches.
+        """
+        source, _, _ = FTS_TABLES[table]
+        fts = JsonLInteractiveClassifier.fts_table(table)
+        match = query if raw else JsonLInteractiveClassifier.fts_query(query, any_word)
+        if not match:
+            return []
+        self.connect()
+        cur = self.cursor()
+        cur.execute(
+            f"""SELECT s.tweet_id, snippet({fts}, 0, '[', ']', '...', 16), bm25({fts})
+            FROM {fts} JOIN {source} AS s ON s.rowid = {fts}.rowid
+            WHERE {fts} MATCH ? AND s.tweet_id IS NOT ?
+            ORDER BY bm25({fts})
+            LIMIT ?;""",
+            (match, exclude, limit)
+        )
+        rows = cur.fetchall()
+        cur.close()
+        self.close()
+        return rows
+
+    def similar_tweets(self, tweet_id: str, limit: int = 10) -> List[Tuple[str, str, float]]:
+        """Tweets sharing the most distinctive words with the text of `tweet_id`,
+        ranked as in `search`."""
+        self.connect()
+        cur = self.cursor()
+        cur.execute("SELECT text FROM tweet_auto_detail WHERE tweet_id = ?;", (tweet_id,))
+        row = cur.fetchone()
+        cur.close()
+        self.close()
+        if row is None or not row[0]:
+            return []
+        # Links, mentions and the retweet marker say little about the content.
+        text = re.sub(r"https?://\S+|@\w+|^RT\b", " ", row[0])
+        return self.search(text, limit=limit, any_word=True, exclude=tweet_id)
+
+    def database_pool(self) -> SQLitePool:
+        """Pool of long lived connections to `self.sqlite_filename`."""
+        if self.pool is None or self.pool.filename != self.sqlite_filename:
+            if self.pool is not None:
+                self.pool.close()
+            self.pool = SQLitePool(self.sqlite_filename, size=self.pool_size)
+        return self.pool
+
+    def connect(self):
+        """Sets `self.db` to a pooled connection, keeping the current one if
+        already connected. Background workers should use their own connection
+        from `self.database_pool().connection()` instead."""
+        if self.db is None:
+            self.db = self.database_pool().acquire()
 
     def close(self):
+        """Commits pending changes and returns `self.db` to the pool, the
+        connection itself stays open (see `close_pool`)."""
         if self.db is not None:
             try:
-                self.db.close()
+                if self.db.in_transaction:
+                    self.db.commit()
             except Exception as error:
-                # If not None it should be connected
-                # Still ignore and try to connect
+                # Still release the connection and keep going.
                 logging.warning(error)
-                logging.warning("Could not close connection, keep going.")
+                logging.warning("Could not commit before closing, keep going.")
+            self.pool.release(self.db)
             self.db = None
 
+    def close_pool(self):
+        """Closes every connection to the database."""
+        self.close()
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
+
+    @contextmanager
+    def transaction(self):
+        """Explicit transaction on `self.db`, committed at the end of the
+        block and rolled back on an exception. Nested in a transaction already
+        open it is a savepoint (see `SQLitePool.transaction`).
+
+        Yields:
+            Cursor: Cursor of the transaction.
+        """
+        self.connect()
+        with SQLitePool.transaction(self.db):
+            cur = self.cursor()
+            try:
+                yield cur
+            finally:
+                cur.close()
+
     def cursor(self, *args, **kwargs):
         assert self.db is not None, "Not connected to sqlite DB!"
+        if METRICS.enabled:
+            return TimedCursor(self.db.cursor(*args, **kwargs), METRICS)
         return self.db.cursor(*args, **kwargs)
 
     def commit(self, *args, **kwargs):
         assert self.db is not None, "Not connected to sqlite DB!"
-        return self.db.commit(*args, **kwargs)
+        with METRICS.timer("sqlite_commit_seconds"):
+            return self.db.commit(*args, **kwargs)
 
     def display(self):
         pass
@@ -712,6 +1021,11 @@ class JsonLInteractiveClassifier:
             try:
                 self.current_tweet = TweetInteractiveClassifier(
                     self.current_tweet_id, session=self.tweet_session)
+            except OfflineCacheMiss:
+                # Offline sessions fail fast instead of flagging the tweet,
+                # which goes back to the state it had.
+                self.skip_tweet(self.current_tweet_id, next_state=self._previous_state)
+                raise
             except:
                 self.skip_failed()
                 self.current_tweet = None
@@ -724,6 +1038,56 @@ class JsonLInteractiveClassifier:
 
         return self.current_tweet
 
+    def sample_tweet_ids(
+        self, n: int, stages: List[PROCESSING_STAGES]
+    ) -> List[str]:
+        """Uniform random sample of up to `n` tweet IDs in the given stages.
+
+        From version 0.5 the tweets of each state form a shuffled work order,
+        read in laps from the (state, rand_key) index in O(n log N): a sample
+        takes the first `n` tweets of the order and moves each of them to a
+        random place of the next lap. Within a lap every tweet is sampled once,
+        in uniformly random order, and each lap is shuffled anew. Tweets that
+        enter a state take a random place among the ones not sampled yet.
+        Older databases fall back to ORDER BY RANDOM().
+
+        Args:
+            n (int): Sample size.
+            stages (List[PROCESSING_STAGES]): Stages to sample from.
+
+        Returns:
+            List[str]: Tweet IDs in random order.
+        """
+        if "rand_key" not in self.table_columns("tweet"):
+            logging.debug("No rand_key column, use update_database_v04_v05 for faster sampling.")
+            self.connect()
+            cur = self.cursor()
+            slots = ", ".join("?" for _ in stages)
+            cur.execute(
+                f"""SELECT tweet_id FROM tweet WHERE state in ({slots}) ORDER BY RANDOM() LIMIT ?;""",
+                tuple(stage.value for stage in stages) + (n,))
+            rows = cur.fetchall()
+            cur.close()
+            return [tweet_id for (tweet_id,) in rows]
+
+        # One write transaction, concurrent samples never share tweets.
+        with self.transaction() as cur:
+            candidates: List[Tuple[int, str]] = []
+            for stage in set(stages):
+                cur.execute(
+                    """SELECT rand_key, tweet_id FROM tweet
+                    WHERE state = ? AND rand_key IS NOT NULL ORDER BY rand_key LIMIT ?;""",
+                    (stage.value, n))
+                candidates += cur.fetchall()
+            candidates.sort()
+            sample = candidates[:n]
+            cur.executemany(
+                f"""UPDATE tweet
+                SET rand_key = (((? >> {LAP_BITS}) + 1) << {LAP_BITS}) + (random() & {LAP_POSITIONS})
+                WHERE tweet_id = ?;""",
+                sample)
+        return [tweet_id for _, tweet_id in sample]
+
     def load_random_tweets(
         self, n: int = 5,
         stages: List[PROCESSING_STAGES] = [
@@ -731,32 +1095,16 @@ class JsonLInteractiveClassifier:
             PROCESSING_STAGES.PREPROCESSED
         ]
     ):
-        self.connect()
-        cur = self.cursor()
-        slots = ""
-        inputs = []
-        for stage in stages:
-            slots += "?, "
-            inputs.append(stage.value)
-        slots = slots[:-2]
-        inputs.append(n)
-        inputs = tuple(inputs)
-        cur.execute(
-            f"""SELECT tweet_id FROM tweet WHERE state in ({slots}) ORDER BY RANDOM() LIMIT ?;""",
-            inputs)
-        rows: List[Tuple[str]] = cur.fetchall()
-        for (tweet_id,) in rows:
+        for tweet_id in self.sample_tweet_ids(n, stages):
             self._next_tweet_id.put(tweet_id)
 
     def load_random_tweet(self):
+        rows = self.sample_tweet_ids(1, [PROCESSING_STAGES.UNPROCESSED])
         self.connect()
         cur = self.cursor()
-        cur.execute(
-            """SELECT tweet_id FROM tweet WHERE state = 0 ORDER BY RANDOM() LIMIT 1;""")
-        rows: List[Tuple[str]] = cur.fetchall()
         try:
             assert len(rows) > 0, "No tweets found"
-            self.current_tweet_id = rows[0][0]
+            self.current_tweet_id = rows[0]
             cur.execute(f"""
             UPDATE tweet 
             SET state = 1 
@@ -771,6 +1119,9 @@ class JsonLInteractiveClassifier:
             try:
                 self.current_tweet = TweetInteractiveClassifier(
                     self.current_tweet_id, session=self.tweet_session)
+            except OfflineCacheMiss:
+                self.skip_tweet(self.current_tweet_id, next_state=PROCESSING_STAGES.UNPROCESSED)
+                raise
             except:
                 self.skip_failed()
                 self.load_next_tweet()
@@ -905,143 +1256,201 @@ class JsonLInteractiveClassifier:
         self.commit()
         cur.close()
 
+    @staticmethod
+    def date_published(tweet: TweetAnalyzer) -> float:
+        """Publication timestamp of a tweet. Decoded from the snowflake ID
+        when possible, otherwise parsed from `created_at`, in whole seconds
+        (created_at has no milliseconds).
+
+        The value keeps the meaning datePublished always had in the database:
+        the UTC time of `created_at` read as a naive local time, so rows saved
+        by any version can be compared.
+        """
+        created = snowflake_ms(tweet.id)
+        if created is not None:
+            datePublished = datetime.fromtimestamp(created // 1000, tz=timezone.utc)
+            return datePublished.replace(tzinfo=None).timestamp()
+        try:
+            datePublished: datetime = datetime.strptime(
+                tweet.data.get("created_at"),
+                '%a %b %d %H:%M:%S +0000 %Y'
+            )
+            return datePublished.timestamp()
+        except Exception as err:
+            logging.error(
+                f"Could not generate datePublished: {tweet.data.get('created_at','MISSING')}"
+            )
+            logging.error(err)
+            raise
+
     def save_auto_details(
         self,
         tweet: TweetInteractiveClassifier,
         dateCreated: Union[float, datetime, None]
     ):
         """Save all details that can be extracted from the data dictionary 
-        without human interaction.
+        without human interaction, see `save_auto_details_batch`.
 
         Args:
             tweet (TweetInteractiveClassifier): A Tweet object used to extract data.
             dateCreated (Union[float, datetime, None]): A value pointing to the 
                 moment the data was retrieved.
+
+        Raises:
+            RuntimeError: If a record of the tweet could not be saved, before
+                callers move the tweet to its next state.
+        """
+        report = self.save_auto_details_batch([tweet], dateCreated)
+        for tweet_id, table, error in report.failed:
+            logging.error(f"Could not save {table} of tweet {tweet_id}: {error}")
+        if report.failed_tweets:
+            raise RuntimeError(f"Could not save the auto details of tweet {tweet.id}: {report.failed[0][2]}")
+
+    def table_columns(self, table: str) -> List[str]:
+        """Column names of a table, cached per database file."""
+        key = (self.sqlite_filename, table)
+        if key not in self._table_columns:
+            self.connect()
+            self._table_columns[key] = [row[1] for row in self.db.execute(f'PRAGMA table_info("{table}");')]
+        return self._table_columns[key]
+
+    def _upsert(self, cur: Cursor, table: str, key: List[str], rows: List[dict], update: bool,
+                report: "SaveReport") -> int:
+        """Writes `rows` with one executemany, falling back to one statement per
+        row to isolate the ones SQLite rejects. Columns missing in older
+        databases are left out.
+
+        Returns:
+            int: Rows inserted or updated, rows left as they were by DO NOTHING are not counted.
+        """
+        if not rows:
+            return 0
+        existing = self.table_columns(table)
+        columns = [column for column in rows[0] if column in existing]
+        names = ", ".join(f'"{c}"' for c in columns)
+        marks = ", ".join("?" for _ in columns)
+        conflict = ", ".join(f'"{c}"' for c in key)
+        if update:
+            changes = ", ".join(f'"{c}" = excluded."{c}"' for c in columns if c not in key)
+            action = f"DO UPDATE SET {changes}"
+        else:
+            action = "DO NOTHING"
+        sql = f'INSERT INTO {table} ({names}) VALUES ({marks}) ON CONFLICT({conflict}) {action};'
+        values = [tuple(row[c] for c in columns) for row in rows]
+        cur.execute("SAVEPOINT bulk_write;")
+        try:
+            cur.executemany(sql, values)
+            written = cur.rowcount
+            cur.execute("RELEASE bulk_write;")
+            return written
+        except sqlite3.Error as err:
+            logging.debug(f"Bulk write of {table} failed ({err}), retrying row by row.")
+            cur.execute("ROLLBACK TO bulk_write;")
+            cur.execute("RELEASE bulk_write;")
+        written = 0
+        for row, value in zip(rows, values):
+            try:
+                cur.execute(sql, value)
+                written += cur.rowcount
+            except sqlite3.Error as err:
+                report.failed.append((row.get("tweet_id", row.get("media_id", row.get("user_id"))), table, str(err)))
+        return written
+
+    def save_auto_details_batch(
+        self,
+        tweets: Iterable[TweetAnalyzer],
+        dateCreated: Union[float, datetime, None] = None
+    ) -> "SaveReport":
+        """Saves the auto details, users, media and media links of many tweets
+        in one transaction, with one upsert per table. Tweets whose data can
+        not be extracted and rows SQLite rejects are collected in the report,
+        the rest are saved.
+
+        Args:
+            tweets (Iterable[TweetAnalyzer]): Tweets to save.
+            dateCreated (Union[float, datetime, None], optional): Moment the data
+                was retrieved. Defaults to now.
+
+        Returns:
+            SaveReport: Counts of written rows and the failed records.
         """
-        self.connect()
-        cur = self.cursor()
         if dateCreated is None:
             dateCreated = datetime.now()
         if type(dateCreated) is datetime:
             dateCreated = dateCreated.timestamp()
-        try:
-            datePublished: datetime = datetime.strptime(
-                tweet.data.get("created_at"),
-                '%a %b %d %H:%M:%S +0000 %Y'
-            )
-            datePublished = datePublished.timestamp()
-        except Exception as err:
-            logging.error(
-                f"Could not generate datePublished: {tweet.data.get('created_at','MISSING')}"
-            )
-            logging.error(err)
-            raise
-
-        cur.execute(
-            f"""INSERT OR REPLACE INTO tweet_auto_detail
-            (
-                "tweet_id",
-                "isBasedOn",
-                "identifier",
-                "url",
-                "dateCreated",
-                "datePublished",
-                "user_id",
-                "has_media",
-                "language",
-                "retweetCount",
-                "quoteCount",
-                "favoriteCount",
-                "text"
-            )
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);""",
-            (
-                tweet.id,
-                tweet.isBasedOn(),
-                tweet.urlByIDs(),
-                tweet.url(),
-                dateCreated,
-                datePublished,
-                tweet.user_id,
-                tweet.hasMedia,
-                tweet.language(),
-                tweet.retweetCount,
-                tweet.quoteCount,
-                tweet.favoriteCount,
-                tweet.text()
-            )
-        )
-        self.commit()
-
-        cur.execute(
-            f"""INSERT OR REPLACE INTO tweet_user
-            (
-                "user_id",
-                "user_url",
-                "screen_name"
-            )
-            VALUES (?, ?, ?);""",
-            (
-                tweet.user_id,
-                f"https://twitter.com/{tweet.user_screen_name}",
-                tweet.user_screen_name
-            )
-        )
-        self.commit()
-        media_duplicates = 0
-        media_duplicates_errors = []
-        for media in tweet.localMedia:
+        report = SaveReport()
+        details, users, media, links = [], {}, {}, {}
+        saved = []
+        for tweet in tweets:
             try:
-                cur.execute(
-                    """INSERT INTO tweet_media
-                    (
-                        "media_id",
-                        "media_url",
-                        "type"
-                    )
-                    VALUES (?, ?, ?);""",
-                    (
-                        media.id,
-                        media.url(),
-                        media.mtype()
-                    )
-                )
-                self.commit()
-
-                cur.execute(
-                    """INSERT OR REPLACE INTO tweet_match_media
-                    (
-                        "tweet_id",
-                        "media_id"
-                    )
-                    VALUES (?, ?);""",
-                    (
-                        tweet.id,
-                        media.id
-                    )
-                )
-                self.commit()
-            except sqlite3.IntegrityError as err:
-                if "unique" in str(err).lower():
-                    media_duplicates += 1
-                    media_duplicates_errors.append(err)
-                    # logging.info(f"Duplicate Media Entity: {err}")
-                else:
-                    logging.error(err)
-                    raise
+                detail = {
+                    "tweet_id": tweet.id,
+                    "isBasedOn": tweet.isBasedOn(),
+                    "identifier": tweet.urlByIDs(),
+                    "url": tweet.url(),
+                    "dateCreated": dateCreated,
+                    "datePublished": JsonLInteractiveClassifier.date_published(tweet),
+                    "user_id": tweet.user_id,
+                    "has_media": tweet.hasMedia,
+                    "language": tweet.language(),
+                    "retweetCount": tweet.retweetCount,
+                    "quoteCount": tweet.quoteCount,
+                    "favoriteCount": tweet.favoriteCount,
+                    "text": tweet.text(),
+                }
+                user = {
+                    "user_id": tweet.user_id,
+                    "user_url": f"https://twitter.com/{tweet.user_screen_name}",
+                    "screen_name": tweet.user_screen_name,
+                }
+                tweet_media = {(m.id, m.url()): {"media_id": m.id, "media_url": m.url(), "type": m.mtype()}
+                               for m in tweet.localMedia}
+                tweet_links = {(tweet.id, m.id): {"tweet_id": tweet.id, "media_id": m.id}
+                               for m in tweet.localMedia}
+                # Keys are hashed before anything is kept, a bad record adds nothing.
+                users[user["user_id"]] = user
+                details.append(detail)
+                media.update(tweet_media)
+                links.update(tweet_links)
+                saved.append(tweet)
             except Exception as err:
-                logging.error(f"{media.id} - {media.mtype()} - {media.url()}")
-                logging.error(err)
-                selection = input("Continue?\n\tY/N: ")
-                if selection.lower()[0] == "y":
-                    continue
-                else:
-                    raise
-        if media_duplicates > 0:
-            logging.info(
-                f"Found {media_duplicates} duplicates.\nLast Error: {media_duplicates_errors[-1]}")
-        cur.close()
+                report.failed.append((getattr(tweet, "id", None), "tweet_auto_detail", str(err)))
+
+        with METRICS.timer("sqlite_bulk_write_seconds"), self.transaction() as cur:
+            report.details = self._upsert(cur, "tweet_auto_detail", ["tweet_id"], details, True, report)
+            report.users = self._upsert(cur, "tweet_user", ["user_id"], list(users.values()), True, report)
+            report.media = self._upsert(
+                cur, "tweet_media", ["media_id", "media_url"], list(media.values()), False, report)
+            report.media_links = self._upsert(
+                cur, "tweet_match_media", ["tweet_id", "media_id"], list(links.values()), False, report)
+        # Failed users and media belong to every tweet that references them.
+        failed = {(table, record) for record, table, _ in report.failed}
+        report.failed_tweets.update(
+            record for table, record in failed if table == "tweet_auto_detail" and record is not None)
+        for tweet in saved:
+            records = [("tweet_user", tweet.user_id), ("tweet_match_media", tweet.id)]
+            records += [("tweet_media", m.id) for m in tweet.localMedia]
+            if any(record in failed for record in records):
+                report.failed_tweets.add(tweet.id)
+        if self.graph is not None:
+            for tweet in saved:
+                if tweet.id not in report.failed_tweets:
+                    self.graph.add(tweet)
+        if report.failed:
+            logging.warning(str(report))
+        return report
+
+    def tweet_set_states(self, tweet_ids: Iterable[str], state: PROCESSING_STAGES):
+        """Set many tweet_ids to a PROCESSING_STAGE in one transaction."""
+        with self.transaction() as cur:
+            cur.executemany(
+                """UPDATE tweet
+                SET state = ?
+                WHERE tweet_id = ?;""",
+                [(state.value, tweet_id) for tweet_id in tweet_ids]
+            )
 
+    @session_priority(Priority.INTERACTIVE)
     def display_tweet(self, tweet_id, target_language_code: str = ""):
         """Display Tweet with translation if possible. IPython
 
@@ -1096,6 +1505,7 @@ class JsonLInteractiveClassifier:
 
         self.display_tweet_list(tweet_ids, target_language_code)
 
+    @session_priority(Priority.INTERACTIVE)
     def display_tweet_list(
         self,
         tweet_id_list: List[str],
@@ -1129,6 +1539,7 @@ class JsonLInteractiveClassifier:
             html_content += "</div>"
         display(HTML(html_content))
 
+    @session_priority(Priority.INTERACTIVE)
     def display_next(
         self,
         stages: List[PROCESSING_STAGES] = [
@@ -1194,13 +1605,15 @@ class JsonLInteractiveClassifier:
                 )
                 break
 
-    def preprocess_batch(self, n: int = 20):
+    @session_priority(Priority.BACKGROUND)
+    def preprocess_batch(self, n: int = 20, batch_size: int = 50):
         """Preprocess tweets to capture auto details and prepare cache for future reload.
         Unless no more values in the database, it should preprocess at least `n` tweets, but
         may preprocess more if retweeted or quoted tweets are added to the queue.
 
         Args:
             n (int, optional): Target number of preprocessing tweets. Defaults to 20.
+            batch_size (int, optional): Tweets saved per transaction. Defaults to 50.
         """
         stages = [
             PROCESSING_STAGES.UNPROCESSED
@@ -1211,28 +1624,62 @@ class JsonLInteractiveClassifier:
             stages=stages
         )
         count = 0
-        while count < n or not self._next_tweet_id.empty():
-            if self._next_tweet_id.empty():
-                self.load_random_tweets(
-                    n=n-count,
-                    stages=stages
-                )
-            tweet = self.load_next_tweet(stages=stages)
+        pending, done = [], []
+        failed = set()
+        reviewed = self.current_tweet_id
+
+        def flush():
+            if pending:
+                with METRICS.stage("save_auto_details", len(pending)):
+                    report = self.save_auto_details_batch(pending, datetime.now().timestamp())
+                failed.update(report.failed_tweets)
+            if done:
+                self.tweet_set_states(
+                    [tweet_id for tweet_id in done if tweet_id not in failed],
+                    PROCESSING_STAGES.PREPROCESSED)
+            pending.clear()
+            done.clear()
 
-            if not self.has_user_details(tweet.id):
-                self.save_auto_details(
-                    tweet,
-                    datetime.now().timestamp()
+        try:
+            while count < n or not self._next_tweet_id.empty():
+                if self._next_tweet_id.empty():
+                    # Refills pick UNPROCESSED tweets, flush first so none repeats.
+                    flush()
+                    self.load_random_tweets(
+                        n=n-count,
+                        stages=stages
+                    )
+                with METRICS.stage("load_next_tweet"):
+                    tweet = self.load_next_tweet(stages=stages)
+                if tweet is None:
+                    break
+
+                if not self.has_user_details(tweet.id):
+                    pending.append(tweet)
+                    count += 1
+                    clear_output()
+                    display(
+                        HTML(f'<p class="alert alert-success">Preprocessed {count}<p>'))
+                done.append(tweet.id)
+                if len(done) >= batch_size:
+                    flush()
+            flush()
+        finally:
+            # Tweets left in REVIEWING are never sampled again: the unsaved
+            # ones, the one being loaded and the ones without complete auto
+            # details go back to UNPROCESSED for a later run. The refills of
+            # this one do not pick them.
+            stranded = set(done) | failed
+            if self.current_tweet_id not in (None, reviewed):
+                stranded.add(self.current_tweet_id)
+            with self.transaction() as cur:
+                cur.executemany(
+                    """UPDATE tweet
+                    SET state = ?
+                    WHERE tweet_id = ? AND state = ?;""",
+                    [(PROCESSING_STAGES.UNPROCESSED.value, tweet_id, PROCESSING_STAGES.REVIEWING.value)
+                     for tweet_id in stranded]
                 )
-                count += 1
-                clear_output()
-                display(
-                    HTML(f'<p class="alert alert-success">Preprocessed {count}<p>'))
-
-            self.tweet_set_state(
-                tweet.id,
-                PROCESSING_STAGES.PREPROCESSED
-            )
 
     def finalize_current(self, *args, **kwargs):
         """Update current tweet state to PROCESSING_STAGES.FINALIZED
@@ -0,0 +1,359 @@
+import json, logging
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from hashlib import md5, sha256
+from shutil import move
+from typing import Union, List, Dict, Iterable, Callable
+from urllib.parse import urlparse
+import requests
+from .analysis import BaseTweetAnalyzer, TweetMedia, TweetPhoto, TweetVideo
+from .metrics import METRICS
+
+"""
+Archival of tweet media. `MediaDownloader` fetches the chosen rendition of
+each photo, video or gif with a bounded thread pool (one keep-alive HTTP
+session per worker) and stores every file under the SHA-256 of its content,
+so the same file reached through different URLs is kept once.
+
+    downloader = MediaDownloader("./media_archive/", workers=8)
+    report = downloader.download(media_items(analyzers))
+    print(report)
+
+Layout of the archive directory:
+    objects/ab/cd/<sha256><ext>   stored files
+    partial/<md5 of url>.part      interrupted downloads, resumed with Range requests
+    manifest.jsonl                 one JSON line per stored URL
+"""
+
+PHOTO_SIZES = ["thumb", "small", "medium", "large"]
+
+
+class MediaItem:
+    __slots__ = ("url", "media_id", "tweet_id", "mtype", "rendition")
+
+    def __init__(
+        self, url: str, media_id: Union[str, None] = None, tweet_id: Union[str, None] = None,
+        mtype: Union[str, None] = None, rendition: Union[str, None] = None
+    ):
+        """A media file to download.
+
+        Args:
+            url (str): URL of the file.
+            media_id (Union[str, None], optional): Media entity ID.
+            tweet_id (Union[str, None], optional): Tweet the media belongs to.
+            mtype (Union[str, None], optional): photo, video or animated_gif.
+            rendition (Union[str, None], optional): Size or bitrate of the file, e.g. "large".
+        """
+        self.url = url
+        self.media_id = media_id
+        self.tweet_id = tweet_id
+        self.mtype = mtype
+        self.rendition = rendition
+
+    def __repr__(self) -> str:
+        return f"MediaItem({self.url!r}, media_id={self.media_id!r}, tweet_id={self.tweet_id!r})"
+
+
+def media_item(
+    media: TweetMedia, photo_size: str = "large", bitrate: int = 832000,
+    thumbnail: bool = False
+) -> Union[MediaItem, None]:
+    """Rendition of a media object to download: the `photo_size` photo, the
+    video variant closest to `bitrate` or, with `thumbnail`, the preview image.
+    Returns None for media without a downloadable file (e.g. not embeddable videos).
+    """
+    mtype = media.mtype()
+    if thumbnail and isinstance(media, TweetVideo):
+        url, rendition = media.thumbnailUrl(photo_size), photo_size
+    elif isinstance(media, TweetPhoto):
+        size = photo_size if photo_size in media.sizes else None
+        url = media.url() + ":" + size if size and media.url() else media.url()
+        rendition = size
+    elif isinstance(media, TweetVideo):
+        if not media.embeddable() or not media.variants:
+            return None
+        variant = media.getBestVariant(bitrate)
+        url, rendition = variant["url"], str(variant.get("bitrate", ""))
+    else:
+        url, rendition = media.url(), None
+    if not url:
+        return None
+    return MediaItem(url, str(media.id), media.source_tweet, mtype, rendition)
+
+
+def media_items(
+    analyzers: Iterable[BaseTweetAnalyzer], photo_size: str = "large",
+    bitrate: int = 832000, thumbnails: bool = False, localMedia: bool = True
+) -> List[MediaItem]:
+    """Media files of a list of analyzers, see `media_item`.
+
+    Args:
+        analyzers (Iterable[BaseTweetAnalyzer]): TweetAnalyzer or LazyTweetAnalyzer objects.
+        photo_size (str, optional): Photo size to download. Defaults to "large".
+        bitrate (int, optional): Preferred video bitrate. Defaults to 832000.
+        thumbnails (bool, optional): Also download video and gif thumbnails. Defaults to False.
+        localMedia (bool, optional): Only media of the tweets themselves, otherwise
+            also the media of retweeted or quoted tweets they carry. Defaults to True.
+    """
+    items = []
+    for tweet in analyzers:
+        for media in (tweet.localMedia if localMedia else tweet.media):
+            item = media_item(media, photo_size, bitrate)
+            if item is not None:
+                items.append(item)
+            if thumbnails and isinstance(media, TweetVideo):
+                item = media_item(media, photo_size, bitrate, thumbnail=True)
+                if item is not None:
+                    items.append(item)
+    return items
+
+
+def media_items_from_db(sqlite_filename: str) -> List[MediaItem]:
+    """Media files recorded in the `tweet_media` table of a JsonLInteractiveClassifier
+    database. Video URLs pointing to twitter.com (not embeddable) are skipped."""
+    db = sqlite3.connect(sqlite_filename)
+    try:
+        rows = db.execute(
+            """SELECT m.media_url, m.media_id, t.tweet_id, m.type
+            FROM tweet_media AS m LEFT JOIN tweet_match_media AS t
+            ON m.media_id = t.media_id;""").fetchall()
+    finally:
+        db.close()
+    items = []
+    for url, media_id, tweet_id, mtype in rows:
+        if not url or urlparse(url).netloc.endswith("twitter.com"):
+            continue
+        items.append(MediaItem(url, media_id, tweet_id, mtype))
+    return items
+
+
+class DownloadError(Exception):
+    """Raised when a media file can not be downloaded."""
+
+    def __init__(self, url: str, status_code: Union[int, None], reason: str = ""):
+        self.url = url
+        self.status_code = status_code
+        super().__init__(f"Could not download {url}: {status_code} {reason}")
+
+
+class DownloadReport:
+    def __init__(self):
+        """Outcome of `MediaDownloader.download`."""
+        self.downloaded = 0
+        self.duplicates = 0
+        self.skipped = 0
+        self.resumed = 0
+        self.bytes = 0
+        self.failed: List[Dict[str, str]] = []
+
+    def as_dict(self) -> dict:
+        return {
+            "downloaded": self.downloaded,
+            "duplicates": self.duplicates,
+            "skipped": self.skipped,
+            "resumed": self.resumed,
+            "bytes": self.bytes,
+            "failed": len(self.failed),
+        }
+
+    def __str__(self) -> str:
+        return (
+            f"{self.downloaded} downloaded ({self.bytes} bytes, {self.resumed} resumed), "
+            f"{self.duplicates} duplicates, {self.skipped} already archived, {len(self.failed)} failed"
+        )
+
+
+class MediaDownloader:
+    def __init__(
+        self, directory: str, workers: int = 4, chunk_size: int = 1 << 16,
+        timeout: float = 30.0, retries: int = 2, headers: Union[Dict[str, str], None] = None
+    ):
+        """Content addressed media archive.
+
+        Args:
+            directory (str): Archive directory, created if missing.
+            workers (int, optional): Concurrent downloads. Defaults to 4.
+            chunk_size (int, optional): Bytes read per chunk. Defaults to 65536.
+            timeout (float, optional): Seconds before a stalled request fails. Defaults to 30.0.
+            retries (int, optional): Extra attempts per file, each one resuming the
+                partial download. Defaults to 2.
+            headers (Union[Dict[str, str], None], optional): Headers sent with every request.
+        """
+        self.directory = directory
+        self.objects_dir = os.path.join(directory, "objects")
+        self.partial_dir = os.path.join(directory, "partial")
+        self.manifest_file = os.path.join(directory, "manifest.jsonl")
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.partial_dir, exist_ok=True)
+        self.workers = max(1, workers)
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.retries = retries
+        self.headers = headers or {}
+        self.lock = threading.Lock()
+        self._local = threading.local()
+        self.manifest: Dict[str, dict] = self.load_manifest()
+
+    def load_manifest(self) -> Dict[str, dict]:
+        """Manifest records by URL. Records whose file is missing are ignored."""
+        manifest = {}
+        if os.path.isfile(self.manifest_file):
+            with open(self.manifest_file, "r") as handler:
+                for line in handler:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if os.path.isfile(os.path.join(self.directory, record["path"])):
+                        manifest[record["url"]] = record
+        return manifest
+
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+            session.headers.update(self.headers)
+        return session
+
+    @staticmethod
+    def extension(url: str) -> str:
+        name = urlparse(url).path.rsplit("/", 1)[-1].split(":", 1)[0]
+        return os.path.splitext(name)[1].lower()
+
+    def object_path(self, digest: str, extension: str = "") -> str:
+        """Path, relative to the archive directory, of a file with the given SHA-256."""
+        return os.path.join("objects", digest[:2], digest[2:4], digest + extension)
+
+    def partial_path(self, url: str) -> str:
+        return os.path.join(self.partial_dir, md5(url.encode("utf-8")).hexdigest() + ".part")
+
+    def _transfer(self, url: str, part: str) -> bool:
+        """Downloads `url` into `part`, continuing an existing partial file.
+
+        Returns:
+            bool: True if a partial file was resumed.
+        """
+        offset = os.path.getsize(part) if os.path.isfile(part) else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        with self._session().get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+            if response.status_code == 416 and offset:
+                # The partial file already holds the whole content.
+                return True
+            if response.status_code == 206 and offset:
+                mode, resumed = "ab", True
+            elif response.status_code == 200:
+                mode, resumed = "wb", False
+            else:
+                raise DownloadError(url, response.status_code, response.reason)
+            with open(part, mode) as target:
+                for chunk in response.iter_content(self.chunk_size):
+                    target.write(chunk)
+        return resumed
+
+    def fetch(self, item: MediaItem) -> dict:
+        """Downloads one item into the archive and appends it to the manifest.
+
+        Returns:
+            dict: Manifest record, with `status` "downloaded" or "duplicate".
+        """
+        part = self.partial_path(item.url)
+        resumed = False
+        for attempt in range(self.retries + 1):
+            try:
+                resumed = self._transfer(item.url, part) or resumed
+                break
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as err:
+                if attempt >= self.retries:
+                    raise
+                logging.debug(f"Retrying {item.url} after: {err}")
+        digest = sha256()
+        with open(part, "rb") as source:
+            for chunk in iter(lambda: source.read(self.chunk_size), b""):
+                digest.update(chunk)
+        size = os.path.getsize(part)
+        relative = self.object_path(digest.hexdigest(), MediaDownloader.extension(item.url))
+        target = os.path.join(self.directory, relative)
+        with self.lock:
+            if os.path.isfile(target):
+                os.remove(part)
+                status = "duplicate"
+            else:
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                move(part, target)
+                status = "downloaded"
+            record = {
+                "url": item.url,
+                "media_id": item.media_id,
+                "tweet_id": item.tweet_id,
+                "type": item.mtype,
+                "rendition": item.rendition,
+                "sha256": digest.hexdigest(),
+                "path": relative,
+                "bytes": size,
+                "resumed": resumed,
+                "status": status,
+                "timestamp": datetime.now().timestamp(),
+            }
+            self.manifest[item.url] = record
+            with open(self.manifest_file, "a") as handler:
+                handler.write(json.dumps(record) + "\n")
+        if METRICS.enabled:
+            METRICS.inc("media_downloads_total", status=status)
+            METRICS.inc("media_download_bytes_total", size)
+        return record
+
+    def download(
+        self, items: Iterable[MediaItem],
+        progress: Union[Callable[[int, int], None], None] = None
+    ) -> DownloadReport:
+        """Downloads every item not archived yet with the worker pool.
+        Failures are collected in the report, their partial files are kept
+        so the next run resumes them.
+
+        Args:
+            items (Iterable[MediaItem]): Files to download, repeated URLs are fetched once.
+            progress (Union[Callable[[int, int], None], None], optional):
+                Called after each file with (files done, files to download).
+        """
+        report = DownloadReport()
+        pending, seen = [], set()
+        for item in items:
+            if item.url in seen:
+                continue
+            seen.add(item.url)
+            if item.url in self.manifest:
+                report.skipped += 1
+            else:
+                pending.append(item)
+        done = [0]
+
+        def run(item: MediaItem):
+            try:
+                record = self.fetch(item)
+            except Exception as err:
+                logging.debug(f"Media download failed: {err}")
+                record = {"url": item.url, "status": "failed", "error": str(err)}
+            with self.lock:
+                if record["status"] == "failed":
+                    report.failed.append(record)
+                else:
+                    if record["status"] == "duplicate":
+                        report.duplicates += 1
+                    else:
+                        report.downloaded += 1
+                        report.bytes += record["bytes"]
+                    report.resumed += int(record["resumed"])
+                done[0] += 1
+                if progress is not None:
+                    progress(done[0], len(pending))
+
+        if self.workers > 1 and len(pending) > 1:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                list(pool.map(run, pending))
+        else:
+            for item in pending:
+                run(item)
+        return report
@@ -0,0 +1,292 @@
+import json, logging
+import os
+import re
+import sqlite3
+import threading
+import numpy as np
+from typing import Union, List, Dict, Iterable, Set
+from urllib.parse import urlsplit, urlunsplit
+from .analysis import BaseTweetAnalyzer, scan_entities
+from .batch import iter_cached_tweets
+from .cache import Cache
+
+"""
+Inverted index of tweet entities. Normalized hashtags (`#rickyrenuncia`),
+mentions (`@screen_name`) and expanded URLs map to sorted posting lists of
+tweet IDs, so entity queries are array intersections instead of scans.
+
+    index = EntityIndex.from_cache(session.cache, "./.entity_index/")
+    index.all_of("#RickyRenuncia", "@ricardorossello")
+    index.any_of("#RickyRenuncia", "#RickyVeteYa")
+
+Layout of the index directory:
+    postings.npz   compacted terms with their posting lists (CSR arrays)
+    delta.jsonl    tweets indexed since the last `save`, replayed on load
+"""
+
+HASHTAG_RE = re.compile(r"(?:^|[^\w&/])#(\w+)")
+MENTION_RE = re.compile(r"(?:^|[^\w])@(\w{1,15})")
+URL_RE = re.compile(r"https?://\S+")
+
+
+def normalize_url(url: str) -> str:
+    """Lower case scheme and host, no fragment nor trailing slash."""
+    parts = urlsplit(url.strip())
+    path = parts.path.rstrip("/")
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, parts.query, ""))
+
+
+def normalize_term(term: str) -> str:
+    """Index term of a hashtag ("#Tag"), mention ("@user") or URL. Hashtags and
+    mentions are case insensitive; anything else is treated as a URL."""
+    term = term.strip()
+    if term[:1] in ("#", "@"):
+        return term[0] + term[1:].lower()
+    return normalize_url(term)
+
+
+def tweet_terms(data: dict, recursive: bool = False) -> Set[str]:
+    """Index terms of a tweet in the v1.1 shape.
+
+    Args:
+        data (dict): Tweet data dictionary.
+        recursive (bool, optional): Include the entities of the retweeted or
+            quoted tweets. Defaults to False.
+    """
+    found = scan_entities(data, recursive)
+    terms = set()
+    for _, hashtag in found.hashtags:
+        terms.add("#" + hashtag.get("text", "").lower())
+    for _, mention in found.user_mentions:
+        terms.add("@" + mention.get("screen_name", "").lower())
+    for _, url in found.urls:
+        expanded = url.get("expanded_url") or url.get("url")
+        if expanded:
+            terms.add(normalize_url(expanded))
+    terms.discard("#")
+    terms.discard("@")
+    return terms
+
+
+def text_terms(text: str) -> Set[str]:
+    """Index terms found in tweet text, used when no entities are available.
+    URLs in text are usually t.co links, not the expanded URL."""
+    terms = {"#" + tag.lower() for tag in HASHTAG_RE.findall(text or "")}
+    terms.update("@" + name.lower() for name in MENTION_RE.findall(text or ""))
+    terms.update(normalize_url(url) for url in URL_RE.findall(text or ""))
+    return terms
+
+
+class EntityIndex:
+    def __init__(self, directory: Union[str, None] = None, recursive: bool = False):
+        """Opens the index stored in `directory`, or an in memory index when None.
+
+        Tweets are indexed once by ID. Added tweets are appended to the delta
+        log right away and merged into the posting lists by `save`.
+
+        Args:
+            directory (Union[str, None], optional): Directory of the index files. Defaults to None.
+            recursive (bool, optional): Also index the entities of retweeted or
+                quoted tweets under the referencing tweet. Defaults to False.
+        """
+        self.directory = directory
+        self.recursive = recursive
+        self.lock = threading.Lock()
+        self.terms: Dict[str, int] = {}
+        self.indptr = np.zeros(1, dtype=np.int64)
+        self.postings = np.zeros(0, dtype=np.int64)
+        self.pending: Dict[str, List[int]] = {}
+        self.indexed: Set[int] = set()
+        if directory is not None:
+            if not os.path.isdir(directory):
+                assert not os.path.isfile(directory), f"'{directory}' is a file not a directory!"
+                os.makedirs(directory)
+            self._load()
+
+    def _postings_file(self) -> str:
+        return os.path.join(self.directory, "postings.npz")
+
+    def _delta_file(self) -> str:
+        return os.path.join(self.directory, "delta.jsonl")
+
+    def _load(self):
+        if os.path.isfile(self._postings_file()):
+            with np.load(self._postings_file(), allow_pickle=False) as stored:
+                self.terms = {term: row for row, term in enumerate(stored["terms"].tolist())}
+                self.indptr = stored["indptr"]
+                self.postings = stored["postings"]
+                self.indexed = set(stored["tweets"].tolist())
+        if os.path.isfile(self._delta_file()):
+            with open(self._delta_file(), "r") as handler:
+                for line in handler:
+                    try:
+                        tweet_id, terms = json.loads(line)
+                    except ValueError:
+                        # Last line of an interrupted write.
+                        continue
+                    self._add_terms(tweet_id, terms)
+
+    def __len__(self) -> int:
+        """Number of indexed tweets."""
+        return len(self.indexed)
+
+    def _add_terms(self, tweet_id: int, terms: Iterable[str]) -> bool:
+        if tweet_id in self.indexed:
+            return False
+        self.indexed.add(tweet_id)
+        for term in terms:
+            self.pending.setdefault(term, []).append(tweet_id)
+        return True
+
+    def add(self, tweet_id: Union[str, int], terms: Iterable[str]) -> bool:
+        """Indexes a tweet under already normalized `terms`.
+
+        Returns:
+            bool: False if the tweet was already indexed.
+        """
+        tweet_id = int(tweet_id)
+        terms = sorted(set(terms))
+        with self.lock:
+            if not self._add_terms(tweet_id, terms):
+                return False
+            if self.directory is not None:
+                with open(self._delta_file(), "a") as handler:
+                    handler.write(json.dumps([tweet_id, terms]) + "\n")
+        return True
+
+    def append(self, tweets: Iterable[Union[BaseTweetAnalyzer, dict]]) -> int:
+        """Indexes tweets in the v1.1 shape (or analyzers) not indexed yet.
+
+        Returns:
+            int: Tweets added.
+        """
+        added = 0
+        for tweet in tweets:
+            data = tweet.data if isinstance(tweet, BaseTweetAnalyzer) else tweet
+            tweet_id = data.get("id_str", data.get("id"))
+            if tweet_id is None or int(tweet_id) in self.indexed:
+                continue
+            added += self.add(tweet_id, tweet_terms(data, self.recursive))
+        return added
+
+    @staticmethod
+    def from_cache(
+        cache: Cache, directory: Union[str, None] = None, recursive: bool = False
+    ) -> "EntityIndex":
+        """Index of every tweet stored in a cache, saved if `directory` is given."""
+        index = EntityIndex(directory, recursive)
+        index.append(iter_cached_tweets(cache))
+        if directory is not None:
+            index.save()
+        return index
+
+    @staticmethod
+    def from_db(sqlite_filename: str, directory: Union[str, None] = None) -> "EntityIndex":
+        """Index of the `tweet_auto_detail` table of a JsonLInteractiveClassifier
+        database. Only the text is stored there, so terms come from `text_terms`."""
+        index = EntityIndex(directory)
+        db = sqlite3.connect(sqlite_filename)
+        try:
+            for tweet_id, text in db.execute("SELECT tweet_id, text FROM tweet_auto_detail;"):
+                if str(tweet_id).isnumeric():
+                    index.add(tweet_id, text_terms(text))
+        finally:
+            db.close()
+        if directory is not None:
+            index.save()
+        return index
+
+    def compact(self):
+        """Merges the pending additions into the CSR posting lists."""
+        with self.lock:
+            if not self.pending:
+                return
+            terms = list(self.terms.keys())
+            lists = [self.postings[self.indptr[row]:self.indptr[row + 1]] for row in range(len(terms))]
+            for term, ids in self.pending.items():
+                ids = np.array(ids, dtype=np.int64)
+                row = self.terms.get(term)
+                if row is None:
+                    self.terms[term] = len(terms)
+                    terms.append(term)
+                    lists.append(np.unique(ids))
+                else:
+                    lists[row] = np.union1d(lists[row], ids)
+            lengths = np.array([len(ids) for ids in lists], dtype=np.int64)
+            self.indptr = np.zeros(len(lists) + 1, dtype=np.int64)
+            np.cumsum(lengths, out=self.indptr[1:])
+            self.postings = np.concatenate(lists) if lists else np.zeros(0, dtype=np.int64)
+            self.pending = {}
+
+    def save(self):
+        """Compacts the index and writes it to `directory`, emptying the delta log."""
+        assert self.directory is not None, "In memory index, no directory to save to."
+        self.compact()
+        with self.lock:
+            terms = list(self.terms.keys())
+            temporary = os.path.join(self.directory, "postings.tmp.npz")
+            np.savez(
+                temporary, terms=np.array(terms, dtype=str), indptr=self.indptr,
+                postings=self.postings, tweets=np.array(sorted(self.indexed), dtype=np.int64))
+            os.replace(temporary, self._postings_file())
+            open(self._delta_file(), "w").close()
+        logging.debug(f"Entity index saved with {len(terms)} terms")
+
+    def lookup(self, term: str) -> np.ndarray:
+        """Sorted tweet IDs indexed under a hashtag, mention or URL."""
+        term = normalize_term(term)
+        row = self.terms.get(term)
+        ids = self.postings[self.indptr[row]:self.indptr[row + 1]] if row is not None else np.zeros(0, dtype=np.int64)
+        pending = self.pending.get(term)
+        if pending:
+            ids = np.union1d(ids, np.array(pending, dtype=np.int64))
+        return ids
+
+    def count(self, term: str) -> int:
+        return len(self.lookup(term))
+
+    def all_of(self, *terms: str) -> np.ndarray:
+        """Sorted tweet IDs indexed under every term, shortest lists intersected first."""
+        if not terms:
+            return np.zeros(0, dtype=np.int64)
+        lists = sorted((self.lookup(term) for term in terms), key=len)
+        result = lists[0]
+        for ids in lists[1:]:
+            if len(result) == 0:
+                break
+            result = np.intersect1d(result, ids, assume_unique=True)
+        return result
+
+    def any_of(self, *terms: str) -> np.ndarray:
+        """Sorted tweet IDs indexed under at least one term."""
+        if not terms:
+            return np.zeros(0, dtype=np.int64)
+        return np.unique(np.concatenate([self.lookup(term) for term in terms]))
+
+    def search(
+        self, all_of: Iterable[str] = (), any_of: Iterable[str] = (), none_of: Iterable[str] = ()
+    ) -> np.ndarray:
+        """Tweets matching every term of `all_of`, at least one of `any_of` and
+        none of `none_of`. An empty `all_of` and `any_of` matches nothing."""
+        all_of, any_of = list(all_of), list(any_of)
+        if all_of and any_of:
+            result = np.intersect1d(self.all_of(*all_of), self.any_of(*any_of), assume_unique=True)
+        elif all_of:
+            result = self.all_of(*all_of)
+        else:
+            result = self.any_of(*any_of)
+        none_of = list(none_of)
+        if none_of and len(result) > 0:
+            result = np.setdiff1d(result, self.any_of(*none_of), assume_unique=True)
+        return result
+
+    def top_terms(self, k: int = 10, prefix: str = "") -> List[tuple]:
+        """Most used terms, optionally only hashtags ("#") or mentions ("@").
+
+        Returns:
+            List[tuple]: (term, tweets) pairs, most used first.
+        """
+        self.compact()
+        terms = [term for term in self.terms if term.startswith(prefix)]
+        counts = [int(self.indptr[self.terms[t] + 1] - self.indptr[self.terms[t]]) for t in terms]
+        return sorted(zip(terms, counts), key=lambda pair: (-pair[1], pair[0]))[:k]
@@ -0,0 +1,296 @@
+import logging
+import sqlite3
+import numpy as np
+from array import array
+from typing import Union, List, Dict, Tuple, Iterable
+from .analysis import BaseTweetAnalyzer
+
+"""
+Retweet, quote and reply graph of a corpus. Tweets are numbered with compact
+integer node IDs as they are added and every tweet keeps at most one
+"based on" parent (the retweeted or quoted tweet, as `isBasedOn`) and one
+reply parent, so for any selection of edge kinds the graph is a forest.
+Children lists are kept in CSR arrays built on demand, which makes cascade
+size, depth and root queries linear in the number of nodes.
+
+    graph = TweetGraph.from_analyzers(analyzers)
+    graph.cascade_size("1150000000000000000")
+    graph.top_cascades(10)
+"""
+
+RETWEET = 1
+QUOTE = 2
+REPLY = 3
+EDGE_KINDS: Dict[str, int] = {"retweet": RETWEET, "quote": QUOTE, "reply": REPLY}
+BASED_ON = ("retweet", "quote")
+TweetID = Union[str, int]
+
+
+def _tweet_id(value) -> Union[int, None]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class _Forest:
+    def __init__(self, parent: np.ndarray):
+        """CSR children arrays of a parent array, plus depth and root of every node."""
+        n = len(parent)
+        self.parent = parent
+        has_parent = parent >= 0
+        # Children of node i are children[indptr[i]:indptr[i + 1]].
+        self.children = np.flatnonzero(has_parent)[np.argsort(parent[has_parent], kind="stable")]
+        counts = np.bincount(parent[has_parent], minlength=n)
+        self.indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(counts, out=self.indptr[1:])
+
+        # Level by level from the roots, nodes in cycles are never reached
+        # and keep depth -1.
+        self.depth = np.full(n, -1, dtype=np.int64)
+        self.root = np.full(n, -1, dtype=np.int64)
+        frontier = np.flatnonzero(~has_parent)
+        self.depth[frontier] = 0
+        self.root[frontier] = frontier
+        self.levels: List[np.ndarray] = []
+        level = 0
+        while len(frontier) > 0:
+            self.levels.append(frontier)
+            frontier = self.expand(frontier)
+            level += 1
+            self.depth[frontier] = level
+            self.root[frontier] = self.root[self.parent[frontier]]
+        if np.any(self.depth < 0):
+            logging.warning(f"Graph has {int(np.sum(self.depth < 0))} nodes in reference cycles.")
+
+        # Subtree sizes accumulated from the deepest level up.
+        self.size = np.ones(n, dtype=np.int64)
+        self.size[self.depth < 0] = 0
+        for nodes in reversed(self.levels[1:]):
+            np.add.at(self.size, self.parent[nodes], self.size[nodes])
+
+    def expand(self, nodes: np.ndarray) -> np.ndarray:
+        """Children of every node in `nodes`, concatenated."""
+        starts, ends = self.indptr[nodes], self.indptr[nodes + 1]
+        counts = ends - starts
+        total = int(counts.sum())
+        if total == 0:
+            return np.zeros(0, dtype=np.int64)
+        offsets = np.repeat(starts - np.cumsum(counts) + counts, counts)
+        return self.children[offsets + np.arange(total)]
+
+
+class TweetGraph:
+    def __init__(self):
+        """Empty graph, see `add`, `from_analyzers` and `from_db`."""
+        self.index: Dict[int, int] = {}
+        self.ids = array("q")
+        # Whether the tweet itself was added, or is only referenced by others.
+        self.known = array("b")
+        self.based_on = array("q")
+        self.based_on_kind = array("b")
+        self.reply_to = array("q")
+        self._forests: Dict[Tuple[int, ...], _Forest] = {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, tweet_id: TweetID) -> bool:
+        return _tweet_id(tweet_id) in self.index
+
+    def _node(self, tweet_id: int) -> int:
+        node = self.index.get(tweet_id)
+        if node is None:
+            node = self.index[tweet_id] = len(self.ids)
+            self.ids.append(tweet_id)
+            self.known.append(0)
+            self.based_on.append(-1)
+            self.based_on_kind.append(0)
+            self.reply_to.append(-1)
+        return node
+
+    def node(self, tweet_id: TweetID) -> int:
+        """Node ID of a tweet, raises KeyError if it is not in the graph."""
+        return self.index[_tweet_id(tweet_id)]
+
+    def tweet_id(self, node: int) -> str:
+        return str(self.ids[node])
+
+    def add_edge(self, tweet_id: TweetID, parent_id: TweetID, kind: str = "retweet"):
+        """Records that `tweet_id` retweets, quotes or replies to `parent_id`.
+        A later edge of the same family replaces the previous one.
+
+        Args:
+            tweet_id (TweetID): Referencing tweet.
+            parent_id (TweetID): Referenced tweet.
+            kind (str, optional): "retweet", "quote" or "reply". Defaults to "retweet".
+        """
+        child, parent = _tweet_id(tweet_id), _tweet_id(parent_id)
+        if child is None or parent is None or child == parent:
+            return
+        child, parent = self._node(child), self._node(parent)
+        if EDGE_KINDS[kind] == REPLY:
+            self.reply_to[child] = parent
+        else:
+            self.based_on[child] = parent
+            self.based_on_kind[child] = EDGE_KINDS[kind]
+        self._forests = {}
+
+    def add(self, tweet: Union[BaseTweetAnalyzer, dict]) -> int:
+        """Adds a tweet, its edges and the tweets it embeds (retweeted or
+        quoted, recursively).
+
+        Args:
+            tweet (Union[BaseTweetAnalyzer, dict]): Analyzer or tweet data in the v1.1 shape.
+
+        Returns:
+            int: Node ID of the tweet.
+        """
+        data = tweet.data if isinstance(tweet, BaseTweetAnalyzer) else tweet
+        top = None
+        while data is not None:
+            node = self._node(int(data.get("id_str", data.get("id"))))
+            self.known[node] = 1
+            if top is None:
+                top = node
+            reply = data.get("in_reply_to_status_id_str", data.get("in_reply_to_status_id"))
+            if reply is not None:
+                self.add_edge(self.ids[node], reply, "reply")
+            nested = data.get("retweeted_status", None)
+            kind = "retweet"
+            if nested is None:
+                nested = data.get("quoted_status", None)
+                kind = "quote"
+                if nested is None and data.get("quoted_status_id_str"):
+                    # Quote whose quoted tweet was not embedded (deleted or protected).
+                    self.add_edge(self.ids[node], data["quoted_status_id_str"], "quote")
+            if nested is not None:
+                self.add_edge(self.ids[node], nested.get("id_str", nested.get("id")), kind)
+            data = nested
+        self._forests = {}
+        return top
+
+    def extend(self, tweets: Iterable[Union[BaseTweetAnalyzer, dict]]) -> int:
+        """Adds many tweets, see `add`.
+
+        Returns:
+            int: Nodes in the graph.
+        """
+        for tweet in tweets:
+            self.add(tweet)
+        return len(self)
+
+    @staticmethod
+    def from_analyzers(tweets: Iterable[Union[BaseTweetAnalyzer, dict]]) -> "TweetGraph":
+        graph = TweetGraph()
+        graph.extend(tweets)
+        return graph
+
+    @staticmethod
+    def from_db(sqlite_filename: str) -> "TweetGraph":
+        """Graph of the `tweet_auto_detail` table of a JsonLInteractiveClassifier
+        database. The table only stores `isBasedOn`, so edges whose text starts
+        with "RT @" are retweets and the rest quotes; replies are not recorded.
+        """
+        graph = TweetGraph()
+        db = sqlite3.connect(sqlite_filename)
+        try:
+            rows = db.execute('SELECT tweet_id, isBasedOn, text FROM tweet_auto_detail;')
+            for tweet_id, based_on, text in rows:
+                if _tweet_id(tweet_id) is None:
+                    continue
+                graph.known[graph._node(int(tweet_id))] = 1
+                if based_on:
+                    kind = "retweet" if (text or "").startswith("RT @") else "quote"
+                    graph.add_edge(tweet_id, based_on, kind)
+        finally:
+            db.close()
+        graph._forests = {}
+        return graph
+
+    def parents(self, kinds: Iterable[str] = BASED_ON) -> np.ndarray:
+        """Parent node of every node using only edges of `kinds`, -1 for none.
+        A based on edge has priority over a reply edge when both are selected."""
+        codes = {EDGE_KINDS[kind] for kind in kinds}
+        parent = np.full(len(self), -1, dtype=np.int64)
+        if REPLY in codes:
+            parent = np.frombuffer(self.reply_to, dtype=np.int64).copy()
+        based_on = np.frombuffer(self.based_on, dtype=np.int64)
+        based_kind = np.frombuffer(self.based_on_kind, dtype=np.int8)
+        selected = np.isin(based_kind, [c for c in codes if c != REPLY])
+        parent[selected] = based_on[selected]
+        return parent
+
+    def forest(self, kinds: Iterable[str] = BASED_ON) -> _Forest:
+        key = tuple(sorted(EDGE_KINDS[kind] for kind in kinds))
+        forest = self._forests.get(key)
+        if forest is None:
+            forest = self._forests[key] = _Forest(self.parents(kinds))
+        return forest
+
+    def children(self, tweet_id: TweetID, kinds: Iterable[str] = BASED_ON) -> List[str]:
+        """Tweets directly referencing `tweet_id`."""
+        forest = self.forest(kinds)
+        node = self.node(tweet_id)
+        return [self.tweet_id(c) for c in forest.children[forest.indptr[node]:forest.indptr[node + 1]].tolist()]
+
+    def cascade(self, tweet_id: TweetID, kinds: Iterable[str] = BASED_ON) -> List[str]:
+        """Every tweet referencing `tweet_id` directly or transitively, by level.
+        Empty for tweets in a reference cycle."""
+        forest = self.forest(kinds)
+        node = self.node(tweet_id)
+        if forest.depth[node] < 0:
+            return []
+        frontier = np.array([node], dtype=np.int64)
+        found = []
+        while len(frontier) > 0:
+            frontier = forest.expand(frontier)
+            found.extend(frontier.tolist())
+        return [self.tweet_id(n) for n in found]
+
+    def cascade_size(self, tweet_id: TweetID, kinds: Iterable[str] = BASED_ON) -> int:
+        """Number of tweets in the cascade of `tweet_id`, not counting itself,
+        0 if it is in a reference cycle."""
+        return max(int(self.forest(kinds).size[self.node(tweet_id)]) - 1, 0)
+
+    def depth(self, tweet_id: TweetID, kinds: Iterable[str] = BASED_ON) -> int:
+        """Edges between `tweet_id` and its root, -1 if it is in a reference cycle."""
+        return int(self.forest(kinds).depth[self.node(tweet_id)])
+
+    def root(self, tweet_id: TweetID, kinds: Iterable[str] = BASED_ON) -> Union[str, None]:
+        """Original tweet at the start of the chain of `tweet_id`."""
+        root = int(self.forest(kinds).root[self.node(tweet_id)])
+        return self.tweet_id(root) if root >= 0 else None
+
+    def cascade_depth(self, tweet_id: TweetID, kinds: Iterable[str] = BASED_ON) -> int:
+        """Longest chain of references below `tweet_id`, -1 if it is in a reference cycle."""
+        forest = self.forest(kinds)
+        node = self.node(tweet_id)
+        if forest.depth[node] < 0:
+            return -1
+        frontier = np.array([node], dtype=np.int64)
+        depth = -1
+        while len(frontier) > 0:
+            frontier = forest.expand(frontier)
+            depth += 1
+        return depth
+
+    def top_cascades(self, k: int = 10, kinds: Iterable[str] = BASED_ON) -> List[Tuple[str, int]]:
+        """Original tweets (roots) with the largest cascades.
+
+        Returns:
+            List[Tuple[str, int]]: (tweet ID, cascade size) pairs, largest first.
+        """
+        forest = self.forest(kinds)
+        roots = np.flatnonzero(forest.parent < 0)
+        sizes = forest.size[roots] - 1
+        k = min(k, len(roots))
+        if k <= 0:
+            return []
+        best = np.argpartition(-sizes, k - 1)[:k]
+        best = best[np.lexsort((self.ids_array()[roots[best]], -sizes[best]))]
+        return [(self.tweet_id(int(roots[i])), int(sizes[i])) for i in best]
+
+    def ids_array(self) -> np.ndarray:
+        """Tweet ID of every node as int64, indexed by node ID."""
+        return np.frombuffer(self.ids, dtype=np.int64).copy()
@@ -0,0 +1,31 @@
+import json
+from typing import Union
+
+"""
+JSON backend selection. Uses `orjson` when it is installed and falls back
+to the standard library `json` module otherwise.
+"""
+
+try:
+    import orjson
+
+    BACKEND = "orjson"
+
+    def loads(data: Union[str, bytes]):
+        """Decode JSON text or bytes using orjson."""
+        return orjson.loads(data)
+
+    def dumps(obj) -> str:
+        """Encode an object as JSON text using orjson."""
+        return orjson.dumps(obj).decode("utf-8")
+
+except ImportError:
+    BACKEND = "json"
+
+    def loads(data: Union[str, bytes]):
+        """Decode JSON text or bytes using the standard library."""
+        return json.loads(data)
+
+    def dumps(obj) -> str:
+        """Encode an object as JSON text using the standard library."""
+        return json.dumps(obj)
@@ -0,0 +1,191 @@
+import argparse, logging
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+from typing import Union, Tuple, List, Dict, Callable
+from .session import TSess
+from .mockserver import MockTwitterServer, SyntheticTweets, synthetic_ids
+
+"""
+Load test driver for `TSess` fetch modes. Usually run against a
+`MockTwitterServer` so results can be compared between changes offline.
+
+    python -m tweet_requester.loadtest --tweets 2000 --latency 0.005
+"""
+
+FETCH_MODES = ["load_tweet_11", "load_tweet_batch_11", "load_tweet", "load_tweet_batch"]
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """Nearest rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = int(round(p / 100.0 * (len(sorted_values) - 1)))
+    return sorted_values[min(max(rank, 0), len(sorted_values) - 1)]
+
+
+class LoadTestReport:
+    def __init__(
+        self, mode: str, elapsed: float, latencies: List[float],
+        tweets: int, status_codes: Dict[Union[int, None], int]
+    ):
+        """Results of a load test run.
+
+        Args:
+            mode (str): Fetch mode used.
+            elapsed (float): Wall clock seconds of the run.
+            latencies (List[float]): Seconds per request.
+            tweets (int): Tweets requested.
+            status_codes (Dict[Union[int, None], int]): Count of responses by status code.
+        """
+        self.mode = mode
+        self.elapsed = elapsed
+        self.latencies = sorted(latencies)
+        self.requests = len(latencies)
+        self.tweets = tweets
+        self.status_codes = status_codes
+
+    @property
+    def requests_per_second(self) -> float:
+        return self.requests / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def tweets_per_second(self) -> float:
+        return self.tweets / self.elapsed if self.elapsed > 0 else 0.0
+
+    def latency(self, p: float) -> float:
+        return percentile(self.latencies, p)
+
+    def as_dict(self) -> dict:
+        return {
+            "mode": self.mode,
+            "elapsed": self.elapsed,
+            "requests": self.requests,
+            "tweets": self.tweets,
+            "requests_per_second": self.requests_per_second,
+            "tweets_per_second": self.tweets_per_second,
+            "latency_p50": self.latency(50),
+            "latency_p90": self.latency(90),
+            "latency_p99": self.latency(99),
+            "status_codes": {str(k): v for k, v in self.status_codes.items()},
+        }
+
+    def __str__(self) -> str:
+        return (
+            f"{self.mode}: {self.requests} requests / {self.tweets} tweets in {self.elapsed:.3f}s | "
+            f"{self.requests_per_second:.1f} req/s {self.tweets_per_second:.1f} tweets/s | "
+            f"p50={self.latency(50)*1000:.2f}ms p90={self.latency(90)*1000:.2f}ms "
+            f"p99={self.latency(99)*1000:.2f}ms | codes={self.status_codes}"
+        )
+
+
+def _fetch_call(session: TSess, mode: str) -> Callable[[List[str]], Union[int, None]]:
+    """Wraps a TSess fetch mode into a callable that returns a status code."""
+    if mode == "load_tweet_11":
+        return lambda ids: session.load_tweet_11(ids[0])[1]
+    elif mode == "load_tweet_batch_11":
+        return lambda ids: session.load_tweet_batch_11(ids)[1]
+    elif mode == "load_tweet":
+        return lambda ids: session.load_tweet(ids[0])[1]
+    elif mode == "load_tweet_batch":
+        return lambda ids: 200 if session.load_tweet_batch(ids) is not None else None
+    raise Exception(f"Invalid mode: {mode}. Use one of {FETCH_MODES}.")
+
+
+def run_load_test(
+    session: TSess, ids: List[str], mode: str = "load_tweet_11",
+    batch_size: int = 100, concurrency: int = 1
+) -> LoadTestReport:
+    """Fetches `ids` through a `TSess` fetch mode and measures throughput.
+
+    Args:
+        session (TSess): Session under test, usually pointed at a MockTwitterServer.
+        ids (List[str]): Tweet IDs to request.
+        mode (str, optional): One of FETCH_MODES. Defaults to "load_tweet_11".
+        batch_size (int, optional): IDs per request for batch modes. Defaults to 100.
+        concurrency (int, optional): Number of worker threads. Defaults to 1.
+
+    Returns:
+        LoadTestReport: Throughput and latency measurements.
+    """
+    call = _fetch_call(session, mode)
+    if "batch" in mode:
+        units = [ids[i:i + batch_size] for i in range(0, len(ids), batch_size)]
+    else:
+        units = [[tweet_id] for tweet_id in ids]
+
+    def timed(unit: List[str]) -> Tuple[float, Union[int, None]]:
+        start = perf_counter()
+        try:
+            code = call(unit)
+        except Exception as err:
+            logging.debug(f"Load test request failed: {err}")
+            code = None
+        return perf_counter() - start, code
+
+    start = perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(timed, units))
+    else:
+        results = [timed(unit) for unit in units]
+    elapsed = perf_counter() - start
+
+    status_codes: Dict[Union[int, None], int] = {}
+    for _, code in results:
+        status_codes[code] = status_codes.get(code, 0) + 1
+    return LoadTestReport(
+        mode=mode,
+        elapsed=elapsed,
+        latencies=[latency for latency, _ in results],
+        tweets=len(ids),
+        status_codes=status_codes,
+    )
+
+
+def mock_session(server: MockTwitterServer, directory: str, **kwargs) -> TSess:
+    """Creates a TSess pointed at `server` with its cache and error log inside `directory`."""
+    options = {
+        "bearer_token": "mock",
+        "cache_dir": os.path.join(directory, "cache"),
+        "error_log": os.path.join(directory, "errors.json"),
+        "sleep_time": 0.0,
+        "api_url": server.url,
+        "oembed_url": server.oembed_url,
+    }
+    options.update(kwargs)
+    return TSess(**options)
+
+
+def main(argv: Union[List[str], None] = None):
+    parser = argparse.ArgumentParser(description="Benchmark TSess against a local mock Twitter API.")
+    parser.add_argument("--tweets", type=int, default=1000)
+    parser.add_argument("--modes", nargs="+", default=FETCH_MODES, choices=FETCH_MODES)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--missing-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=int, default=1000000)
+    parser.add_argument("--warm", action="store_true", help="Repeat each mode with a warm cache.")
+    args = parser.parse_args(argv)
+
+    ids = synthetic_ids(args.tweets)
+    tweets = SyntheticTweets(missing_rate=args.missing_rate)
+    with MockTwitterServer(
+        latency=args.latency, error_rate=args.error_rate,
+        rate_limit=args.rate_limit, tweets=tweets
+    ) as server:
+        for mode in args.modes:
+            with tempfile.TemporaryDirectory() as directory:
+                session = mock_session(server, directory)
+                print(run_load_test(session, ids, mode, args.batch_size, args.concurrency))
+                if args.warm:
+                    report = run_load_test(session, ids, mode, args.batch_size, args.concurrency)
+                    report.mode += " (warm)"
+                    print(report)
+
+
+if __name__ == "__main__":
+    main()
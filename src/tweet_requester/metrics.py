@@ -0,0 +1,270 @@
+import json
+import threading
+from bisect import bisect_left
+from time import perf_counter, time
+from typing import Union, Tuple, List, Dict
+
+"""
+Lightweight in-process instrumentation for `TSess`, `Cache` and
+`JsonLInteractiveClassifier`.
+
+Metrics are disabled by default. Instrumented code checks `METRICS.enabled`
+before measuring anything, so the cost when disabled is one attribute
+lookup per call site.
+
+    from tweet_requester.metrics import METRICS
+    METRICS.enable()
+    ...
+    print(METRICS.to_prometheus())
+"""
+
+LATENCY_BUCKETS = [
+    0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+]
+LabelKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+def _key(name: str, labels: Dict[str, str]) -> LabelKey:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _label_str(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+
+class Histogram:
+    def __init__(self, buckets: List[float] = LATENCY_BUCKETS):
+        """Cumulative histogram with fixed upper bounds."""
+        self.bounds = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def as_dict(self) -> dict:
+        cumulative, buckets = 0, {}
+        for bound, count in zip(self.bounds + [float("inf")], self.counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min,
+            "max": self.max,
+            "mean": self.sum / self.count if self.count else None,
+            "buckets": buckets,
+        }
+
+
+class _NullTimer:
+    """Shared no-op context manager returned while metrics are disabled."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    def __init__(self, metrics: "Metrics", name: str, labels: Dict[str, str]):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.metrics.observe(self.name, perf_counter() - self.start, **self.labels)
+        return False
+
+
+class _Stage:
+    def __init__(self, metrics: "Metrics", stage: str, items: int):
+        self.metrics = metrics
+        self.stage = stage
+        self.items = items
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, *args):
+        if exc_type is None:
+            self.metrics.record_stage(self.stage, self.items, perf_counter() - self.start)
+        return False
+
+
+class Metrics:
+    def __init__(self, enabled: bool = False):
+        """Registry of counters, histograms and pipeline stage throughput.
+
+        Args:
+            enabled (bool, optional): Start collecting immediately. Defaults to False.
+        """
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.counters: Dict[LabelKey, float] = {}
+        self.histograms: Dict[LabelKey, Histogram] = {}
+        self.stages: Dict[str, List[float]] = {}
+        self.started = time()
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        with self.lock:
+            self.counters = {}
+            self.histograms = {}
+            self.stages = {}
+            self.started = time()
+
+    def inc(self, name: str, value: float = 1, **labels):
+        """Adds `value` to a counter."""
+        if not self.enabled:
+            return
+        key = _key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        """Records `value` (usually seconds) in a histogram."""
+        if not self.enabled:
+            return
+        key = _key(name, labels)
+        with self.lock:
+            histogram = self.histograms.get(key, None)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def timer(self, name: str, **labels) -> Union[_Timer, _NullTimer]:
+        """Context manager recording the duration of its block in a histogram."""
+        if not self.enabled:
+            return NULL_TIMER
+        return _Timer(self, name, labels)
+
+    def stage(self, stage: str, items: int = 1) -> Union[_Stage, _NullTimer]:
+        """Context manager recording `items` processed by a pipeline stage and
+        the time spent on them."""
+        if not self.enabled:
+            return NULL_TIMER
+        return _Stage(self, stage, items)
+
+    def record_stage(self, stage: str, items: int, seconds: float):
+        if not self.enabled:
+            return
+        with self.lock:
+            totals = self.stages.setdefault(stage, [0, 0.0])
+            totals[0] += items
+            totals[1] += seconds
+
+    def snapshot(self) -> dict:
+        """Returns a copy of every reading."""
+        with self.lock:
+            return {
+                "timestamp": time(),
+                "uptime": time() - self.started,
+                "counters": {
+                    name + _label_str(labels): value
+                    for (name, labels), value in self.counters.items()
+                },
+                "histograms": {
+                    name + _label_str(labels): histogram.as_dict()
+                    for (name, labels), histogram in self.histograms.items()
+                },
+                "stages": {
+                    stage: {
+                        "items": items,
+                        "seconds": seconds,
+                        "per_second": items / seconds if seconds > 0 else None,
+                    }
+                    for stage, (items, seconds) in self.stages.items()
+                },
+            }
+
+    def to_prometheus(self, prefix: str = "tweet_requester_") -> str:
+        """Readings in the Prometheus text exposition format."""
+        lines = []
+        with self.lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                lines.append(f"{prefix}{name}{_label_str(labels)} {value}")
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.bounds + [float("inf")], histogram.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else str(bound)
+                    bucket_labels = _label_str(labels + (("le", le),))
+                    lines.append(f"{prefix}{name}_bucket{bucket_labels} {cumulative}")
+                lines.append(f"{prefix}{name}_sum{_label_str(labels)} {histogram.sum}")
+                lines.append(f"{prefix}{name}_count{_label_str(labels)} {histogram.count}")
+            for stage, (items, seconds) in sorted(self.stages.items()):
+                lines.append(f'{prefix}stage_items_total{{stage="{stage}"}} {items}')
+                lines.append(f'{prefix}stage_seconds_total{{stage="{stage}"}} {seconds}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, filename: str):
+        """Writes the Prometheus text format to a file (textfile collector)."""
+        with open(filename, "w") as handler:
+            handler.write(self.to_prometheus())
+
+    def append_json_line(self, filename: str):
+        """Appends the current snapshot as one JSON line to a file."""
+        with open(filename, "a") as handler:
+            handler.write(json.dumps(self.snapshot()) + "\n")
+
+
+class TimedCursor:
+    """DB-API cursor wrapper that records statement timings by SQL verb."""
+
+    def __init__(self, cursor, metrics: Metrics):
+        self._cursor = cursor
+        self._metrics = metrics
+
+    @staticmethod
+    def _verb(sql: str) -> str:
+        words = sql.split(None, 1)
+        return words[0].upper() if words else ""
+
+    def execute(self, sql: str, *args):
+        with self._metrics.timer("sqlite_statement_seconds", statement=self._verb(sql)):
+            return self._cursor.execute(sql, *args)
+
+    def executemany(self, sql: str, *args):
+        with self._metrics.timer("sqlite_statement_seconds", statement=self._verb(sql)):
+            return self._cursor.executemany(sql, *args)
+
+    def fetchall(self):
+        with self._metrics.timer("sqlite_fetch_seconds"):
+            return self._cursor.fetchall()
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name: str):
+        return getattr(self._cursor, name)
+
+
+# Registry used by the package modules.
+METRICS = Metrics()
@@ -0,0 +1,467 @@
+import json, logging
+import random
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import sleep, time
+from typing import Union, Tuple, List, Dict
+from urllib.parse import urlparse, parse_qs
+
+"""
+Local stand-in for the Twitter endpoints used by `TSess`.
+
+Serves synthetic tweets for `1.1/statuses/lookup.json`, `2/tweets`,
+`2/tweets/<id>` and `oembed` so the session can be benchmarked and
+regression tested without network access or rate limit consumption.
+"""
+
+# Twitter snowflake epoch in milliseconds.
+TWITTER_EPOCH_MS = 1288834974657
+HASHTAGS = ["RickyRenuncia", "PuertoRico", "TelegramGate", "VeranoDel19", "Protesta"]
+LANGUAGES = ["es", "en", "es", "es", "und"]
+
+
+def synthetic_ids(
+    n: int, start: Union[datetime, None] = None, step_ms: int = 1000
+) -> List[str]:
+    """Generates `n` valid snowflake IDs spaced `step_ms` apart.
+
+    Args:
+        n (int): Number of IDs.
+        start (Union[datetime, None], optional): Time of the first ID. Defaults to 2019-07-13 UTC.
+        step_ms (int, optional): Milliseconds between IDs. Defaults to 1000.
+
+    Returns:
+        List[str]: Tweet IDs as strings.
+    """
+    if start is None:
+        start = datetime(2019, 7, 13, tzinfo=timezone.utc)
+    start_ms = int(start.timestamp() * 1000) - TWITTER_EPOCH_MS
+    return [str((start_ms + i * step_ms) << 22 | (i % 4096)) for i in range(n)]
+
+
+def _created_at(tweet_id: int) -> datetime:
+    return datetime.fromtimestamp(
+        ((tweet_id >> 22) + TWITTER_EPOCH_MS) / 1000, tz=timezone.utc)
+
+
+class SyntheticTweets:
+    """Deterministic generator of tweet payloads. The same ID always
+    produces the same tweet so responses are reproducible between runs.
+    """
+
+    def __init__(
+        self, missing_rate: float = 0.0, retweet_rate: float = 0.3,
+        quote_rate: float = 0.1, media_rate: float = 0.3, originals: int = 200,
+        seed: int = 0, media_url: Union[str, None] = None
+    ):
+        self.media_url = media_url
+        self.missing_rate = missing_rate
+        self.retweet_rate = retweet_rate
+        self.quote_rate = quote_rate
+        self.media_rate = media_rate
+        self.seed = seed
+        # Retweets and quotes reference a small pool of older "viral" tweets.
+        self.originals = synthetic_ids(
+            max(originals, 1), start=datetime(2019, 7, 1, tzinfo=timezone.utc), step_ms=60000)
+        self._original_set = set(self.originals)
+
+    def photo_url(self, media_id: str) -> str:
+        if self.media_url is not None:
+            return f"{self.media_url}/{media_id}.jpg"
+        return f"https://pbs.twimg.com/media/{media_id}.jpg"
+
+    def video_url(self, media_id: str, bitrate: int) -> str:
+        if self.media_url is not None:
+            return f"{self.media_url}/{media_id}/{bitrate}.mp4"
+        return f"https://video.twimg.com/{media_id}/{bitrate}.mp4"
+
+    def _random(self, tweet_id: str) -> random.Random:
+        return random.Random(int(tweet_id) ^ self.seed)
+
+    def exists(self, tweet_id: str) -> bool:
+        return self._random(tweet_id).random() >= self.missing_rate
+
+    def _facts(self, tweet_id: str) -> dict:
+        rand = self._random(tweet_id)
+        rand.random()  # Consumed by exists
+        user_id = str(rand.randint(1000, 1000 + 500))
+        hashtags = rand.sample(HASHTAGS, rand.randint(0, 2))
+        kind = rand.random()
+        facts = {
+            "id": tweet_id,
+            "user_id": user_id,
+            "screen_name": f"user_{user_id}",
+            "lang": rand.choice(LANGUAGES),
+            "hashtags": hashtags,
+            "retweet_count": rand.randint(0, 5000),
+            "favorite_count": rand.randint(0, 10000),
+            "quote_count": rand.randint(0, 300),
+            "reply_count": rand.randint(0, 300),
+            "created_at": _created_at(int(tweet_id)),
+            "retweet_of": None,
+            "quote_of": None,
+            "media": None,
+        }
+        original = rand.choice(self.originals)
+        if tweet_id in self._original_set:
+            pass
+        elif kind < self.retweet_rate:
+            facts["retweet_of"] = original
+        elif kind < self.retweet_rate + self.quote_rate:
+            facts["quote_of"] = original
+        if rand.random() < self.media_rate:
+            facts["media"] = (str(int(tweet_id) + 1), rand.choice(["photo", "video", "animated_gif"]))
+        return facts
+
+    def _text(self, facts: dict) -> str:
+        text = f"Synthetic tweet {facts['id']}"
+        for tag in facts["hashtags"]:
+            text += f" #{tag}"
+        return text
+
+    def v1(self, tweet_id: str, nested: bool = True) -> dict:
+        """Tweet in the Twitter API v1.1 extended mode format."""
+        facts = self._facts(tweet_id)
+        text = self._text(facts)
+        if nested and facts["retweet_of"]:
+            text = f"RT @user_{facts['retweet_of'][-3:]}: " + text
+        hashtags = []
+        for tag in facts["hashtags"]:
+            start = text.index("#" + tag)
+            hashtags.append({"text": tag, "indices": [start, start + len(tag) + 1]})
+        tweet = {
+            "created_at": facts["created_at"].strftime('%a %b %d %H:%M:%S +0000 %Y'),
+            "id": int(tweet_id),
+            "id_str": tweet_id,
+            "full_text": text,
+            "lang": facts["lang"],
+            "user": {
+                "id": int(facts["user_id"]),
+                "id_str": facts["user_id"],
+                "screen_name": facts["screen_name"],
+                "name": facts["screen_name"].title(),
+            },
+            "entities": {"hashtags": hashtags, "user_mentions": [], "urls": []},
+            "retweet_count": facts["retweet_count"],
+            "favorite_count": facts["favorite_count"],
+            "quote_count": facts["quote_count"],
+            "reply_count": facts["reply_count"],
+        }
+        if facts["media"]:
+            media_id, media_type = facts["media"]
+            media = {
+                "id": int(media_id),
+                "id_str": media_id,
+                "type": media_type,
+                "media_url_https": self.photo_url(media_id),
+                "url": f"https://t.co/{media_id}",
+                "expanded_url": f"https://twitter.com/{facts['screen_name']}/status/{tweet_id}/photo/1",
+                "sizes": {size: {} for size in ["thumb", "small", "medium", "large"]},
+            }
+            if media_type != "photo":
+                media["video_info"] = {"variants": [
+                    {"bitrate": bitrate, "content_type": "video/mp4",
+                     "url": self.video_url(media_id, bitrate)}
+                    for bitrate in [256000, 832000, 2176000]
+                ]}
+            tweet["entities"]["media"] = [media]
+            tweet["extended_entities"] = {"media": [media]}
+        if nested and facts["retweet_of"]:
+            tweet["retweeted_status"] = self.v1(facts["retweet_of"], nested=False)
+        elif nested and facts["quote_of"]:
+            tweet["quoted_status"] = self.v1(facts["quote_of"], nested=False)
+            tweet["is_quote_status"] = True
+            tweet["entities"]["urls"].append({
+                "expanded_url": f"https://twitter.com/user/status/{facts['quote_of']}"})
+        return tweet
+
+    def v2(self, tweet_id: str, nested: bool = True) -> Tuple[dict, dict]:
+        """Tweet in the Twitter API v2 format and its `includes` entries."""
+        facts = self._facts(tweet_id)
+        text = self._text(facts)
+        tweet = {
+            "id": tweet_id,
+            "text": text,
+            "author_id": facts["user_id"],
+            "conversation_id": tweet_id,
+            "created_at": facts["created_at"].strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+            "lang": facts["lang"],
+            "possibly_sensitive": False,
+            "source": "Twitter for iPhone",
+            "public_metrics": {
+                "retweet_count": facts["retweet_count"],
+                "reply_count": facts["reply_count"],
+                "like_count": facts["favorite_count"],
+                "quote_count": facts["quote_count"],
+            },
+        }
+        includes = {"users": [self._v2_user(facts)], "media": [], "tweets": []}
+        if facts["hashtags"]:
+            tweet["entities"] = {"hashtags": [
+                {"start": text.index("#" + tag), "end": text.index("#" + tag) + len(tag) + 1, "tag": tag}
+                for tag in facts["hashtags"]
+            ]}
+        if facts["media"]:
+            media_id, media_type = facts["media"]
+            media_key = f"3_{media_id}"
+            tweet["attachments"] = {"media_keys": [media_key]}
+            media = {"media_key": media_key, "type": media_type}
+            if media_type == "photo":
+                media["url"] = self.photo_url(media_id)
+            else:
+                media["preview_image_url"] = self.photo_url(media_id)
+                media["variants"] = [
+                    {"bit_rate": bitrate, "content_type": "video/mp4",
+                     "url": self.video_url(media_id, bitrate)}
+                    for bitrate in [256000, 832000, 2176000]
+                ]
+            includes["media"].append(media)
+        reference = None
+        if facts["retweet_of"]:
+            reference = ("retweeted", facts["retweet_of"])
+        elif facts["quote_of"]:
+            reference = ("quoted", facts["quote_of"])
+        if reference:
+            tweet["referenced_tweets"] = [{"type": reference[0], "id": reference[1]}]
+        if nested and reference:
+            referenced, referenced_includes = self.v2(reference[1], nested=False)
+            includes["tweets"].append(referenced)
+            includes["users"] += referenced_includes["users"]
+            includes["media"] += referenced_includes["media"]
+        return tweet, includes
+
+    @staticmethod
+    def _v2_user(facts: dict) -> dict:
+        return {
+            "id": facts["user_id"],
+            "username": facts["screen_name"],
+            "name": facts["screen_name"].title(),
+            "created_at": "2010-01-01T00:00:00.000Z",
+            "description": "Synthetic user",
+        }
+
+
+class _RateWindow:
+    """Fixed window request counter used to emulate Twitter rate limits."""
+
+    def __init__(self, limit: int, window: float):
+        self.limit = limit
+        self.window = window
+        self.lock = threading.Lock()
+        self.reset = time() + window
+        self.count = 0
+
+    def hit(self) -> Tuple[bool, int, int]:
+        """Returns (allowed, remaining, reset epoch seconds)."""
+        with self.lock:
+            now = time()
+            if now >= self.reset:
+                self.reset = now + self.window
+                self.count = 0
+            self.count += 1
+            remaining = max(self.limit - self.count, 0)
+            return self.count <= self.limit, remaining, int(self.reset)
+
+
+class MockTwitterServer:
+    def __init__(
+        self, host: str = "127.0.0.1", port: int = 0,
+        latency: Union[float, Tuple[float, float]] = 0.0,
+        error_rate: float = 0.0,
+        rate_limit: int = 900, rate_window: float = 900.0,
+        throttle_windows: List[Tuple[float, float]] = [],
+        tweets: Union[SyntheticTweets, None] = None,
+        seed: int = 0,
+        serve_media: bool = False,
+    ):
+        """Threaded HTTP server emulating the endpoints used by `TSess`.
+
+        Args:
+            host (str, optional): Interface to bind. Defaults to "127.0.0.1".
+            port (int, optional): Port to bind, 0 picks a free port. Defaults to 0.
+            latency (Union[float, Tuple[float, float]], optional): Seconds added to every
+                response, a tuple draws uniformly from the range. Defaults to 0.0.
+            error_rate (float, optional): Fraction of requests answered with HTTP 503. Defaults to 0.0.
+            rate_limit (int, optional): Requests allowed per rate window. Defaults to 900.
+            rate_window (float, optional): Rate window length in seconds. Defaults to 900.0.
+            throttle_windows (List[Tuple[float, float]], optional): Intervals, in seconds since
+                start, where every request is answered with HTTP 429. Defaults to [].
+            tweets (Union[SyntheticTweets, None], optional): Payload generator. Defaults to None.
+            seed (int, optional): Seed for latency and error injection. Defaults to 0.
+            serve_media (bool, optional): Serve synthetic media files under `/media/`
+                (with Range support) and point the media URLs of `tweets` there. Defaults to False.
+        """
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate = _RateWindow(rate_limit, rate_window)
+        self.throttle_windows = list(throttle_windows)
+        self.tweets = tweets if tweets is not None else SyntheticTweets(seed=seed)
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self.stats_lock = threading.Lock()
+        self.stats: Dict[str, int] = {}
+        self.started = None
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self.thread = None
+        if serve_media:
+            self.tweets.media_url = self.url + "/media"
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def oembed_url(self) -> str:
+        return self.url + "/oembed"
+
+    def start(self) -> "MockTwitterServer":
+        self.started = time()
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        logging.debug(f"Mock Twitter API listening at {self.url}")
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def __enter__(self) -> "MockTwitterServer":
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def count(self, key: str):
+        with self.stats_lock:
+            self.stats[key] = self.stats.get(key, 0) + 1
+
+    def _draw(self) -> Tuple[float, float]:
+        with self._random_lock:
+            if type(self.latency) in (tuple, list):
+                delay = self._random.uniform(*self.latency)
+            else:
+                delay = float(self.latency)
+            return delay, self._random.random()
+
+    def _throttled(self) -> bool:
+        elapsed = time() - (self.started or time())
+        return any(start <= elapsed < end for start, end in self.throttle_windows)
+
+    def respond(self, path: str, query: Dict[str, List[str]]) -> Tuple[int, Union[dict, list]]:
+        """Routes a request to the payload for the emulated endpoint."""
+        if path == "/1.1/statuses/lookup.json":
+            ids = query.get("id", [""])[0].split(",")
+            return 200, [self.tweets.v1(i) for i in ids if i.isnumeric() and self.tweets.exists(i)]
+        elif path == "/2/tweets":
+            return 200, self._v2_response(query.get("ids", [""])[0].split(","))
+        elif path.startswith("/2/tweets/"):
+            return 200, self._v2_response([path[len("/2/tweets/"):]], single=True)
+        elif path == "/oembed":
+            url = query.get("url", [""])[0]
+            return 200, {
+                "url": url,
+                "author_name": "Synthetic",
+                "html": f'<blockquote class="twitter-tweet"><a href="{url}"></a></blockquote>',
+                "type": "rich",
+                "version": "1.0",
+            }
+        return 404, {"errors": [{"message": "Sorry, that page does not exist", "code": 34}]}
+
+    @staticmethod
+    def media_content(path: str) -> bytes:
+        """Deterministic bytes of a synthetic media file. Size suffixes of
+        photos (`:large`, `:thumb`, ...) return the same content."""
+        name = path.rsplit(":", 1)[0] if ":" in path.rsplit("/", 1)[-1] else path
+        rng = random.Random(name)
+        return bytes(rng.getrandbits(8) for _ in range(rng.randint(2000, 50000)))
+
+    def _v2_response(self, ids: List[str], single: bool = False) -> dict:
+        data, errors = [], []
+        includes = {"users": {}, "media": {}, "tweets": {}}
+        for tweet_id in ids:
+            if not tweet_id.isnumeric() or not self.tweets.exists(tweet_id):
+                errors.append({
+                    "value": tweet_id, "detail": f"Could not find tweet with ids: [{tweet_id}].",
+                    "title": "Not Found Error", "resource_type": "tweet", "parameter": "ids",
+                    "resource_id": tweet_id, "type": "https://api.twitter.com/2/problems/resource-not-found",
+                })
+                continue
+            tweet, tweet_includes = self.tweets.v2(tweet_id)
+            data.append(tweet)
+            for key, id_field in [("users", "id"), ("media", "media_key"), ("tweets", "id")]:
+                for item in tweet_includes[key]:
+                    includes[key][item[id_field]] = item
+        response = {}
+        if data:
+            response["data"] = data[0] if single else data
+            response["includes"] = {k: list(v.values()) for k, v in includes.items() if v}
+        if errors:
+            response["errors"] = errors
+        return response
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                logging.debug("MockTwitterServer: " + format % args)
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                delay, draw = server._draw()
+                if delay > 0:
+                    sleep(delay)
+                if parsed.path.startswith("/media/"):
+                    return self.send_media(parsed.path)
+                allowed, remaining, reset = server.rate.hit()
+                if server._throttled() or not allowed:
+                    code, body = 429, {"errors": [{"message": "Rate limit exceeded", "code": 88}]}
+                elif draw < server.error_rate:
+                    code, body = 503, {"errors": [{"message": "Over capacity", "code": 130}]}
+                else:
+                    code, body = server.respond(parsed.path, parse_qs(parsed.query))
+                endpoint = "/2/tweets/:id" if parsed.path.startswith("/2/tweets/") else parsed.path
+                server.count(f"{endpoint} {code}")
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(code)
+                self.send_header("content-type", "application/json;charset=utf-8")
+                self.send_header("content-length", str(len(payload)))
+                self.send_header("x-rate-limit-limit", str(server.rate.limit))
+                self.send_header("x-rate-limit-remaining", str(remaining))
+                self.send_header("x-rate-limit-reset", str(reset))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def send_media(self, path: str):
+                content = server.media_content(path[len("/media/"):])
+                start = 0
+                byte_range = self.headers.get("Range", "")
+                if byte_range.startswith("bytes=") and byte_range.endswith("-"):
+                    start = int(byte_range[len("bytes="):-1])
+                if start >= len(content) and start > 0:
+                    server.count("/media 416")
+                    self.send_response(416)
+                    self.send_header("content-range", f"bytes */{len(content)}")
+                    self.send_header("content-length", "0")
+                    self.end_headers()
+                    return
+                code = 206 if start > 0 else 200
+                server.count(f"/media {code}")
+                self.send_response(code)
+                self.send_header("content-type", "video/mp4" if path.endswith(".mp4") else "image/jpeg")
+                self.send_header("content-length", str(len(content) - start))
+                self.send_header("accept-ranges", "bytes")
+                if code == 206:
+                    self.send_header("content-range", f"bytes {start}-{len(content) - 1}/{len(content)}")
+                self.end_headers()
+                self.wfile.write(content[start:])
+
+        return Handler
@@ -0,0 +1,193 @@
+from datetime import datetime
+from typing import Union, List, Dict
+from .analysis import TweetAnalyzer
+from . import jsonlib
+
+"""
+Conversion of Twitter API v2 responses into the v1.1 tweet shape understood
+by `TweetAnalyzer` (`user`, `entities`, `extended_entities`,
+`retweeted_status`, `quoted_status`, ...).
+
+The `includes` of a response are indexed by ID once, then every tweet is
+joined against those dictionaries, so normalizing a page is linear in its size.
+
+Media URLs are only present when the request includes `url` and `variants`
+in `media_fields` (not part of the `TSess` defaults to keep cache keys stable).
+"""
+
+V1_DATE_FORMAT = '%a %b %d %H:%M:%S +0000 %Y'
+V2_DATE_FORMAT = '%Y-%m-%dT%H:%M:%S.%fZ'
+PHOTO_SIZES = ["thumb", "small", "medium", "large"]
+
+
+def v2_date_to_v1(created_at: Union[str, None]) -> Union[str, None]:
+    """Converts an ISO 8601 v2 `created_at` into the v1.1 format."""
+    if not created_at:
+        return None
+    try:
+        return datetime.strptime(created_at, V2_DATE_FORMAT).strftime(V1_DATE_FORMAT)
+    except ValueError:
+        return datetime.strptime(created_at, '%Y-%m-%dT%H:%M:%SZ').strftime(V1_DATE_FORMAT)
+
+
+class V2Response:
+    def __init__(self, response: Union[str, bytes, dict]):
+        """Indexes the `includes` of a v2 response for joining into its tweets.
+
+        Args:
+            response (Union[str, bytes, dict]): Response of `2/tweets` or `2/tweets/<id>`,
+                as JSON text or decoded.
+        """
+        if type(response) in (str, bytes):
+            response = jsonlib.loads(response)
+        self.response: dict = response
+        data = response.get("data", [])
+        self.data: List[dict] = [data] if type(data) is dict else data
+        includes: dict = response.get("includes", {})
+        self.users: Dict[str, dict] = {u["id"]: u for u in includes.get("users", [])}
+        self.media: Dict[str, dict] = {m["media_key"]: m for m in includes.get("media", [])}
+        self.places: Dict[str, dict] = {p["id"]: p for p in includes.get("places", [])}
+        self.included_tweets: Dict[str, dict] = {t["id"]: t for t in includes.get("tweets", [])}
+        # Tweets of the page can also be referenced by other tweets of the page.
+        for tweet in self.data:
+            self.included_tweets.setdefault(tweet["id"], tweet)
+
+    @property
+    def errors(self) -> List[dict]:
+        return self.response.get("errors", [])
+
+    def tweets(self) -> List[dict]:
+        """Returns every tweet of the response in the v1.1 shape."""
+        return [self.normalize(tweet) for tweet in self.data]
+
+    def analyzers(self, localMedia: bool = True) -> List[TweetAnalyzer]:
+        """Returns a TweetAnalyzer for every tweet of the response."""
+        return [TweetAnalyzer(tweet, localMedia) for tweet in self.tweets()]
+
+    def normalize(self, tweet: dict, depth: int = 2) -> dict:
+        """Joins a v2 tweet with the response includes into the v1.1 shape.
+
+        Args:
+            tweet (dict): Tweet from `data` or `includes.tweets`.
+            depth (int, optional): Levels of referenced tweets to embed. Defaults to 2.
+
+        Returns:
+            dict: Tweet data dictionary in the v1.1 extended mode shape.
+        """
+        metrics: dict = tweet.get("public_metrics", {})
+        v1 = {
+            "id": int(tweet["id"]),
+            "id_str": tweet["id"],
+            "full_text": tweet.get("text", ""),
+            "text": tweet.get("text", ""),
+            "lang": tweet.get("lang", "und"),
+            "created_at": v2_date_to_v1(tweet.get("created_at")),
+            "user": self.user(tweet.get("author_id")),
+            "retweet_count": metrics.get("retweet_count"),
+            "favorite_count": metrics.get("like_count"),
+            "quote_count": metrics.get("quote_count"),
+            "reply_count": metrics.get("reply_count"),
+            "entities": self.entities(tweet.get("entities", {})),
+        }
+        for key in ["conversation_id", "possibly_sensitive", "source"]:
+            if key in tweet:
+                v1[key] = tweet[key]
+        if tweet.get("in_reply_to_user_id"):
+            v1["in_reply_to_user_id_str"] = tweet["in_reply_to_user_id"]
+
+        media = []
+        for media_key in tweet.get("attachments", {}).get("media_keys", []):
+            if media_key in self.media:
+                media.append(self.media_entity(self.media[media_key], tweet["id"]))
+        if media:
+            v1["entities"]["media"] = media
+            v1["extended_entities"] = {"media": media}
+
+        place_id = tweet.get("geo", {}).get("place_id")
+        if place_id in self.places:
+            v1["place"] = self.places[place_id]
+
+        for reference in tweet.get("referenced_tweets", []):
+            referenced = self.included_tweets.get(reference["id"], None)
+            if reference["type"] == "replied_to":
+                v1["in_reply_to_status_id_str"] = reference["id"]
+            elif referenced is None or depth <= 0:
+                continue
+            elif reference["type"] == "retweeted":
+                v1["retweeted_status"] = self.normalize(referenced, depth - 1)
+            elif reference["type"] == "quoted":
+                v1["quoted_status"] = self.normalize(referenced, depth - 1)
+                v1["quoted_status_id_str"] = reference["id"]
+                v1["is_quote_status"] = True
+        return v1
+
+    def user(self, author_id: Union[str, None]) -> dict:
+        """v1.1 user object for `author_id`. Users missing from includes
+        only have their ID set.
+        """
+        user = self.users.get(author_id, {})
+        v1 = {
+            "id": int(author_id) if author_id else None,
+            "id_str": author_id,
+            "screen_name": user.get("username"),
+            "name": user.get("name"),
+        }
+        if "description" in user:
+            v1["description"] = user["description"]
+        if "created_at" in user:
+            v1["created_at"] = v2_date_to_v1(user["created_at"])
+        return v1
+
+    @staticmethod
+    def entities(entities: dict) -> dict:
+        """Converts v2 entities (start/end offsets) into v1.1 entities (indices)."""
+        return {
+            "hashtags": [
+                {"text": h["tag"], "indices": [h["start"], h["end"]]}
+                for h in entities.get("hashtags", [])
+            ],
+            "user_mentions": [
+                {"screen_name": m["username"], "id_str": m.get("id"), "indices": [m["start"], m["end"]]}
+                for m in entities.get("mentions", [])
+            ],
+            "urls": [
+                {
+                    "url": u.get("url"),
+                    "expanded_url": u.get("expanded_url", u.get("url")),
+                    "display_url": u.get("display_url"),
+                    "indices": [u["start"], u["end"]],
+                }
+                for u in entities.get("urls", [])
+            ],
+        }
+
+    @staticmethod
+    def media_entity(media: dict, tweet_id: str) -> dict:
+        """Converts a v2 media object into a v1.1 media entity."""
+        media_id = media["media_key"].split("_")[-1]
+        v1 = {
+            "id": int(media_id) if media_id.isnumeric() else media_id,
+            "id_str": media_id,
+            "media_key": media["media_key"],
+            "type": media.get("type"),
+            "media_url_https": media.get("url", media.get("preview_image_url")),
+            "expanded_url": f"https://twitter.com/i/web/status/{tweet_id}",
+            "sizes": {size: {} for size in PHOTO_SIZES},
+        }
+        if "duration_ms" in media:
+            v1["duration_ms"] = media["duration_ms"]
+        if "variants" in media:
+            v1["video_info"] = {"variants": [
+                {
+                    "bitrate": variant["bit_rate"],
+                    "content_type": variant.get("content_type"),
+                    "url": variant["url"],
+                } if "bit_rate" in variant else variant
+                for variant in media["variants"]
+            ]}
+        return v1
+
+
+def normalize_v2(response: Union[str, bytes, dict]) -> List[dict]:
+    """Converts every tweet of a v2 response into the v1.1 shape."""
+    return V2Response(response).tweets()
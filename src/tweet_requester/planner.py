@@ -0,0 +1,232 @@
+import logging
+from math import ceil
+from time import time, perf_counter
+from typing import Union, List, Dict, Iterable, Callable
+from .session import TSess
+from .cache import Request
+from .scheduler import Priority, endpoint_key
+from .metrics import METRICS
+
+"""
+Hydration planning. Classifies a list of tweet IDs against the cache and
+the error log of a `TSess` before a job starts, packs the IDs that need
+fetching into the minimum number of lookup calls and estimates how long
+those calls take under the session rate limits.
+"""
+
+# Maximum IDs per call of 1.1/statuses/lookup.json and 2/tweets.
+MAX_BATCH_SIZE = 100
+PLAN_MODES = ["v1.1", "v2"]
+# Documented app limit of both lookup endpoints, used until the API reports
+# its own through the x-rate-limit-* headers.
+# READ: https://developer.twitter.com/en/docs/twitter-api/rate-limits
+LOOKUP_RATE_LIMIT = 300
+LOOKUP_RATE_WINDOW = 900.0
+
+
+class HydrationPlan:
+    def __init__(
+        self, mode: str, cached: List[str], failed: List[str], stale: List[str],
+        fetch: List[str], batches: List[List[str]], estimated_seconds: float
+    ):
+        """Result of `plan_hydration`.
+
+        Args:
+            mode (str): "v1.1" (load_tweet_11 entries) or "v2" (load_tweet entries).
+            cached (List[str]): IDs already cached and fresh.
+            failed (List[str]): IDs with a known error, skipped.
+            stale (List[str]): IDs cached but older than the cache REFRESH_RATE.
+            fetch (List[str]): IDs that will be requested.
+            batches (List[List[str]]): `fetch` packed into lookup calls.
+            estimated_seconds (float): Estimated duration of the fetch.
+        """
+        self.mode = mode
+        self.cached = cached
+        self.failed = failed
+        self.stale = stale
+        self.fetch = fetch
+        self.batches = batches
+        self.estimated_seconds = estimated_seconds
+
+    @property
+    def calls(self) -> int:
+        return len(self.batches)
+
+    def summary(self) -> Dict[str, Union[int, float, str]]:
+        return {
+            "mode": self.mode,
+            "cached": len(self.cached),
+            "failed": len(self.failed),
+            "stale": len(self.stale),
+            "fetch": len(self.fetch),
+            "calls": self.calls,
+            "estimated_seconds": self.estimated_seconds,
+        }
+
+    def __str__(self) -> str:
+        return (
+            f"Hydration plan ({self.mode}): {len(self.cached)} cached, {len(self.failed)} known failures, "
+            f"{len(self.stale)} stale, {len(self.fetch)} to fetch in {self.calls} calls "
+            f"(~{self.estimated_seconds/60:.1f} minutes)"
+        )
+
+    def execute(
+        self, session: TSess,
+        progress: Union[Callable[[int, int, int], None], None] = None
+    ) -> Dict[str, int]:
+        """Fetches every batch of the plan as background work. Each tweet is
+        cached under its single tweet entry so later `load_tweet_11`/`load_tweet`
+        calls are served from the cache.
+
+        Args:
+            session (TSess): Session used for the requests.
+            progress (Union[Callable[[int, int, int], None], None], optional):
+                Called after each batch with (batch number, batches, hydrated so far).
+
+        Returns:
+            Dict[str, int]: Count of hydrated and missing tweets and failed calls.
+        """
+        stats = {"hydrated": 0, "missing": 0, "failed_calls": 0}
+        hydrate = session.hydrate_batch_11 if self.mode == "v1.1" else session.hydrate_batch
+        with session.priority(Priority.BACKGROUND):
+            for number, batch in enumerate(self.batches, start=1):
+                start = perf_counter()
+                found, missing, code = hydrate(batch)
+                METRICS.record_stage("hydrate", len(found), perf_counter() - start)
+                stats["hydrated"] += len(found)
+                stats["missing"] += len(missing)
+                if code != 200:
+                    stats["failed_calls"] += 1
+                    logging.warning(f"Batch {number}/{self.calls} failed with status {code}.")
+                if progress is not None:
+                    progress(number, self.calls, stats["hydrated"])
+        return stats
+
+
+def _windowed_seconds(
+    calls: int, per_call: float, share: int, window: float,
+    available: Union[int, None] = None, wait: float = 0.0
+) -> float:
+    """Seconds for `calls` requests when only `share` of them fit in each rate
+    window. `available` requests fit in the current window, which ends in
+    `wait` seconds; None means a fresh window."""
+    if available is not None:
+        if calls <= available:
+            return calls * per_call
+        calls -= available
+        wait = max(wait, available * per_call)
+    else:
+        wait = 0.0
+    full_windows = int(ceil(calls / share)) - 1
+    return wait + full_windows * window + (calls - full_windows * share) * per_call
+
+
+def estimate_seconds(
+    session: TSess, calls: int, request_latency: float = 0.3,
+    endpoint: Union[str, None] = None
+) -> float:
+    """Estimates the seconds `calls` background requests take under the
+    session scheduler: request spacing, latency and the rate window share
+    available to background work, as `RequestScheduler.delay` grants it.
+
+    The window is the local `rate_limit` and, for the endpoint, the limit and
+    reset the API reported; before any response the documented lookup limit
+    is assumed.
+
+    Args:
+        session (TSess): Session whose scheduler sends the requests.
+        calls (int): Number of requests.
+        request_latency (float, optional): Expected seconds per request. Defaults to 0.3.
+        endpoint (Union[str, None], optional): Endpoint key of the requests, see
+            `endpoint_key`. Defaults to None for the v1.1 lookup.
+    """
+    if calls <= 0:
+        return 0.0
+    scheduler = session.scheduler
+    if endpoint is None:
+        endpoint = endpoint_key(session.BASE_URL_11)
+    per_call = max(scheduler.min_interval, request_latency)
+    seconds = calls * per_call
+    if scheduler.rate_limit is not None:
+        share = max(scheduler.rate_limit - scheduler.reserve(scheduler.rate_limit), 1)
+        seconds = max(seconds, _windowed_seconds(calls, per_call, share, scheduler.rate_window))
+
+    server = scheduler.server.get(endpoint)
+    limit = server[2] if server is not None and server[2] is not None else LOOKUP_RATE_LIMIT
+    # The reserve follows the local limit when there is one, as in the scheduler.
+    floor = scheduler.reserve(scheduler.rate_limit if scheduler.rate_limit is not None else limit)
+    share = max(limit - floor, 1)
+    now = time()
+    if server is not None and now < server[1]:
+        available = max(server[0] - floor, 0)
+        windowed = _windowed_seconds(calls, per_call, share, LOOKUP_RATE_WINDOW, available, server[1] - now)
+    else:
+        windowed = _windowed_seconds(calls, per_call, share, LOOKUP_RATE_WINDOW)
+    return max(seconds, windowed)
+
+
+def plan_hydration(
+    session: TSess, ids: Iterable[str], mode: str = "v1.1",
+    batch_size: int = MAX_BATCH_SIZE, refresh_stale: Union[bool, None] = None,
+    request_latency: float = 0.3, time_ordered: bool = False
+) -> HydrationPlan:
+    """Classifies tweet IDs against the cache and error log of `session` and
+    packs the IDs that need fetching into lookup batches.
+
+    Args:
+        session (TSess): Session whose cache and error log are inspected.
+        ids (Iterable[str]): Tweet IDs, for example an open ID file. Duplicates and blank lines are ignored.
+        mode (str, optional): "v1.1" plans for load_tweet_11, "v2" for load_tweet. Defaults to "v1.1".
+        batch_size (int, optional): IDs per lookup call, at most 100. Defaults to 100.
+        refresh_stale (Union[bool, None], optional): Fetch stale IDs again.
+            Defaults to None to follow the cache SOFT_RELOAD setting.
+        request_latency (float, optional): Expected seconds per request. Defaults to 0.3.
+        time_ordered (bool, optional): Fetch oldest tweets first, so every batch
+            covers a contiguous time range (IDs are snowflakes). Defaults to False.
+
+    Returns:
+        HydrationPlan: Classification, batches and estimated duration.
+    """
+    assert mode in PLAN_MODES, f"Invalid mode {mode}. Use one of {PLAN_MODES}."
+    batch_size = max(1, min(batch_size, MAX_BATCH_SIZE))
+    if refresh_stale is None:
+        refresh_stale = session.cache.SOFT_RELOAD
+    start = time()
+    cached, failed, stale, fetch = [], [], [], []
+    seen = set()
+    for tweet_id in ids:
+        tweet_id = str(tweet_id).strip()
+        if not tweet_id or tweet_id in seen:
+            continue
+        seen.add(tweet_id)
+        if mode == "v1.1":
+            base_url, params = session.tweet_request_11(tweet_id)
+        else:
+            base_url, params = session.tweet_request(tweet_id)
+        tweet_request = Request(base_url, "GET", params)
+        if session.cache.present(tweet_request):
+            if session.cache.is_stale(tweet_request):
+                stale.append(tweet_id)
+                if refresh_stale:
+                    fetch.append(tweet_id)
+            else:
+                cached.append(tweet_id)
+        elif session.cache.request_hash(tweet_request) in session.ERROR_DICT:
+            failed.append(tweet_id)
+        else:
+            fetch.append(tweet_id)
+    if time_ordered:
+        fetch.sort(key=int)
+    batches = [fetch[i:i + batch_size] for i in range(0, len(fetch), batch_size)]
+    logging.debug(f"Planned {len(seen)} IDs in {time() - start:.3f}s")
+    return HydrationPlan(
+        mode=mode,
+        cached=cached,
+        failed=failed,
+        stale=stale,
+        fetch=fetch,
+        batches=batches,
+        estimated_seconds=estimate_seconds(
+            session, len(batches), request_latency,
+            endpoint_key(session.BASE_URL_11 if mode == "v1.1" else session.TWEETS_URL)),
+    )
@@ -0,0 +1,172 @@
+import heapq
+from itertools import count
+from typing import Union, List, Tuple, Iterable, Callable, Any
+from .analysis import BaseTweetAnalyzer
+
+"""
+Ranking of tweets by a metric given as a parameter. Sort keys are computed
+once per tweet, missing values are handled explicitly and top-k selection
+uses a bounded heap, so ranking a stream keeps only `k` tweets in memory.
+
+    top_k(iter_cached_tweets(session.cache), 100, "retweet_count", originals_only=True)
+    rank(analyzers, "favorite_count", missing="drop")
+
+Tweets can be analyzers or data dictionaries in the v1.1 shape.
+"""
+
+# Metric names and the tweet fields they read.
+METRIC_FIELDS = {
+    "retweet_count": ("retweet_count",),
+    "favorite_count": ("favorite_count",),
+    "quote_count": ("quote_count",),
+    "reply_count": ("reply_count",),
+    "engagement": ("retweet_count", "favorite_count", "quote_count"),
+}
+# Analyzer attribute names accepted as aliases.
+METRIC_ALIASES = {
+    "retweetCount": "retweet_count",
+    "favoriteCount": "favorite_count",
+    "quoteCount": "quote_count",
+}
+Tweet = Union[BaseTweetAnalyzer, dict]
+Metric = Union[str, Callable[[dict], Union[int, float, None]]]
+Missing = Union[str, int, float]
+
+
+def _number(value) -> Union[int, float, None]:
+    if value is None or type(value) is bool:
+        return None
+    if type(value) in (int, float):
+        return value
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def metric_function(metric: Metric) -> Callable[[dict], Union[int, float, None]]:
+    """Function from tweet data to the metric value, None when missing.
+
+    Args:
+        metric (Metric): A name of METRIC_FIELDS (or its analyzer alias such as
+            "retweetCount") or a function of the tweet data dictionary.
+    """
+    if callable(metric):
+        return metric
+    fields = METRIC_FIELDS[METRIC_ALIASES.get(metric, metric)]
+    if len(fields) == 1:
+        field = fields[0]
+        return lambda data: _number(data.get(field))
+
+    def total(data: dict) -> Union[int, float, None]:
+        values = [_number(data.get(field)) for field in fields]
+        values = [value for value in values if value is not None]
+        return sum(values) if values else None
+    return total
+
+
+def sort_key(
+    metric: Metric = "retweet_count", descending: bool = True,
+    missing: Missing = "last", originals_only: bool = False
+) -> Callable[[Tweet], Union[Tuple[int, Any], None]]:
+    """Key function giving larger keys to better ranked tweets, or None for
+    tweets left out of the ranking.
+
+    Args:
+        metric (Metric, optional): See `metric_function`. Defaults to "retweet_count".
+        descending (bool, optional): Highest values first. Defaults to True.
+        missing (Missing, optional): Tweets without the metric go "last",
+            "first", are dropped ("drop") or use the given number. Defaults to "last".
+        originals_only (bool, optional): Leave retweets out. Retweets carry the
+            counts of the retweeted tweet. Defaults to False.
+    """
+    value_of = metric_function(metric)
+    assert missing in ("last", "first", "drop") or _number(missing) is not None, \
+        f"missing must be 'last', 'first', 'drop' or a number, not {missing!r}."
+    sign = 1 if descending else -1
+
+    def key(tweet: Tweet) -> Union[Tuple[int, Any], None]:
+        data = tweet.data if isinstance(tweet, BaseTweetAnalyzer) else tweet
+        if originals_only and data.get("retweeted_status") is not None:
+            return None
+        value = value_of(data)
+        if value is None:
+            if missing == "drop":
+                return None
+            if missing == "last":
+                return (0, 0)
+            if missing == "first":
+                return (2, 0)
+            value = missing
+        return (1, sign * value)
+    return key
+
+
+def rank(
+    tweets: Iterable[Tweet], metric: Metric = "retweet_count", descending: bool = True,
+    missing: Missing = "last", originals_only: bool = False
+) -> List[Tweet]:
+    """Tweets ordered by a metric, equal values keep their input order.
+    Arguments as for `sort_key`."""
+    key = sort_key(metric, descending, missing, originals_only)
+    keyed = []
+    for position, tweet in enumerate(tweets):
+        k = key(tweet)
+        if k is not None:
+            keyed.append((k, -position, tweet))
+    keyed.sort(key=lambda item: item[:2], reverse=True)
+    return [tweet for _, _, tweet in keyed]
+
+
+class StreamingTopK:
+    def __init__(
+        self, k: int, metric: Metric = "retweet_count", descending: bool = True,
+        missing: Missing = "last", originals_only: bool = False
+    ):
+        """Best `k` tweets of a stream, holding at most `k` tweets at a time.
+        Equal keys keep the tweet seen first. Arguments as for `sort_key`."""
+        self.k = k
+        self.key = sort_key(metric, descending, missing, originals_only)
+        # Min heap of (key, -arrival, tweet): the root is the first to be replaced.
+        self.heap: List[tuple] = []
+        self._arrival = count()
+        self.seen = 0
+
+    def push(self, tweet: Tweet):
+        self.seen += 1
+        key = self.key(tweet)
+        if key is None or self.k <= 0:
+            return
+        entry = (key, -next(self._arrival), tweet)
+        if len(self.heap) < self.k:
+            heapq.heappush(self.heap, entry)
+        elif entry[:2] > self.heap[0][:2]:
+            heapq.heapreplace(self.heap, entry)
+
+    def extend(self, tweets: Iterable[Tweet]) -> "StreamingTopK":
+        for tweet in tweets:
+            self.push(tweet)
+        return self
+
+    def merge(self, other: "StreamingTopK") -> "StreamingTopK":
+        """Adds the tweets kept by another StreamingTopK with the same metric,
+        e.g. from another shard. Its tweets count as seen after ours."""
+        for _, _, tweet in sorted(other.heap, key=lambda entry: -entry[1]):
+            self.push(tweet)
+        self.seen += other.seen - len(other.heap)
+        return self
+
+    def result(self) -> List[Tweet]:
+        """Kept tweets, best first."""
+        return [tweet for _, _, tweet in sorted(self.heap, key=lambda entry: entry[:2], reverse=True)]
+
+    def __len__(self) -> int:
+        return len(self.heap)
+
+
+def top_k(
+    tweets: Iterable[Tweet], k: int = 10, metric: Metric = "retweet_count",
+    descending: bool = True, missing: Missing = "last", originals_only: bool = False
+) -> List[Tweet]:
+    """Best `k` tweets of any iterable, in bounded memory. Arguments as for `sort_key`."""
+    return StreamingTopK(k, metric, descending, missing, originals_only).extend(tweets).result()
@@ -0,0 +1,165 @@
+import itertools, logging
+import re
+import threading
+from collections import deque
+from enum import Enum
+from heapq import heappush, heappop
+from math import ceil
+from time import time
+from typing import Union, Tuple, List, Dict, Mapping
+
+"""
+Request scheduler shared by every caller of a `TSess`. Requests wait in a
+priority queue, so interactive lookups are served before background work,
+and a share of the rate window is reserved for interactive use.
+
+The API reports a separate rate window per endpoint (1.1 lookup, v2 tweets,
+oEmbed) through the x-rate-limit-* headers; the scheduler keeps them per
+`endpoint_key`.
+"""
+
+NUMERIC_SEGMENT_RE = re.compile(r"/\d{5,}(?=/|$)")
+
+
+def endpoint_key(url: str) -> str:
+    """Rate window key of a request URL: no query and tweet IDs in the path as ":id"."""
+    return NUMERIC_SEGMENT_RE.sub("/:id", url.split("?", 1)[0].rstrip("/"))
+
+
+class Priority(Enum):
+    """Priority of a request, lower values are served first."""
+    INTERACTIVE = 0
+    NORMAL = 1
+    BACKGROUND = 2
+
+
+class RequestScheduler:
+    def __init__(
+        self, min_interval: float = 1.0, rate_limit: Union[int, None] = None,
+        rate_window: float = 900.0, interactive_reserve: float = 0.1
+    ):
+        """Grants permission to send requests by priority within the rate limits.
+
+        Args:
+            min_interval (float, optional): Minimum seconds between two requests. Defaults to 1.0.
+            rate_limit (Union[int, None], optional): Requests allowed per window,
+                None disables the local window. Defaults to None.
+            rate_window (float, optional): Length of the rate window in seconds. Defaults to 900.0.
+            interactive_reserve (float, optional): Fraction of the window that only
+                interactive requests may use. Defaults to 0.1.
+        """
+        self.min_interval = min_interval
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.interactive_reserve = interactive_reserve
+        self.cond = threading.Condition()
+        self.queue: List[Tuple[int, int]] = []
+        self.sequence = itertools.count()
+        self.grants = deque()
+        self.last_grant = 0.0
+        # Values reported by the API through the x-rate-limit-* headers, per
+        # endpoint key: [remaining, reset, limit].
+        self.server: Dict[str, list] = {}
+        self.waited = 0.0
+
+    def reserve(self, limit: int) -> int:
+        """Number of requests of a window of size `limit` kept for interactive use."""
+        return int(ceil(limit * self.interactive_reserve))
+
+    def delay(self, priority: Priority, now: float, endpoint: str = "") -> float:
+        """Seconds a request of the given priority must wait before being sent.
+        Must be called while holding `self.cond`.
+        """
+        delay = max(0.0, self.last_grant + self.min_interval - now)
+        while self.grants and self.grants[0] <= now - self.rate_window:
+            self.grants.popleft()
+        interactive = priority is Priority.INTERACTIVE
+        if self.rate_limit is not None:
+            limit = self.rate_limit
+            if not interactive:
+                limit = max(limit - self.reserve(self.rate_limit), 1)
+            if len(self.grants) >= limit:
+                # Wait until enough grants leave the window.
+                expires = self.grants[len(self.grants) - limit] + self.rate_window
+                delay = max(delay, expires - now)
+        server = self.server.get(endpoint)
+        if server is not None and now < server[1]:
+            remaining, reset, server_limit = server
+            floor = 0
+            if not interactive:
+                # Without a local limit the reserve comes from the window the API reports.
+                limit = self.rate_limit if self.rate_limit is not None else server_limit
+                if limit is not None:
+                    floor = self.reserve(limit)
+            if remaining <= floor:
+                delay = max(delay, reset - now)
+        return delay
+
+    def acquire(self, priority: Priority = Priority.NORMAL, endpoint: str = "") -> float:
+        """Blocks until the request may be sent.
+
+        Args:
+            priority (Priority, optional): Priority of the request. Defaults to Priority.NORMAL.
+            endpoint (str, optional): Endpoint key of the request, see `endpoint_key`. Defaults to "".
+
+        Returns:
+            float: Seconds spent waiting.
+        """
+        ticket = (priority.value, next(self.sequence))
+        start = time()
+        with self.cond:
+            heappush(self.queue, ticket)
+            self.cond.notify_all()
+            while True:
+                if self.queue[0] == ticket:
+                    delay = self.delay(priority, time(), endpoint)
+                    if delay <= 0:
+                        break
+                    self.cond.wait(delay)
+                else:
+                    self.cond.wait()
+            heappop(self.queue)
+            now = time()
+            self.last_grant = now
+            self.grants.append(now)
+            server = self.server.get(endpoint)
+            if server is not None:
+                server[0] -= 1
+            waited = now - start
+            self.waited += waited
+            self.cond.notify_all()
+        if waited > 0.001:
+            logging.debug(f"{priority.name} request waited {waited:.3f}s")
+        return waited
+
+    def observe(
+        self, headers: Mapping[str, str], status_code: Union[int, None] = None,
+        endpoint: str = ""
+    ):
+        """Updates the known rate limit state of an endpoint from API response headers.
+
+        Args:
+            headers (Mapping[str, str]): Response headers.
+            status_code (Union[int, None], optional): Response status, a 429 exhausts the window.
+            endpoint (str, optional): Endpoint key of the request, see `endpoint_key`. Defaults to "".
+        """
+        known = self.server.get(endpoint)
+        try:
+            remaining = int(headers["x-rate-limit-remaining"])
+            reset = float(headers["x-rate-limit-reset"])
+        except (KeyError, TypeError, ValueError):
+            if status_code != 429:
+                return
+            remaining, reset = 0, time() + self.rate_window
+        try:
+            limit = int(headers["x-rate-limit-limit"])
+        except (KeyError, TypeError, ValueError):
+            limit = known[2] if known is not None else None
+        with self.cond:
+            self.server[endpoint] = [0 if status_code == 429 else remaining, reset, limit]
+            self.cond.notify_all()
+
+    def server_remaining(self, endpoint: str = "") -> Union[int, None]:
+        """Requests left in the API window of an endpoint, None if unknown."""
+        server = self.server.get(endpoint)
+        return server[0] if server is not None else None
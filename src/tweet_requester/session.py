@@ -1,12 +1,35 @@
 import json, logging
-from time import sleep
+import threading
+from contextlib import contextmanager
+from time import perf_counter
 import requests
 from .cache import Cache, Request
-from typing import Union, Tuple, List
+from . import jsonlib
+from .scheduler import Priority, RequestScheduler, endpoint_key
+from .metrics import METRICS
+from typing import Union, Tuple, List, Dict, Callable, TypeVar
 
+T = TypeVar("T")
 
+
+API_URL = "https://api.twitter.com"
 # Source https://developer.twitter.com/en/docs/twitter-api/tweets/lookup/api-reference/get-tweets-id
 TWEET_BY_ID_URL = "https://api.twitter.com/2/tweets/"
+OEMBED_URL = "https://publish.twitter.com/oembed"
+# Status code returned for requests missing from the cache in offline mode.
+OFFLINE_MISS_CODE = 444
+# Responses with these codes are transient or caused by the credentials (a bad
+# or expired token), so they are not kept in the error log.
+TRANSIENT_ERROR_CODES = [401, 403, 429, 500, 502, 503, 504]
+
+
+class OfflineCacheMiss(Exception):
+    """Raised when an offline TSess is asked for a request that is not cached."""
+
+    def __init__(self, base_url: str, params: dict):
+        self.base_url = base_url
+        self.params = params
+        super().__init__(f"Not available offline: {base_url} {params}")
 
 
 class BearerAuth(requests.auth.AuthBase):
@@ -22,6 +45,57 @@ class BearerAuth(requests.auth.AuthBase):
         return r
 
 
+class SingleFlight:
+    """Deduplicates concurrent calls that share a key. The first caller (leader)
+    runs the function while the others wait and receive the same result, so
+    identical requests made at the same time produce a single network call and
+    a single cache write.
+    """
+
+    class _Call:
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error: Union[BaseException, None] = None
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls: Dict[str, "SingleFlight._Call"] = {}
+
+    def do(self, key: str, function: Callable[[], T]) -> Tuple[T, bool]:
+        """Runs `function` unless a call with the same key is in flight.
+
+        Args:
+            key (str): Identifier of the call, usually the cache request hash.
+            function (Callable[[], T]): Function to run when leading the call.
+
+        Returns:
+            Tuple[T, bool]: Result of the call and True if it was shared from
+                another caller.
+        """
+        with self.lock:
+            call = self.calls.get(key, None)
+            leader = call is None
+            if leader:
+                call = SingleFlight._Call()
+                self.calls[key] = call
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+        try:
+            call.result = function()
+        except BaseException as err:
+            call.error = err
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+        return call.result, False
+
+
 class TSess():
     BASE_URL_11 = "https://api.twitter.com/1.1/statuses/lookup.json"
 
@@ -78,12 +152,64 @@ class TSess():
         compression_level: int = 3,
         sleep_time=1.0,
         hash_split=False,
+        api_url: str = API_URL,
+        oembed_url: str = OEMBED_URL,
+        offline: bool = False,
+        offline_raise: bool = True,
+        rate_limit: Union[int, None] = None,
+        rate_window: float = 900.0,
+        interactive_reserve: float = 0.1,
+        sidecar=None,
+        entity_index=None,
     ):
-        self.auth = BearerAuth(bearer_token)
+        """Twitter Session that manages requests, caching and known errors.
+
+        Args:
+            bearer_token (str): Twitter API bearer token, unused when offline.
+            cache_dir (str, optional): Directory of the response cache.
+            error_log (str, optional): JSON file with previous request errors.
+            sleep_time (float, optional): Minimum seconds between two API requests.
+            api_url (str, optional): Base URL of the Twitter API.
+            oembed_url (str, optional): URL of the oEmbed endpoint.
+            offline (bool, optional): Serve only from the cache and the error log, never
+                sleeping nor using the network. Defaults to False.
+            offline_raise (bool, optional): When offline raise OfflineCacheMiss on a miss.
+                If False misses return OFFLINE_MISS_CODE and are collected at
+                `self.offline_misses`. Defaults to True.
+            rate_limit (Union[int, None], optional): Requests allowed per rate window,
+                None relies only on `sleep_time` and the API headers. Defaults to None.
+            rate_window (float, optional): Rate window in seconds. Defaults to 900.0.
+            interactive_reserve (float, optional): Fraction of the rate window reserved
+                for Priority.INTERACTIVE requests, of `rate_limit` or else of the
+                x-rate-limit-limit each endpoint reports. Defaults to 0.1.
+            sidecar (Union[str, SidecarIndex, None], optional): Directory or SidecarIndex
+                where every stored tweet is also indexed as columns. Defaults to None.
+            entity_index (Union[str, EntityIndex, None], optional): Directory or EntityIndex
+                where the hashtags, mentions and URLs of every stored tweet are indexed.
+                Defaults to None.
+        """
+        self.OFFLINE = offline
+        self.OFFLINE_RAISE = offline_raise
+        self.offline_misses: List[Tuple[str, dict]] = []
+        # No HTTP client is prepared when working offline.
+        self.auth = None if offline else BearerAuth(bearer_token)
+        # Endpoints can be pointed to a local stand-in (see mockserver module).
+        self.API_URL = api_url.rstrip("/")
+        self.BASE_URL_11 = self.API_URL + "/1.1/statuses/lookup.json"
+        self.TWEET_BY_ID_URL = self.API_URL + "/2/tweets/"
+        self.TWEETS_URL = self.API_URL + "/2/tweets"
+        self.OEMBED_URL = oembed_url
         self.cache = Cache(cache_dir=cache_dir, soft_reload=False,
                            compression_level=compression_level, hash_split=hash_split)
         self.ERROR_LOG = error_log
         self.SLEEP_TIME = sleep_time
+        # Every API request is granted by the scheduler (see `TSess.priority`).
+        self.scheduler = RequestScheduler(
+            min_interval=sleep_time, rate_limit=rate_limit,
+            rate_window=rate_window, interactive_reserve=interactive_reserve)
+        self._local = threading.local()
+        # Guards ERROR_DICT and its file, concurrent requests may fail at once.
+        self.error_lock = threading.Lock()
         try:
             handler = open(self.ERROR_LOG, 'r')
             self.ERROR_DICT: dict = json.load(handler)
@@ -99,23 +225,52 @@ class TSess():
             'user.fields': ','.join(user_fields),
         }
         self.failed_ids = []
+        self.inflight = SingleFlight()
+        if type(sidecar) is str:
+            from .sidecar import SidecarIndex
+            sidecar = SidecarIndex(sidecar)
+        self.sidecar = sidecar
+        if type(entity_index) is str:
+            from .entityindex import EntityIndex
+            entity_index = EntityIndex(entity_index)
+        self.entity_index = entity_index
+        # Indexes fed with every stored tweet, see `_index`.
+        self.indexes = [index for index in (sidecar, entity_index) if index is not None]
 
     def load_tweet_batch(
         self, ids: List[str],
-        base_url="https://api.twitter.com/2/tweets"
-    ) -> Union[str, None]:
+        base_url: Union[str, None] = None,
+        decode: bool = False
+    ) -> Union[str, dict, None]:
         # https://api.twitter.com/2/tweets?ids=1228393702244134912,1227640996038684673,1199786642791452673&tweet.fields=created_at&expansions=author_id&user.fields=created_at
+        if base_url is None:
+            base_url = self.TWEETS_URL
         params = self.PARAMS.copy()
         params.update({"ids": ','.join(ids)})
         # URI = self.generate_URI(base_url, params)
         if self.cache.check(base_url, params=params):
-            return self.cache.get(base_url, params=params)
+            text = self.cache.get(base_url, params=params)
+            return jsonlib.loads(text) if decode else text
+        elif self.OFFLINE:
+            self._offline_miss(base_url, params)
         else:
-            response = requests.get(base_url, params=params, auth=self.auth)
-            if response.status_code == 200:
-                self.cache.store(base_url, response.text, params=params)
-                sleep(self.SLEEP_TIME)
-                return response.text
+            key = self.cache.uri_hash(base_url, params=params)
+            text, _ = self.inflight.do(
+                key, lambda: self._fetch_batch(base_url, params))
+            if text is not None:
+                return jsonlib.loads(text) if decode else text
+        return None
+
+    def _fetch_batch(self, base_url: str, params: dict) -> Union[str, None]:
+        """Helper for load_tweet_batch, run once per request hash (see SingleFlight)."""
+        if self.cache.available(Request(base_url, "GET", params)):
+            return self.cache.get(base_url, params=params)
+        response = self._get(base_url, params)
+        if response.status_code == 200:
+            self.cache.store(base_url, response.text, params=params)
+            if self.indexes:
+                self._index(response.text)
+            return response.text
         return None
 
     @staticmethod
@@ -157,50 +312,201 @@ class TSess():
 
     def load_request(
         self, base_url: str, params: dict,
-        is_tweet: bool = True, is_v2: bool = True
-    ) -> Tuple[str, int]:
+        is_tweet: bool = True, is_v2: bool = True, decode: bool = False
+    ) -> Tuple[Union[str, dict, list], int]:
+        """Loads a request from the cache or the API.
+
+        Args:
+            base_url (str): URL of the resource.
+            params (dict): Query parameters of the request.
+            is_tweet (bool, optional): Check the response for Twitter errors. Defaults to True.
+            is_v2 (bool, optional): Unwrap list responses while checking for errors. Defaults to True.
+            decode (bool, optional): Return the decoded JSON object instead of the
+                JSON text. Defaults to False.
+
+        Returns:
+            Tuple[Union[str, dict, list], int]: Response (text or decoded) and status code.
+        """
+        text, data, code = self._load_request(
+            base_url, params, is_tweet=is_tweet, is_v2=is_v2, decode=decode)
+        if decode:
+            return data, code
+        return text, code
+
+    def _load_request(
+        self, base_url: str, params: dict,
+        is_tweet: bool = True, is_v2: bool = True, decode: bool = False
+    ) -> Tuple[Union[str, None], Union[dict, list, str, None], int]:
+        """Helper for load_request. Each response is parsed at most once and
+        values just stored are returned directly instead of being read back
+        from the cache.
+
+        Returns:
+            Tuple[Union[str, None], Union[dict, list, str, None], int]:
+                JSON text, decoded object (only when needed) and status code.
+        """
         if self.cache.check(base_url, params=params):
             logging.debug("Value in Cache")
-        elif id in self.ERROR_DICT.keys():
+            text = self.cache.get(base_url, params=params)
+            data = jsonlib.loads(text) if decode else None
+            return text, data, 200
+        key = self.cache.uri_hash(base_url, params=params)
+        if key in self.ERROR_DICT.keys():
             logging.debug("Previous Error Found!")
-            return json.dumps(self.ERROR_DICT[id][2]), self.ERROR_DICT[id][1]
+            _, error_code, data = self.ERROR_DICT[key]
+            text = data if type(data) is str else json.dumps(data)
+            return text, data, error_code
+        elif self.OFFLINE:
+            return self._offline_miss(base_url, params)
         else:
             logging.debug("Need to request value")
-            sleep(self.SLEEP_TIME)
-            response = requests.get(base_url, params=params, auth=self.auth)
-            response.status_code
-            if response.status_code == 200:
-                data = response.text
-                sleep(0.0005)
-                r: List[dict] = json.loads(data)
-                if is_tweet and is_v2:
-                    if type(r) is list:
-                        assert len(r) > 0, "List is empty! Response was empty list."
-                        r = r[0]
-                sleep(0.0005)
-                if "errors" in r.keys() and "data" not in r.keys() and is_tweet:
-                    error: str = r["errors"][0]["title"]
-                    logging.debug(f"{id} - Twitter Error Returned: {error}")
-                    hash = self.cache.uri_hash(base_url, params=params)
-                    error_code = 440
-                    self.ERROR_DICT.update({id: (hash, error_code, r)})
-                    with open(self.ERROR_LOG, "w") as handler:
-                        json.dump(self.ERROR_DICT, handler, indent=2)
-                    return data, error_code  # Using code 440 for any Twitter API error code found
-                else:
-                    self.cache.store(uri=base_url, value=data,
-                                     params=params, method="GET")
+            (text, data, code), shared = self.inflight.do(
+                key, lambda: self._fetch_request(base_url, params, is_tweet, is_v2))
+            if shared and METRICS.enabled:
+                METRICS.inc("singleflight_shared_total")
+            if shared and decode and text is not None:
+                # Followers get their own copy so callers never share mutable data.
+                data = TSess._decode(text)
+            return text, data, code
+
+    def _fetch_request(
+        self, base_url: str, params: dict,
+        is_tweet: bool = True, is_v2: bool = True
+    ) -> Tuple[Union[str, None], Union[dict, list, str, None], int]:
+        """Helper for _load_request. Requests a value from the API and stores it.
+        Only one thread runs this method per request hash (see SingleFlight).
+        """
+        # Another caller may have stored the value before this call was started.
+        if self.cache.available(Request(base_url, "GET", params)):
+            text = self.cache.get(base_url, params=params)
+            return text, TSess._decode(text), 200
+        response = self._get(base_url, params)
+        if response.status_code == 200:
+            text = response.text
+            data = jsonlib.loads(text)
+            r: Union[List[dict], dict] = data
+            if is_tweet and is_v2:
+                if type(r) is list:
+                    assert len(r) > 0, "List is empty! Response was empty list."
+                    r = r[0]
+            if "errors" in r.keys() and "data" not in r.keys() and is_tweet:
+                error: str = r["errors"][0]["title"]
+                logging.debug(f"{base_url} - Twitter Error Returned: {error}")
+                error_code = 440
+                self.log_error(base_url, params, error_code, r)
+                return text, data, error_code  # Using code 440 for any Twitter API error code found
             else:
-                hash = self.cache.uri_hash(base_url, params=params)
-                error_code = response.status_code
-                self.ERROR_DICT.update({id: (hash, error_code, response.text)})
-                with open(self.ERROR_LOG, "w") as handler:
-                    json.dump(self.ERROR_DICT, handler, indent=2)
-                logging.debug(f"Could not load tweet: {response.reason}")
-                return response.text, response.status_code
-        return self.cache.get(base_url, params=params), 200
-
-    def load_tweet_11(self, id: str, v2: bool = True) -> Tuple[str, int]:
+                self.cache.store(uri=base_url, value=text,
+                                 params=params, method="GET")
+                if is_tweet and self.indexes:
+                    self._index(data)
+            return text, data, 200
+        else:
+            if response.status_code not in TRANSIENT_ERROR_CODES:
+                self.log_error(base_url, params, response.status_code, response.text)
+            logging.debug(f"Could not load tweet: {response.reason}")
+            return response.text, TSess._decode(response.text), response.status_code
+
+    @contextmanager
+    def priority(self, priority: Priority):
+        """Context manager that sets the priority of the requests made by the
+        current thread.
+
+        Example:
+            with session.priority(Priority.INTERACTIVE):
+                tweet = TweetInteractiveClassifier(tweet_id, session)
+
+        Args:
+            priority (Priority): Priority for requests inside the context.
+        """
+        previous = self.current_priority()
+        self._local.priority = priority
+        try:
+            yield self
+        finally:
+            self._local.priority = previous
+
+    def current_priority(self) -> Priority:
+        return getattr(self._local, "priority", Priority.NORMAL)
+
+    def _get(self, base_url: str, params: dict) -> requests.Response:
+        """Sends a GET request once the scheduler grants it."""
+        priority = self.current_priority()
+        endpoint = endpoint_key(base_url)
+        waited = self.scheduler.acquire(priority, endpoint)
+        if not METRICS.enabled:
+            response = requests.get(base_url, params=params, auth=self.auth)
+            self.scheduler.observe(response.headers, response.status_code, endpoint)
+            return response
+        METRICS.observe("rate_limit_wait_seconds", waited, priority=priority.name)
+        start = perf_counter()
+        response = requests.get(base_url, params=params, auth=self.auth)
+        METRICS.observe("http_request_seconds", perf_counter() - start)
+        METRICS.inc("http_responses_total", status=response.status_code)
+        METRICS.inc("http_response_bytes_total", len(response.content))
+        self.scheduler.observe(response.headers, response.status_code, endpoint)
+        return response
+
+    def log_error(
+        self, base_url: str, params: dict, error_code: int,
+        response: Union[dict, str], save: bool = True
+    ):
+        """Records a failed request in the error log, keyed by the request hash,
+        so it is not requested again.
+        """
+        hash = self.cache.uri_hash(base_url, params=params)
+        with self.error_lock:
+            self.ERROR_DICT.update({hash: (hash, error_code, response)})
+        if save:
+            self.save_errors()
+
+    def save_errors(self):
+        """Writes the error log to `self.ERROR_LOG`."""
+        with self.error_lock:
+            with open(self.ERROR_LOG, "w") as handler:
+                json.dump(self.ERROR_DICT, handler, indent=2)
+
+    def _offline_miss(
+        self, base_url: str, params: dict
+    ) -> Tuple[None, None, int]:
+        """Raises OfflineCacheMiss or records the miss at `self.offline_misses`."""
+        logging.debug(f"Not in cache (offline): {base_url}")
+        if METRICS.enabled:
+            METRICS.inc("offline_misses_total")
+        if self.OFFLINE_RAISE:
+            raise OfflineCacheMiss(base_url, params.copy())
+        self.offline_misses.append((base_url, params.copy()))
+        return None, None, OFFLINE_MISS_CODE
+
+    def _index(self, content: Union[dict, list, str]):
+        """Appends the tweets of a stored response, decoded or as JSON text, to
+        the sidecar and entity index. Indexing errors are logged and never fail
+        the request."""
+        from .batch import response_tweets
+        try:
+            if type(content) is str:
+                content = jsonlib.loads(content)
+            tweets = response_tweets(content)
+        except Exception as err:
+            logging.exception(f"Could not read the stored tweets to index: {err}")
+            return
+        for index in self.indexes:
+            try:
+                index.append(tweets)
+            except Exception as err:
+                logging.exception(f"Could not index stored tweets: {err}")
+
+    @staticmethod
+    def _decode(text: str) -> Union[dict, list, str]:
+        """Decodes JSON text, returning the text itself if it is not valid JSON."""
+        try:
+            return jsonlib.loads(text)
+        except ValueError:
+            return text
+
+    def load_tweet_11(
+        self, id: str, v2: bool = True, decode: bool = False
+    ) -> Tuple[Union[str, list, dict], int]:
         if type(id) is int:
             id = str(id)
         elif type(id) is str:
@@ -209,14 +515,13 @@ class TSess():
         else:
             raise Exception(
                 f"Invalid id type: {type(id)}. Only <class int> and <class str> are acceptable.")
-        if v2:
-            base_url, params = TSess.generate_URI_11(id, params=self.PARAMS)
-        else:
-            base_url, params = TSess.generate_URI_11(id, params={})
+        base_url, params = self.tweet_request_11(id, v2=v2)
 
-        return self.load_request(base_url=base_url, params=params)
+        return self.load_request(base_url=base_url, params=params, decode=decode)
 
-    def load_tweet_batch_11(self, ids: List[str], v2: bool = True) -> Tuple[str, int]:
+    def load_tweet_batch_11(
+        self, ids: List[str], v2: bool = True, decode: bool = False
+    ) -> Tuple[Union[str, list, dict], int]:
         for id in ids:
             try:
                 assert id.isnumeric(
@@ -224,15 +529,13 @@ class TSess():
             except:
                 raise Exception(
                     f"Invalid id type: {type(id)}. Only numeric <class str> are acceptable.")
-        if v2:
-            params = self.PARAMS
-        else:
-            params = {}
-        base_url, params = TSess.generate_batch_URI_11(ids, params=params)
+        base_url, params = self.batch_request_11(ids, v2=v2)
 
-        return self.load_request(base_url=base_url, params=params)
+        return self.load_request(base_url=base_url, params=params, decode=decode)
 
-    def load_tweet(self, id: str, base_url=TWEET_BY_ID_URL) -> Tuple[str, int]:
+    def load_tweet(
+        self, id: str, base_url: Union[str, None] = None, decode: bool = False
+    ) -> Tuple[Union[str, dict], int]:
         if type(id) is int:
             id = str(id)
         elif type(id) is str:
@@ -241,7 +544,136 @@ class TSess():
         else:
             raise Exception(
                 f"Invalid id type: {type(id)}. Only <class int> and <class str> are acceptable.")
-        url = base_url + id
-        headers = {}
+        url, params = self.tweet_request(id, base_url=base_url)
         logging.debug(f"Requesting tweet {id} with uri: '{url}'")
-        return self.load_request(base_url=url, params=self.PARAMS)
+        return self.load_request(base_url=url, params=params, decode=decode)
+
+    def tweet_request_11(self, id: str, v2: bool = True) -> Tuple[str, dict]:
+        """URL and parameters used by load_tweet_11, which identify its cache entry."""
+        params = self.PARAMS.copy() if v2 else {}
+        _, params = TSess.generate_URI_11(id, params=params)
+        return self.BASE_URL_11, params
+
+    def batch_request_11(self, ids: List[str], v2: bool = True) -> Tuple[str, dict]:
+        """URL and parameters used by load_tweet_batch_11."""
+        params = self.PARAMS.copy() if v2 else {}
+        _, params = TSess.generate_batch_URI_11(ids, params=params)
+        return self.BASE_URL_11, params
+
+    def tweet_request(self, id: str, base_url: Union[str, None] = None) -> Tuple[str, dict]:
+        """URL and parameters used by load_tweet, which identify its cache entry."""
+        if base_url is None:
+            base_url = self.TWEET_BY_ID_URL
+        return base_url + id, self.PARAMS
+
+    def hydrate_batch_11(self, ids: List[str], v2: bool = True) -> Tuple[List[str], List[str], int]:
+        """Requests up to 100 tweets with a single v1.1 lookup and caches every
+        tweet under the same entry `load_tweet_11` uses. The batch response itself
+        is not cached. Tweets missing from the response are recorded in the
+        error log with code 440.
+
+        Args:
+            ids (List[str]): Tweet IDs, at most 100.
+            v2 (bool, optional): Same meaning as in load_tweet_11. Defaults to True.
+
+        Returns:
+            Tuple[List[str], List[str], int]: Hydrated IDs, missing IDs and status code.
+        """
+        base_url, params = self.batch_request_11(ids, v2=v2)
+        if self.OFFLINE:
+            self._offline_miss(base_url, params)
+            return [], [], OFFLINE_MISS_CODE
+        response = self._get(base_url, params)
+        if response.status_code != 200:
+            logging.debug(f"Could not hydrate batch: {response.reason}")
+            return [], [], response.status_code
+        found = []
+        tweets: List[dict] = jsonlib.loads(response.text)
+        for tweet in tweets:
+            tweet_id = tweet["id_str"]
+            tweet_url, tweet_params = self.tweet_request_11(tweet_id, v2=v2)
+            self.cache.store(tweet_url, jsonlib.dumps([tweet]), params=tweet_params)
+            found.append(tweet_id)
+        if self.indexes:
+            self._index(tweets)
+        found_set = set(found)
+        missing = [tweet_id for tweet_id in ids if tweet_id not in found_set]
+        for tweet_id in missing:
+            tweet_url, tweet_params = self.tweet_request_11(tweet_id, v2=v2)
+            self.log_error(tweet_url, tweet_params, 440, {"errors": [
+                {"title": "Not Found Error", "value": tweet_id}]}, save=False)
+        if missing:
+            self.save_errors()
+        return found, missing, 200
+
+    def hydrate_batch(self, ids: List[str]) -> Tuple[List[str], List[str], int]:
+        """Requests up to 100 tweets with a single v2 lookup and caches every
+        tweet, with the includes it references, under the same entry `load_tweet`
+        uses. Tweets reported in `errors` are recorded in the error log with code 440.
+
+        Args:
+            ids (List[str]): Tweet IDs, at most 100.
+
+        Returns:
+            Tuple[List[str], List[str], int]: Hydrated IDs, missing IDs and status code.
+        """
+        base_url = self.TWEETS_URL
+        params = self.PARAMS.copy()
+        params.update({"ids": ','.join(ids)})
+        if self.OFFLINE:
+            self._offline_miss(base_url, params)
+            return [], [], OFFLINE_MISS_CODE
+        response = self._get(base_url, params)
+        if response.status_code != 200:
+            logging.debug(f"Could not hydrate batch: {response.reason}")
+            return [], [], response.status_code
+        page: dict = jsonlib.loads(response.text)
+        includes: dict = page.get("includes", {})
+        index = {
+            "users": {u["id"]: u for u in includes.get("users", [])},
+            "media": {m["media_key"]: m for m in includes.get("media", [])},
+            "places": {p["id"]: p for p in includes.get("places", [])},
+            "tweets": {t["id"]: t for t in includes.get("tweets", [])},
+        }
+        found = []
+        for tweet in page.get("data", []):
+            tweet_url, tweet_params = self.tweet_request(tweet["id"])
+            single = {"data": tweet, "includes": TSess._v2_includes(tweet, index)}
+            self.cache.store(tweet_url, jsonlib.dumps(single), params=tweet_params)
+            found.append(tweet["id"])
+        if self.indexes and found:
+            self._index(page)
+        found_set = set(found)
+        missing = []
+        for error in page.get("errors", []):
+            tweet_id = error.get("resource_id", error.get("value"))
+            if tweet_id in found_set or tweet_id not in ids:
+                continue
+            missing.append(tweet_id)
+            tweet_url, tweet_params = self.tweet_request(tweet_id)
+            self.log_error(tweet_url, tweet_params, 440, {"errors": [error]}, save=False)
+        if missing:
+            self.save_errors()
+        return found, missing, 200
+
+    @staticmethod
+    def _v2_includes(tweet: dict, index: Dict[str, Dict[str, dict]]) -> dict:
+        """Subset of a v2 page `includes` referenced by a single tweet."""
+        chain = [tweet] + [
+            index["tweets"][r["id"]] for r in tweet.get("referenced_tweets", [])
+            if r["id"] in index["tweets"]
+        ]
+        user_ids, media_keys, place_ids = [], [], []
+        for item in chain:
+            user_ids.append(item.get("author_id"))
+            user_ids.append(item.get("in_reply_to_user_id"))
+            user_ids += [m.get("id") for m in item.get("entities", {}).get("mentions", [])]
+            media_keys += item.get("attachments", {}).get("media_keys", [])
+            place_ids.append((item.get("geo") or {}).get("place_id"))
+        includes = {
+            "users": [index["users"][i] for i in dict.fromkeys(user_ids) if i in index["users"]],
+            "media": [index["media"][k] for k in dict.fromkeys(media_keys) if k in index["media"]],
+            "places": [index["places"][i] for i in dict.fromkeys(place_ids) if i in index["places"]],
+            "tweets": chain[1:],
+        }
+        return {key: value for key, value in includes.items() if value}
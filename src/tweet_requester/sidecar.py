@@ -0,0 +1,195 @@
+import json, logging
+import os
+import threading
+import numpy as np
+from typing import Union, List, Dict, Iterable
+from .batch import TweetBatch, iter_cached_tweets
+from .cache import Cache
+from .snowflake import TWITTER_EPOCH_MS
+
+"""
+Columnar sidecar of a tweet cache. Every column of `TweetBatch` is kept as a
+raw little endian file that only grows, so it can be appended to while
+`TSess` stores tweets and memory mapped for queries without decoding JSON.
+
+    session = TSess(token, sidecar="./.tweet_sidecar/")
+    ...
+    batch = session.sidecar.batch()
+    july = (batch["created_at"] >= np.datetime64("2019-07-01")) & (batch["created_at"] < np.datetime64("2019-08-01"))
+    top = batch.filter(july & ~batch["is_retweet"] & batch["has_media"]).sort_by("retweet_count")
+"""
+
+SIDECAR_VERSION = 1
+# Dtype of each stored column. created_at is kept as milliseconds since epoch.
+SIDECAR_COLUMNS: Dict[str, str] = {
+    "id": "<i8",
+    "user_id": "<i8",
+    "created_at": "<i8",
+    "lang": "<i2",
+    "retweet_count": "<i8",
+    "favorite_count": "<i8",
+    "quote_count": "<i8",
+    "is_retweet": "|b1",
+    "is_quote": "|b1",
+    "has_media": "|b1",
+    "retweeted_id": "<i8",
+    "quoted_id": "<i8",
+}
+
+
+class SidecarIndex:
+    def __init__(self, directory: str, localMedia: bool = True):
+        """Opens or creates a sidecar in `directory`.
+
+        Tweets are indexed once by ID, later copies of an indexed tweet are
+        ignored; `rebuild` refreshes every row from the cache.
+
+        Args:
+            directory (str): Directory of the column files.
+            localMedia (bool, optional): Same meaning as for TweetBatch. Defaults to True.
+        """
+        if not os.path.isdir(directory):
+            assert not os.path.isfile(directory), f"'{directory}' is a file not a directory!"
+            os.makedirs(directory)
+        self.directory = directory
+        self.localMedia = localMedia
+        self.lock = threading.Lock()
+        self.languages: List[str] = []
+        self._ids: Union[set, None] = None
+        meta_file = os.path.join(directory, "meta.json")
+        if os.path.isfile(meta_file):
+            with open(meta_file, "r") as handler:
+                meta = json.load(handler)
+            assert meta.get("version") == SIDECAR_VERSION, f"Unsupported sidecar version {meta.get('version')}."
+            self.languages = meta["languages"]
+        self._truncate(self.rows())
+
+    def column_file(self, name: str) -> str:
+        return os.path.join(self.directory, name + ".bin")
+
+    def rows(self) -> int:
+        """Rows present in every column file. An interrupted append can leave
+        some columns longer, those rows are ignored and later overwritten."""
+        rows = None
+        for name, dtype in SIDECAR_COLUMNS.items():
+            try:
+                size = os.path.getsize(self.column_file(name)) // np.dtype(dtype).itemsize
+            except OSError:
+                size = 0
+            rows = size if rows is None else min(rows, size)
+        return rows
+
+    def __len__(self) -> int:
+        return self.rows()
+
+    def _truncate(self, rows: int):
+        for name, dtype in SIDECAR_COLUMNS.items():
+            with open(self.column_file(name), "ab") as handler:
+                handler.truncate(rows * np.dtype(dtype).itemsize)
+
+    def _save_meta(self):
+        with open(os.path.join(self.directory, "meta.json"), "w") as handler:
+            json.dump({"version": SIDECAR_VERSION, "languages": self.languages}, handler)
+
+    def _column(self, name: str, rows: int) -> np.ndarray:
+        if rows == 0:
+            return np.zeros(0, dtype=SIDECAR_COLUMNS[name])
+        return np.memmap(self.column_file(name), dtype=SIDECAR_COLUMNS[name], mode="r", shape=(rows,))
+
+    def append(self, tweets: Iterable[dict]) -> int:
+        """Indexes tweets in the v1.1 shape that are not indexed yet.
+
+        Returns:
+            int: Rows added.
+        """
+        batch = TweetBatch.from_tweets(tweets, self.localMedia)
+        if len(batch) == 0:
+            return 0
+        with self.lock:
+            if self._ids is None:
+                self._ids = set(self._column("id", self.rows()).tolist())
+            keep = []
+            for row, tweet_id in enumerate(batch["id"].tolist()):
+                if tweet_id not in self._ids:
+                    self._ids.add(tweet_id)
+                    keep.append(row)
+            if not keep:
+                return 0
+            batch = batch[np.array(keep, dtype=np.int64)]
+            columns = batch.to_numpy()
+
+            # Batch language codes into sidecar language codes.
+            languages = len(self.languages)
+            mapping = np.full(len(batch.languages) + 1, -1, dtype=np.int16)
+            for code, lang in enumerate(batch.languages):
+                if lang not in self.languages:
+                    self.languages.append(lang)
+                mapping[code] = self.languages.index(lang)
+            columns["lang"] = mapping[columns["lang"]]
+
+            # Tweets without created_at use the time encoded in their ID.
+            created_at = columns["created_at"].astype("datetime64[ms]").astype(np.int64)
+            missing = np.isnat(columns["created_at"])
+            created_at[missing] = (columns["id"][missing] >> 22) + TWITTER_EPOCH_MS
+            columns["created_at"] = created_at
+
+            if len(self.languages) != languages or not os.path.isfile(os.path.join(self.directory, "meta.json")):
+                self._save_meta()
+            for name, dtype in SIDECAR_COLUMNS.items():
+                with open(self.column_file(name), "ab") as handler:
+                    handler.write(columns[name].astype(dtype).tobytes())
+            return len(keep)
+
+    def batch(self) -> TweetBatch:
+        """Every indexed row as a TweetBatch of memory mapped columns."""
+        rows = self.rows()
+        columns = {name: self._column(name, rows) for name in SIDECAR_COLUMNS}
+        columns["created_at"] = columns["created_at"].view("datetime64[ms]")
+        return TweetBatch(columns, list(self.languages))
+
+    def clear(self):
+        """Removes every row."""
+        with self.lock:
+            self._truncate(0)
+            self.languages = []
+            self._ids = set()
+            self._save_meta()
+
+    def rebuild(self, cache: Cache, chunk_size: int = 10000) -> int:
+        """Replaces the rows with every tweet stored in `cache`.
+
+        Returns:
+            int: Rows indexed.
+        """
+        self.clear()
+        rows, chunk = 0, []
+        for tweet in iter_cached_tweets(cache):
+            chunk.append(tweet)
+            if len(chunk) >= chunk_size:
+                rows += self.append(chunk)
+                chunk = []
+        rows += self.append(chunk)
+        logging.debug(f"Sidecar rebuilt with {rows} rows")
+        return rows
+
+    def to_arrow(self):
+        """Rows as a pyarrow Table (requires pyarrow)."""
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise ImportError("pyarrow is required for Arrow export: pip install pyarrow")
+        batch = self.batch()
+        arrays = {name: pa.array(np.asarray(batch[name])) for name in SIDECAR_COLUMNS if name != "lang"}
+        arrays["lang"] = pa.DictionaryArray.from_arrays(
+            pa.array(np.asarray(batch["lang"]), mask=np.asarray(batch["lang"]) < 0),
+            pa.array(self.languages, type=pa.string()))
+        return pa.table(arrays)
+
+    def write_arrow(self, filename: str):
+        """Writes the rows as an Arrow IPC file (requires pyarrow)."""
+        import pyarrow as pa
+
+        table = self.to_arrow()
+        with pa.OSFile(filename, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
@@ -0,0 +1,179 @@
+import os
+import numpy as np
+from datetime import datetime, timezone, timedelta
+from typing import Union, List, Dict, Iterable
+
+"""
+Creation time of tweets decoded from their IDs. Tweet IDs are snowflakes:
+the bits above the lowest 22 hold the milliseconds since the Twitter epoch,
+so ID files can be filtered, bucketed and ordered by time before (and
+without) hydrating them.
+
+    ids = read_id_file("ids.txt")
+    july = ids[time_mask(ids, "2019-07-13", "2019-07-25")]
+    bucket_id_file("ids.txt", "./by_day/", utc_offset_hours=-4)
+"""
+
+TWITTER_EPOCH_MS = 1288834974657
+# First snowflake tweet ID (2010-11-04), older IDs are sequential and carry no time.
+FIRST_SNOWFLAKE_ID = 29700859247125504
+TIMESTAMP_SHIFT = 22
+TimeValue = Union[datetime, float, int, str]
+
+
+def to_ms(when: TimeValue) -> int:
+    """Milliseconds since the Unix epoch of a datetime (naive values are UTC),
+    epoch seconds or an ISO 8601 string."""
+    if type(when) is str:
+        when = datetime.fromisoformat(when)
+    if isinstance(when, datetime):
+        if when.tzinfo is None:
+            when = when.replace(tzinfo=timezone.utc)
+        return int(round(when.timestamp() * 1000))
+    return int(round(float(when) * 1000))
+
+
+def snowflake_ms(tweet_id: Union[str, int]) -> Union[int, None]:
+    """Creation time of a tweet in milliseconds since the Unix epoch, None
+    for IDs older than snowflakes."""
+    tweet_id = int(tweet_id)
+    if tweet_id < FIRST_SNOWFLAKE_ID:
+        return None
+    return (tweet_id >> TIMESTAMP_SHIFT) + TWITTER_EPOCH_MS
+
+
+def snowflake_timestamp(tweet_id: Union[str, int]) -> Union[float, None]:
+    """Creation time of a tweet in seconds since the Unix epoch."""
+    ms = snowflake_ms(tweet_id)
+    return ms / 1000 if ms is not None else None
+
+
+def snowflake_datetime(tweet_id: Union[str, int]) -> Union[datetime, None]:
+    """Creation time of a tweet as a UTC datetime."""
+    ms = snowflake_ms(tweet_id)
+    if ms is None:
+        return None
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc)
+
+
+def local_datetime(tweet_id: Union[str, int], utc_offset_hours: float = 0) -> Union[datetime, None]:
+    """Creation time of a tweet in a fixed UTC offset."""
+    created = snowflake_datetime(tweet_id)
+    if created is None:
+        return None
+    return created.astimezone(timezone(timedelta(hours=utc_offset_hours)))
+
+
+def snowflake_id(when: TimeValue) -> int:
+    """Smallest tweet ID created at or after `when`. Comparing IDs against
+    it is equivalent to comparing creation times."""
+    return max(to_ms(when) - TWITTER_EPOCH_MS, 0) << TIMESTAMP_SHIFT
+
+
+def ids_array(ids: Iterable[Union[str, int]]) -> np.ndarray:
+    """Tweet IDs as an int64 array."""
+    if isinstance(ids, np.ndarray):
+        return ids.astype(np.int64, copy=False)
+    return np.fromiter((int(i) for i in ids), dtype=np.int64)
+
+
+def snowflake_ms_array(ids: Iterable[Union[str, int]]) -> np.ndarray:
+    """Vectorized `snowflake_ms`, -1 for IDs older than snowflakes."""
+    ids = ids_array(ids)
+    return np.where(ids >= FIRST_SNOWFLAKE_ID, (ids >> TIMESTAMP_SHIFT) + TWITTER_EPOCH_MS, -1)
+
+
+def snowflake_datetime64(ids: Iterable[Union[str, int]]) -> np.ndarray:
+    """Vectorized creation times as datetime64[ms] (UTC), NaT for IDs older than snowflakes."""
+    ms = snowflake_ms_array(ids)
+    times = ms.astype("datetime64[ms]")
+    times[ms < 0] = np.datetime64("NaT")
+    return times
+
+
+def time_mask(
+    ids: Iterable[Union[str, int]],
+    start: Union[TimeValue, None] = None, end: Union[TimeValue, None] = None
+) -> np.ndarray:
+    """Boolean mask of the IDs created in [start, end). IDs are compared
+    directly against `snowflake_id` bounds, nothing is decoded.
+
+    Args:
+        ids (Iterable[Union[str, int]]): Tweet IDs.
+        start (Union[TimeValue, None], optional): Inclusive start, None for no bound.
+        end (Union[TimeValue, None], optional): Exclusive end, None for no bound.
+    """
+    ids = ids_array(ids)
+    mask = ids >= FIRST_SNOWFLAKE_ID
+    if start is not None:
+        mask &= ids >= snowflake_id(start)
+    if end is not None:
+        mask &= ids < snowflake_id(end)
+    return mask
+
+
+def bucket_ids(
+    ids: Iterable[Union[str, int]], unit: str = "D", utc_offset_hours: float = 0
+) -> Dict[str, np.ndarray]:
+    """Groups IDs by creation day (or any datetime64 unit such as "h").
+
+    Args:
+        ids (Iterable[Union[str, int]]): Tweet IDs.
+        unit (str, optional): datetime64 unit of the buckets. Defaults to "D".
+        utc_offset_hours (float, optional): Offset of the local time used for
+            the bucket boundaries, e.g. -4 for Puerto Rico. Defaults to 0.
+
+    Returns:
+        Dict[str, np.ndarray]: IDs of each bucket, in time order, keyed by the
+            bucket start. IDs older than snowflakes are ignored.
+    """
+    ids = ids_array(ids)
+    ids = np.sort(ids[ids >= FIRST_SNOWFLAKE_ID])
+    local_ms = snowflake_ms_array(ids) + int(utc_offset_hours * 3600 * 1000)
+    buckets = local_ms.astype("datetime64[ms]").astype(f"datetime64[{unit}]")
+    keys, starts = np.unique(buckets, return_index=True)
+    groups = np.split(ids, starts[1:])
+    return {str(key): group for key, group in zip(keys, groups)}
+
+
+def time_shards(ids: Iterable[Union[str, int]], shards: int) -> List[np.ndarray]:
+    """Splits IDs into `shards` parts of similar size that each cover a
+    contiguous time range, oldest first."""
+    ids = np.sort(ids_array(ids))
+    return [shard for shard in np.array_split(ids, max(1, shards)) if len(shard) > 0]
+
+
+def read_id_file(filename: str) -> np.ndarray:
+    """Reads a file with one tweet ID per line, skipping blank or invalid lines."""
+    with open(filename, "r") as source:
+        return np.fromiter(
+            (int(line) for line in (raw.strip() for raw in source) if line.isnumeric()),
+            dtype=np.int64)
+
+
+def write_id_file(filename: str, ids: Iterable[Union[str, int]]):
+    with open(filename, "w") as target:
+        for tweet_id in ids_array(ids).tolist():
+            target.write(f"{tweet_id}\n")
+
+
+def bucket_id_file(
+    filename: str, directory: str, unit: str = "D", utc_offset_hours: float = 0,
+    start: Union[TimeValue, None] = None, end: Union[TimeValue, None] = None
+) -> Dict[str, int]:
+    """Splits an ID file into one file per time bucket, named
+    `<bucket>.txt` inside `directory`, optionally limited to [start, end).
+    Timestamps and bounds follow the same rules as `bucket_ids` and `time_mask`.
+
+    Returns:
+        Dict[str, int]: Number of IDs written per bucket.
+    """
+    ids = read_id_file(filename)
+    ids = ids[time_mask(ids, start, end)]
+    os.makedirs(directory, exist_ok=True)
+    counts = {}
+    for bucket, group in bucket_ids(ids, unit, utc_offset_hours).items():
+        write_id_file(os.path.join(directory, bucket.replace(":", "-") + ".txt"), group)
+        counts[bucket] = len(group)
+    return counts
+
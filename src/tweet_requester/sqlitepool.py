@@ -0,0 +1,163 @@
+import itertools, logging
+import sqlite3
+import threading
+from contextlib import contextmanager
+from queue import LifoQueue, Empty
+from typing import Union, Dict, Iterator
+from .metrics import METRICS
+
+"""
+Long lived SQLite connections. `SQLitePool` opens up to `size` connections
+to one database file, each configured once with `DEFAULT_PRAGMAS` (WAL
+journal, NORMAL synchronous, larger page cache and memory mapping) and a
+larger prepared statement cache, and lends them to threads:
+
+    pool = SQLitePool("tweets.db")
+    with pool.connection() as db:
+        with pool.transaction(db):
+            db.executemany("UPDATE tweet SET state = ? WHERE tweet_id = ?;", rows)
+"""
+
+DEFAULT_PRAGMAS: Dict[str, Union[str, int]] = {
+    "journal_mode": "WAL",
+    # Durable at checkpoints, no fsync per commit in WAL mode.
+    "synchronous": "NORMAL",
+    # Negative sizes are KiB: 64 MiB of page cache.
+    "cache_size": -65536,
+    "mmap_size": 256 * 1024 * 1024,
+    "temp_store": "MEMORY",
+    # REPLACE fires delete triggers, which keep the FTS tables in sync.
+    "recursive_triggers": "ON",
+}
+
+
+class SQLitePool:
+    def __init__(
+        self, filename: str, size: int = 4, timeout: float = 30.0,
+        pragmas: Union[Dict[str, Union[str, int]], None] = None,
+        cached_statements: int = 256
+    ):
+        """Thread safe pool of connections to `filename`, opened on demand.
+
+        Args:
+            filename (str): SQLite database file.
+            size (int, optional): Maximum open connections, `acquire` waits
+                when all of them are in use. Defaults to 4.
+            timeout (float, optional): Seconds a statement waits for a lock and
+                `acquire` waits for a connection. Defaults to 30.0.
+            pragmas (Union[Dict[str, Union[str, int]], None], optional): Pragmas set
+                on every new connection. Defaults to DEFAULT_PRAGMAS.
+            cached_statements (int, optional): Prepared statements kept per connection. Defaults to 256.
+        """
+        self.filename = filename
+        self.size = max(1, size)
+        self.timeout = timeout
+        self.pragmas = DEFAULT_PRAGMAS if pragmas is None else pragmas
+        self.cached_statements = cached_statements
+        self.lock = threading.Lock()
+        self.idle: LifoQueue = LifoQueue()
+        self.opened = 0
+        self.closed = False
+
+    def _open(self) -> sqlite3.Connection:
+        # Connections move between threads but are only used by one at a time.
+        db = sqlite3.connect(
+            self.filename, timeout=self.timeout, check_same_thread=False,
+            cached_statements=self.cached_statements)
+        try:
+            for name, value in self.pragmas.items():
+                db.execute(f"PRAGMA {name} = {value};")
+        except Exception:
+            db.close()
+            raise
+        if METRICS.enabled:
+            METRICS.inc("sqlite_connects_total")
+        return db
+
+    def acquire(self) -> sqlite3.Connection:
+        """Lends an idle connection, opening a new one while under `size`."""
+        assert not self.closed, "The pool is closed."
+        try:
+            return self.idle.get_nowait()
+        except Empty:
+            pass
+        with self.lock:
+            can_open = self.opened < self.size
+            if can_open:
+                self.opened += 1
+        if can_open:
+            try:
+                return self._open()
+            except Exception:
+                with self.lock:
+                    self.opened -= 1
+                raise
+        try:
+            return self.idle.get(timeout=self.timeout)
+        except Empty:
+            raise TimeoutError(f"No SQLite connection available after {self.timeout}s.")
+
+    def release(self, db: sqlite3.Connection):
+        """Returns a connection to the pool, rolling back any transaction left open."""
+        if db.in_transaction:
+            logging.warning("Connection released with an open transaction, rolling back.")
+            db.rollback()
+        if self.closed:
+            db.close()
+            with self.lock:
+                self.opened -= 1
+            return
+        self.idle.put(db)
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        db = self.acquire()
+        try:
+            yield db
+        finally:
+            self.release(db)
+
+    _savepoints = itertools.count()
+
+    @staticmethod
+    @contextmanager
+    def transaction(db: sqlite3.Connection, mode: str = "IMMEDIATE") -> Iterator[sqlite3.Connection]:
+        """Explicit transaction: committed when the block ends, rolled back on
+        an exception. IMMEDIATE takes the write lock at the start, so writers
+        wait on BEGIN instead of failing halfway.
+
+        Inside a transaction already open on the connection the block is a
+        savepoint instead: released when the block ends and rolled back on an
+        exception, the enclosing transaction is committed by its owner."""
+        if db.in_transaction:
+            name = f"pool_transaction_{next(SQLitePool._savepoints)}"
+            db.execute(f"SAVEPOINT {name};")
+            try:
+                yield db
+            except BaseException:
+                db.execute(f"ROLLBACK TO {name};")
+                db.execute(f"RELEASE {name};")
+                raise
+            else:
+                db.execute(f"RELEASE {name};")
+            return
+        db.execute(f"BEGIN {mode};")
+        try:
+            yield db
+        except BaseException:
+            db.rollback()
+            raise
+        else:
+            db.commit()
+
+    def close(self):
+        """Closes the idle connections, lent ones close when released."""
+        self.closed = True
+        while True:
+            try:
+                db = self.idle.get_nowait()
+            except Empty:
+                break
+            db.close()
+            with self.lock:
+                self.opened -= 1
@@ -0,0 +1,303 @@
+import json
+import os
+import re
+import sqlite3
+from datetime import datetime, timezone
+from typing import Union, List, Dict, Tuple, Iterable, Iterator, Any
+from .analysis import BaseTweetAnalyzer
+from .batch import V1_DATE_FORMAT
+from . import jsonlib
+
+"""
+Field extractors declared as templates (JSON or YAML) instead of
+hand-written accessors. Every output field lists one or more paths tried in
+order, an optional type and default; `TweetTemplate` compiles the whole
+template once into a single Python function, so extracting a row is a
+sequence of inlined dictionary lookups.
+
+    name: auto_detail
+    fields:
+      tweet_id: {path: [id_str, id], type: str}
+      user_id: {path: [user.id_str, user.id], type: str}
+      retweet_count: {path: retweet_count, type: int}
+      language: {path: lang, type: str, null_if: und}
+      hashtags: {path: "entities.hashtags[].text", type: json}
+
+Paths are dotted keys; an integer segment indexes a list and `[]` applies
+the rest of the path to every element, giving a list. A field may also be
+written as just a path or a list of paths. The first path found is used;
+with `skip_empty: true` paths giving an empty value (empty list or string,
+zero, False) are skipped as well.
+
+Types:
+    raw (default), str, int, float, bool (truthiness, empty lists are False),
+    exists (not None), json (JSON text), timestamp (v1.1 created_at as
+    epoch seconds) and lower.
+"""
+
+# Field names become generated code and SQL column names.
+FIELD_NAME_RE = re.compile(r"\w+")
+FIELD_TYPES = ["raw", "str", "int", "float", "bool", "exists", "json", "timestamp", "lower"]
+SQLITE_TYPES = {
+    "raw": "", "str": "TEXT", "int": "INTEGER", "float": "FLOAT", "bool": "INTEGER",
+    "exists": "INTEGER", "json": "TEXT", "timestamp": "FLOAT", "lower": "TEXT",
+}
+
+# Fields of `JsonLInteractiveClassifier.save_auto_details` that need no
+# lookups outside the tweet, also used by the benchmark.
+AUTO_DETAIL_TEMPLATE: dict = {
+    "name": "auto_detail",
+    "fields": {
+        "tweet_id": {"path": ["id_str", "id"], "type": "str"},
+        "isBasedOn": {"path": ["retweeted_status.id_str", "quoted_status.id_str"], "type": "str", "default": ""},
+        "user_id": {"path": ["user.id_str", "user.id"], "type": "str"},
+        # Media of the tweet or, as the classifier analyzes tweets with
+        # localMedia=False, of the retweeted or quoted tweet.
+        "has_media": {"path": [
+            "extended_entities.media", "entities.media",
+            "retweeted_status.extended_entities.media", "retweeted_status.entities.media",
+            "retweeted_status.quoted_status.extended_entities.media", "retweeted_status.quoted_status.entities.media",
+            "quoted_status.extended_entities.media", "quoted_status.entities.media",
+        ], "type": "bool", "skip_empty": True},
+        "language": {"path": "lang", "type": "str", "null_if": "und"},
+        "retweetCount": {"path": "retweet_count", "type": "int"},
+        "quoteCount": {"path": "quote_count", "type": "int"},
+        "favoriteCount": {"path": "favorite_count", "type": "int"},
+        "text": {"path": ["full_text", "text"], "type": "str", "default": ""},
+    },
+}
+
+
+CONFLICT_CLAUSES = ["REPLACE", "IGNORE", "ABORT", "FAIL", "ROLLBACK"]
+
+
+def _quote(identifier: str) -> str:
+    """SQL identifier in double quotes, with embedded quotes doubled."""
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def _to_int(value, default):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _to_float(value, default):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _to_timestamp(value, default):
+    if type(value) in (int, float):
+        return float(value)
+    try:
+        return datetime.strptime(value, V1_DATE_FORMAT).replace(tzinfo=timezone.utc).timestamp()
+    except (TypeError, ValueError):
+        return default
+
+
+def _to_json(value, default):
+    return json.dumps(value, ensure_ascii=False) if value is not None else default
+
+
+def parse_path(path: str) -> List[Union[str, int, None]]:
+    """Segments of a dotted path: keys, list indexes and None for `[]`."""
+    segments = []
+    for part in path.split("."):
+        fan_out = part.endswith("[]")
+        if fan_out:
+            part = part[:-2]
+        if part:
+            segments.append(int(part) if part.lstrip("-").isdigit() else part)
+        if fan_out:
+            segments.append(None)
+    return segments
+
+
+class _Compiler:
+    def __init__(self):
+        self.namespace: Dict[str, Any] = {
+            "_to_int": _to_int, "_to_float": _to_float,
+            "_to_timestamp": _to_timestamp, "_to_json": _to_json,
+        }
+        self.functions = 0
+
+    def constant(self, value) -> str:
+        name = f"_c{len(self.namespace)}"
+        self.namespace[name] = value
+        return name
+
+    def path(self, segments: List[Union[str, int, None]], source: str, indent: str) -> List[str]:
+        """Lines setting `v` to the value at `segments` of `source`, None if missing."""
+        lines = [f"{indent}v = {source}"]
+        for position, segment in enumerate(segments):
+            if segment is None:
+                # Fan out: the rest of the path is a function applied to each element.
+                self.functions += 1
+                name = f"_each{self.functions}"
+                body = [f"def {name}(x):"] + self.path(segments[position + 1:], "x", "    ") + ["    return v"]
+                exec("\n".join(body), self.namespace)
+                lines.append(f"{indent}v = [{name}(x) for x in v] if type(v) is list else None")
+                return lines
+            if type(segment) is int:
+                lines.append(
+                    f"{indent}v = v[{segment}] if type(v) is list and {-segment - 1 if segment < 0 else segment} < len(v) else None")
+            else:
+                lines.append(f"{indent}v = v.get({segment!r}) if type(v) is dict else None")
+        return lines
+
+    def field(self, name: str, spec: Union[str, list, dict], position: int) -> List[str]:
+        if type(spec) is not dict:
+            spec = {"path": spec}
+        paths = spec.get("path", name)
+        paths = [paths] if type(paths) is str else list(paths)
+        ftype = spec.get("type", "raw")
+        assert ftype in FIELD_TYPES, f"Field {name}: unknown type {ftype!r}, use one of {FIELD_TYPES}."
+        default = spec.get("default", False if ftype in ("bool", "exists") else None)
+        default_name = self.constant(default)
+
+        missing = "not v" if spec.get("skip_empty", False) else "v is None"
+
+        lines = [f"    # {name!r}"]
+        for index, path in enumerate(paths):
+            indent = "    " + "    " * index
+            if index > 0:
+                lines.append(f"{indent[:-4]}if {missing}:")
+            lines += self.path(parse_path(path), "d", indent)
+        if "null_if" in spec:
+            lines.append(f"    if v == {self.constant(spec['null_if'])}: v = None")
+
+        if ftype == "str":
+            lines.append(f"    v = {default_name} if v is None else v if type(v) is str else str(v)")
+        elif ftype == "lower":
+            lines.append(f"    v = {default_name} if v is None else str(v).lower()")
+        elif ftype == "int":
+            lines.append(f"    v = v if type(v) is int else {default_name} if v is None else _to_int(v, {default_name})")
+        elif ftype == "float":
+            lines.append(f"    v = {default_name} if v is None else _to_float(v, {default_name})")
+        elif ftype == "bool":
+            lines.append(f"    v = {default_name} if v is None else bool(v)")
+        elif ftype == "exists":
+            lines.append("    v = v is not None")
+        elif ftype == "json":
+            lines.append(f"    v = _to_json(v, {default_name})")
+        elif ftype == "timestamp":
+            lines.append(f"    v = {default_name} if v is None else _to_timestamp(v, {default_name})")
+        else:
+            lines.append(f"    if v is None: v = {default_name}")
+        lines.append(f"    f{position} = v")
+        return lines
+
+
+class TweetTemplate:
+    def __init__(self, template: dict):
+        """Compiles a template (see the module docstring) into `self.extract`,
+        a function from a tweet data dictionary to a tuple of field values.
+
+        Args:
+            template (dict): Template with a `fields` mapping and optional `name`.
+        """
+        self.template = template
+        self.name: str = template.get("name", "template")
+        fields: dict = template["fields"]
+        assert fields, "A template needs at least one field."
+        for name in fields:
+            if type(name) is not str or not FIELD_NAME_RE.fullmatch(name):
+                raise ValueError(f"Invalid field name {name!r}, use letters, digits and underscores.")
+        self.fields: List[str] = list(fields.keys())
+        self.types: List[str] = [
+            spec.get("type", "raw") if type(spec) is dict else "raw" for spec in fields.values()
+        ]
+        compiler = _Compiler()
+        lines = ["def extract(d):"]
+        for position, (name, spec) in enumerate(fields.items()):
+            lines += compiler.field(name, spec, position)
+        lines.append("    return (" + "".join(f"f{i}, " for i in range(len(self.fields))) + ")")
+        self.source = "\n".join(lines)
+        exec(compile(self.source, f"<template {self.name}>", "exec"), compiler.namespace)
+        self.extract = compiler.namespace["extract"]
+
+    @staticmethod
+    def load(filename: str) -> "TweetTemplate":
+        """Loads a template from a .json file or a .yaml/.yml file (requires PyYAML)."""
+        with open(filename, "r") as handler:
+            if os.path.splitext(filename)[1].lower() in (".yaml", ".yml"):
+                try:
+                    import yaml
+                except ImportError:
+                    raise ImportError("PyYAML is required for YAML templates: pip install pyyaml")
+                template = yaml.safe_load(handler)
+            else:
+                template = json.load(handler)
+        return TweetTemplate(template)
+
+    def __call__(self, tweet: Union[BaseTweetAnalyzer, dict, str, bytes]) -> tuple:
+        return self.extract(TweetTemplate._data(tweet))
+
+    @staticmethod
+    def _data(tweet: Union[BaseTweetAnalyzer, dict, str, bytes]) -> dict:
+        if type(tweet) is dict:
+            return tweet
+        if isinstance(tweet, BaseTweetAnalyzer):
+            return tweet.data
+        return jsonlib.loads(tweet)
+
+    def rows(self, tweets: Iterable[Union[BaseTweetAnalyzer, dict, str, bytes]]) -> Iterator[tuple]:
+        """Field tuples of a stream of tweets, in template field order."""
+        extract, data = self.extract, TweetTemplate._data
+        for tweet in tweets:
+            yield extract(tweet if type(tweet) is dict else data(tweet))
+
+    def dicts(self, tweets: Iterable[Union[BaseTweetAnalyzer, dict, str, bytes]]) -> Iterator[dict]:
+        fields = self.fields
+        for row in self.rows(tweets):
+            yield dict(zip(fields, row))
+
+    def to_dataframe(self, tweets: Iterable[Union[BaseTweetAnalyzer, dict, str, bytes]]):
+        """Rows as a pandas DataFrame with one column per field."""
+        import pandas as pd
+
+        return pd.DataFrame.from_records(list(self.rows(tweets)), columns=self.fields)
+
+    def create_table_sql(self, table: str, primary_key: Union[str, None] = None) -> str:
+        """CREATE TABLE statement with a column per field."""
+        columns = [f'"{name}" {SQLITE_TYPES[ftype]}'.rstrip() for name, ftype in zip(self.fields, self.types)]
+        if primary_key is not None:
+            assert primary_key in self.fields, f"Primary key {primary_key!r} is not a field."
+            columns.append(f'PRIMARY KEY("{primary_key}")')
+        return f'CREATE TABLE IF NOT EXISTS {_quote(table)} ({", ".join(columns)});'
+
+    def insert_sql(self, table: str, conflict: str = "REPLACE") -> str:
+        columns = ", ".join(f'"{name}"' for name in self.fields)
+        marks = ", ".join("?" for _ in self.fields)
+        assert conflict.upper() in CONFLICT_CLAUSES, f"conflict must be one of {CONFLICT_CLAUSES}."
+        return f'INSERT OR {conflict} INTO {_quote(table)} ({columns}) VALUES ({marks});'
+
+    def to_sqlite(
+        self, db: sqlite3.Connection, table: str,
+        tweets: Iterable[Union[BaseTweetAnalyzer, dict, str, bytes]],
+        conflict: str = "REPLACE", chunk_size: int = 5000
+    ) -> int:
+        """Inserts the rows into `table` (which must have the field columns)
+        with executemany in one transaction per chunk.
+
+        Returns:
+            int: Rows written.
+        """
+        sql = self.insert_sql(table, conflict)
+        written, chunk = 0, []
+        for row in self.rows(tweets):
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                with db:
+                    db.executemany(sql, chunk)
+                written += len(chunk)
+                chunk = []
+        if chunk:
+            with db:
+                db.executemany(sql, chunk)
+            written += len(chunk)
+        return written
@@ -0,0 +1,63 @@
+import sqlite3
+from datetime import datetime
+from typing import List, Iterable
+
+import pytest
+
+from tweet_requester.analysis import TweetAnalyzer
+from tweet_requester.display import JsonLInteractiveClassifier
+from tweet_requester.session import TSess
+
+
+def tweet_data(tweet_id: str, text: str = "", user_id: str = "10", media: Iterable[str] = ()) -> dict:
+    """Minimal tweet in the v1.1 shape."""
+    data = {
+        "id_str": tweet_id,
+        "created_at": "Sat Jul 20 13:43:08 +0000 2019",
+        "full_text": text,
+        "lang": "es",
+        "retweet_count": 1,
+        "favorite_count": 2,
+        "quote_count": 0,
+        "user": {"id_str": user_id, "screen_name": f"user{user_id}"},
+        "entities": {"hashtags": [], "user_mentions": [], "urls": []},
+    }
+    if media:
+        data["extended_entities"] = {"media": [
+            {"id_str": media_id, "type": "photo", "media_url_https": f"https://pbs.twimg.com/media/{media_id}.jpg"}
+            for media_id in media
+        ]}
+    return data
+
+
+def tweet(tweet_id: str, text: str = "", user_id: str = "10", media: Iterable[str] = ()) -> TweetAnalyzer:
+    return TweetAnalyzer(tweet_data(tweet_id, text, user_id, media), localMedia=False)
+
+
+def add_tweets(filename: str, tweet_ids: List[str], state: int = 0):
+    db = sqlite3.connect(filename)
+    with db:
+        db.executemany("INSERT INTO tweet (tweet_id, state) VALUES (?, ?);",
+                       [(tweet_id, state) for tweet_id in tweet_ids])
+    db.close()
+
+
+@pytest.fixture
+def session(tmp_path) -> TSess:
+    return TSess("", cache_dir=str(tmp_path / "cache"), error_log=str(tmp_path / "errors.json"), offline=True)
+
+
+@pytest.fixture
+def classifier_v04(tmp_path, session) -> JsonLInteractiveClassifier:
+    """Classifier on an empty database as `initialize` created it at version 0.4."""
+    filename = str(tmp_path / "tweets.db")
+    open(filename, "w").close()
+    classifier = JsonLInteractiveClassifier(
+        str(tmp_path / "ids.txt"), session, pre_initialized=True, sqlite_db=filename)
+    version = classifier.initialize_db_v4()
+    db = sqlite3.connect(filename)
+    with db:
+        db.execute("INSERT INTO db_update VALUES (?, ?, ?);", (version, "", datetime.now().timestamp()))
+    db.close()
+    yield classifier
+    classifier.close_pool()
@@ -0,0 +1,65 @@
+import sqlite3
+
+import pytest
+
+from conftest import tweet
+
+
+def fts_rows(filename: str, table: str) -> int:
+    db = sqlite3.connect(filename)
+    count = db.execute(f"SELECT count(*) FROM {table};").fetchone()[0]
+    db.close()
+    return count
+
+
+def found(classifier, query: str, table: str = "text"):
+    return [tweet_id for tweet_id, _, _ in classifier.search(query, table=table)]
+
+
+def test_search_saved_text(classifier_v04):
+    classifier_v04.save_auto_details_batch([tweet("1", "Gato negro"), tweet("2", "Perro blanco")])
+    assert found(classifier_v04, "gato") == ["1"]
+    assert found(classifier_v04, "gato perro") == []
+    assert sorted(tweet_id for tweet_id, _, _ in classifier_v04.search("gato perro", any_word=True)) == ["1", "2"]
+
+
+@pytest.mark.parametrize("pooled", [True, False])
+def test_insert_or_replace_keeps_fts_in_sync(classifier_v04, pooled):
+    classifier_v04.save_auto_details_batch([tweet("1", "gato negro")])
+    replace = """INSERT OR REPLACE INTO tweet_auto_detail (tweet_id, text, language)
+        VALUES ('1', 'perro blanco', 'es');"""
+    if pooled:
+        with classifier_v04.transaction() as cur:
+            cur.execute(replace)
+    else:
+        # A plain connection, without the recursive_triggers pragma of the pool.
+        db = sqlite3.connect(classifier_v04.sqlite_filename)
+        with db:
+            db.execute(replace)
+        db.close()
+    assert found(classifier_v04, "gato") == []
+    assert found(classifier_v04, "perro") == ["1"]
+    assert fts_rows(classifier_v04.sqlite_filename, "tweet_auto_detail_fts") == 1
+
+
+def test_replace_with_composite_key(classifier_v04):
+    db = sqlite3.connect(classifier_v04.sqlite_filename)
+    with db:
+        db.executemany(
+            "INSERT OR REPLACE INTO tweet_traduction (tweet_id, target_language_code, traduction) VALUES (?, ?, ?);",
+            [("1", "en", "black cat"), ("1", "fr", "chat noir"), ("1", "en", "white dog")])
+    db.close()
+    assert found(classifier_v04, "cat", "traduction") == []
+    assert found(classifier_v04, "dog", "traduction") == ["1"]
+    assert found(classifier_v04, "chat", "traduction") == ["1"]
+    assert fts_rows(classifier_v04.sqlite_filename, "tweet_traduction_fts") == 2
+
+
+def test_update_and_delete(classifier_v04):
+    classifier_v04.save_auto_details_batch([tweet("1", "gato negro"), tweet("2", "gato blanco")])
+    classifier_v04.save_auto_details_batch([tweet("1", "perro negro")])
+    assert found(classifier_v04, "gato") == ["2"]
+    with classifier_v04.transaction() as cur:
+        cur.execute("DELETE FROM tweet_auto_detail WHERE tweet_id = '2';")
+    assert found(classifier_v04, "gato") == []
+    assert fts_rows(classifier_v04.sqlite_filename, "tweet_auto_detail_fts") == 1
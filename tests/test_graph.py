@@ -0,0 +1,26 @@
+from tweet_requester.graph import TweetGraph
+
+
+def test_cascade_of_tree():
+    graph = TweetGraph()
+    graph.add_edge(2, 1)
+    graph.add_edge(3, 1, "quote")
+    graph.add_edge(4, 3)
+    assert graph.cascade(1) == ["2", "3", "4"]
+    assert (graph.cascade_size(1), graph.cascade_depth(1)) == (3, 2)
+    assert (graph.cascade(4), graph.cascade_size(4), graph.cascade_depth(4)) == ([], 0, 0)
+    assert (graph.depth(4), graph.root(4)) == (2, "1")
+
+
+def test_cascade_in_reference_cycle():
+    graph = TweetGraph()
+    graph.add_edge(1, 2, "quote")
+    graph.add_edge(2, 1)
+    graph.add_edge(3, 1)
+    graph.add_edge(5, 4)
+    for tweet_id in (1, 2, 3):
+        assert (graph.depth(tweet_id), graph.root(tweet_id)) == (-1, None)
+        assert graph.cascade(tweet_id) == []
+        assert graph.cascade_size(tweet_id) == 0
+        assert graph.cascade_depth(tweet_id) == -1
+    assert graph.cascade(4) == ["5"]
@@ -0,0 +1,42 @@
+from time import time
+
+import pytest
+
+from tweet_requester.planner import estimate_seconds, LOOKUP_RATE_LIMIT, LOOKUP_RATE_WINDOW
+from tweet_requester.scheduler import endpoint_key
+
+
+@pytest.fixture
+def lookup(session) -> str:
+    return endpoint_key(session.BASE_URL_11)
+
+
+def test_estimate_without_rate_limits(session):
+    # Spacing only while the calls fit in one documented window.
+    assert estimate_seconds(session, 10) == 10 * session.scheduler.min_interval
+    assert estimate_seconds(session, 0) == 0.0
+
+
+def test_estimate_documented_window(session):
+    share = LOOKUP_RATE_LIMIT - session.scheduler.reserve(LOOKUP_RATE_LIMIT)
+    calls = 2 * share + 5
+    assert estimate_seconds(session, calls) == pytest.approx(2 * LOOKUP_RATE_WINDOW + 5)
+
+
+def test_estimate_uses_observed_window(session, lookup):
+    reset = time() + 600
+    session.scheduler.observe({
+        "x-rate-limit-remaining": "30", "x-rate-limit-reset": str(reset), "x-rate-limit-limit": "100",
+    }, 200, lookup)
+    # 10 of the 30 remaining requests are reserved for interactive use.
+    assert estimate_seconds(session, 20) == pytest.approx(20.0)
+    # 20 now, then 90 per window after the reset.
+    assert estimate_seconds(session, 20 + 90 + 5) == pytest.approx(600 + LOOKUP_RATE_WINDOW + 5, abs=1)
+    # Other endpoints keep their own window.
+    assert estimate_seconds(session, 115, endpoint=endpoint_key(session.TWEETS_URL)) == pytest.approx(115.0)
+
+
+def test_estimate_local_rate_limit(session):
+    session.scheduler.rate_limit = 50
+    share = 50 - session.scheduler.reserve(50)
+    assert estimate_seconds(session, share + 1) == pytest.approx(session.scheduler.rate_window + 1)
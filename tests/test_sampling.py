@@ -0,0 +1,156 @@
+import random
+import sqlite3
+from collections import Counter
+from itertools import combinations
+from math import sqrt
+
+import pytest
+
+from tweet_requester.display import JsonLInteractiveClassifier, PROCESSING_STAGES, LAP_BITS
+from conftest import add_tweets
+
+UNPROCESSED = PROCESSING_STAGES.UNPROCESSED
+PREPROCESSED = PROCESSING_STAGES.PREPROCESSED
+
+
+def rows(filename: str, sql: str, params: tuple = ()) -> list:
+    db = sqlite3.connect(filename)
+    result = db.execute(sql, params).fetchall()
+    db.close()
+    return result
+
+
+def chi2_limit(df: int, z: float = 3.09) -> float:
+    """Upper 0.1% quantile of the chi-square distribution (Wilson-Hilferty)."""
+    return df * (1 - 2 / (9 * df) + z * sqrt(2 / (9 * df))) ** 3
+
+
+def chi2(counts: Counter, keys: list) -> float:
+    expected = sum(counts[key] for key in keys) / len(keys)
+    return sum((counts[key] - expected) ** 2 / expected for key in keys)
+
+
+def draw_statistics(sample, tweet_ids: list, n: int, refills: int):
+    """Chi-square statistics of the tweet counts and of the pairs drawn in the same refill."""
+    tweets, pairs = Counter(), Counter()
+    for _ in range(refills):
+        drawn = sample(n)
+        assert len(drawn) == n and len(set(drawn)) == n
+        tweets.update(drawn)
+        pairs.update(combinations(sorted(drawn), 2))
+    return chi2(tweets, tweet_ids), chi2(pairs, list(combinations(sorted(tweet_ids), 2)))
+
+
+@pytest.fixture
+def classifier_v05(classifier_v04):
+    classifier_v04.update_database_v04_v05()
+    return classifier_v04
+
+
+def test_update_database_v04_v05(classifier_v04):
+    filename = classifier_v04.sqlite_filename
+    add_tweets(filename, [str(i) for i in range(20)])
+    add_tweets(filename, [str(i) for i in range(20, 30)], PREPROCESSED.value)
+    assert "rand_key" not in classifier_v04.table_columns("tweet")
+
+    classifier_v04.update_database_v04_v05()
+    assert classifier_v04.get_database_version() == 0.5
+    assert "rand_key" in classifier_v04.table_columns("tweet")
+    keys = [key for (key,) in rows(filename, "SELECT rand_key FROM tweet;")]
+    assert len(keys) == 30 and all(0 <= key < 1 << LAP_BITS for key in keys)
+    assert ("tweet_state_rand_key",) in rows(filename, "SELECT name FROM sqlite_master WHERE type = 'index';")
+    assert rows(filename, "SELECT count(*) FROM tweet_auto_detail_fts;") == [(0,)]
+
+    # A second run does not apply.
+    classifier_v04.update_database_v04_v05()
+    assert rows(filename, "SELECT count(*) FROM db_update WHERE version = 0.5;") == [(1,)]
+
+
+def test_migrated_database_keys_new_tweets(classifier_v05):
+    filename = classifier_v05.sqlite_filename
+    add_tweets(filename, [str(i) for i in range(10)])
+    classifier_v05.sample_tweet_ids(4, [UNPROCESSED])
+    front = rows(filename, "SELECT min(rand_key) FROM tweet WHERE state = 0;")[0][0]
+
+    add_tweets(filename, ["new"])
+    classifier_v05.tweet_set_states(["0", "1"], PREPROCESSED)
+    db = sqlite3.connect(filename)
+    with db:
+        db.execute("INSERT OR REPLACE INTO tweet (tweet_id, state) VALUES ('5', 0);")
+    db.close()
+    for tweet_id, state in [("new", 0), ("0", 6), ("5", 0)]:
+        [(key,)] = rows(filename, "SELECT rand_key FROM tweet WHERE tweet_id = ?;", (tweet_id,))
+        if state == 0:
+            # Among the tweets not sampled yet in the current lap.
+            assert front <= key < 1 << LAP_BITS
+        else:
+            assert 0 <= key < 1 << LAP_BITS
+    assert rows(filename, "SELECT count(*) FROM tweet WHERE rand_key IS NULL;") == [(0,)]
+
+
+def test_initialize_creates_v05(tmp_path, session):
+    ids_file = tmp_path / "ids.txt"
+    ids_file.write_text("".join(f"{i}\n" for i in range(100, 150)))
+    classifier = JsonLInteractiveClassifier(str(ids_file), session, sqlite_db=str(tmp_path / "new.db"))
+    try:
+        assert classifier.get_database_version() == 0.5
+        assert rows(classifier.sqlite_filename, "SELECT count(*) FROM tweet WHERE rand_key IS NOT NULL;") == [(50,)]
+        assert len(set(classifier.sample_tweet_ids(10, [UNPROCESSED]))) == 10
+    finally:
+        classifier.close_pool()
+
+
+def test_sample_v04_falls_back(classifier_v04):
+    add_tweets(classifier_v04.sqlite_filename, [str(i) for i in range(10)])
+    sample = classifier_v04.sample_tweet_ids(4, [UNPROCESSED])
+    assert len(set(sample)) == 4
+    assert len(classifier_v04.sample_tweet_ids(20, [UNPROCESSED, PREPROCESSED])) == 10
+
+
+def test_laps_visit_every_tweet_once(classifier_v05):
+    tweet_ids = [str(i) for i in range(30)]
+    add_tweets(classifier_v05.sqlite_filename, tweet_ids)
+    laps = [classifier_v05.sample_tweet_ids(5, [UNPROCESSED]) for _ in range(12)]
+    first, second = sum(laps[:6], []), sum(laps[6:], [])
+    assert sorted(first) == sorted(tweet_ids) and sorted(second) == sorted(tweet_ids)
+    # Each lap is shuffled anew.
+    assert first != second
+
+
+def test_sample_uniformity_matches_order_by_random(classifier_v05):
+    """The tweets drawn and the pairs drawn together are as uniform as with
+    ORDER BY RANDOM(): both pass the same chi-square test."""
+    filename = classifier_v05.sqlite_filename
+    tweet_ids = [str(i) for i in range(24)]
+    add_tweets(filename, tweet_ids[:8])
+    add_tweets(filename, tweet_ids[8:], PREPROCESSED.value)
+    stages = [UNPROCESSED, PREPROCESSED]
+    n, refills = 3, 3000
+
+    def order_by_random(n: int) -> list:
+        return [tweet_id for (tweet_id,) in rows(
+            filename, "SELECT tweet_id FROM tweet WHERE state IN (0, 6) ORDER BY RANDOM() LIMIT ?;", (n,))]
+
+    tweets_df, pairs_df = len(tweet_ids) - 1, len(tweet_ids) * (len(tweet_ids) - 1) // 2 - 1
+    for sample in (order_by_random, lambda n: classifier_v05.sample_tweet_ids(n, stages)):
+        tweets_chi2, pairs_chi2 = draw_statistics(sample, tweet_ids, n, refills)
+        assert tweets_chi2 < chi2_limit(tweets_df)
+        assert pairs_chi2 < chi2_limit(pairs_df)
+
+
+def test_neighbour_samples_would_fail(classifier_v05):
+    """Control: samples of tweets that are neighbours in key order, as a
+    random pivot gives, fail the pair test used above."""
+    filename = classifier_v05.sqlite_filename
+    tweet_ids = [str(i) for i in range(24)]
+    add_tweets(filename, tweet_ids)
+    [(low,), (high,)] = rows(filename, "SELECT min(rand_key) FROM tweet UNION ALL SELECT max(rand_key) FROM tweet;")
+
+    def neighbours(n: int) -> list:
+        pivot = random.randint(low, high)
+        found = rows(filename, "SELECT tweet_id FROM tweet WHERE rand_key >= ? ORDER BY rand_key LIMIT ?;", (pivot, n))
+        return [tweet_id for (tweet_id,) in found] + [
+            tweet_id for (tweet_id,) in rows(filename, "SELECT tweet_id FROM tweet ORDER BY rand_key LIMIT ?;", (n - len(found),))]
+
+    _, pairs_chi2 = draw_statistics(neighbours, tweet_ids, 3, 3000)
+    assert pairs_chi2 > chi2_limit(len(tweet_ids) * (len(tweet_ids) - 1) // 2 - 1)
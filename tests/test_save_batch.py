@@ -0,0 +1,105 @@
+import sqlite3
+
+import pytest
+
+from tweet_requester import jsonlib
+from tweet_requester.display import PROCESSING_STAGES
+from conftest import add_tweets, tweet, tweet_data
+
+
+def reject_tweet(filename: str, tweet_id: str):
+    """Makes SQLite reject the tweet_auto_detail row of `tweet_id`."""
+    db = sqlite3.connect(filename)
+    with db:
+        db.execute(f"""CREATE TRIGGER reject_{tweet_id} BEFORE INSERT ON tweet_auto_detail
+            WHEN new.tweet_id = '{tweet_id}' BEGIN SELECT RAISE(ABORT, 'rejected'); END;""")
+    db.close()
+
+
+def rows(filename: str, sql: str) -> list:
+    db = sqlite3.connect(filename)
+    result = db.execute(sql).fetchall()
+    db.close()
+    return result
+
+
+def test_save_batch(classifier_v04):
+    report = classifier_v04.save_auto_details_batch([
+        tweet("1", "uno", user_id="10", media=["100"]),
+        tweet("2", "dos", user_id="10", media=["100", "200"]),
+    ])
+    assert (report.details, report.users, report.media, report.media_links) == (2, 1, 2, 3)
+    assert report.failed == [] and report.failed_tweets == set()
+    filename = classifier_v04.sqlite_filename
+    assert rows(filename, "SELECT tweet_id, text FROM tweet_auto_detail ORDER BY tweet_id;") == [("1", "uno"), ("2", "dos")]
+    assert rows(filename, "SELECT count(*) FROM tweet_match_media;") == [(3,)]
+
+
+def test_rejected_row_is_reported(classifier_v04):
+    reject_tweet(classifier_v04.sqlite_filename, "2")
+    report = classifier_v04.save_auto_details_batch([tweet("1"), tweet("2"), tweet("3")])
+    assert report.details == 2
+    assert [(tweet_id, table) for tweet_id, table, _ in report.failed] == [("2", "tweet_auto_detail")]
+    assert report.failed_tweets == {"2"}
+    assert rows(classifier_v04.sqlite_filename, "SELECT tweet_id FROM tweet_auto_detail ORDER BY tweet_id;") \
+        == [("1",), ("3",)]
+
+
+def test_unreadable_tweet_is_reported(classifier_v04):
+    broken = tweet("2")
+    broken.data["created_at"] = None
+    broken.id = "x"
+    report = classifier_v04.save_auto_details_batch([tweet("1"), broken])
+    assert report.details == 1
+    assert report.failed_tweets == {"x"}
+
+
+def test_save_auto_details_raises(classifier_v04):
+    reject_tweet(classifier_v04.sqlite_filename, "2")
+    classifier_v04.save_auto_details(tweet("1"), None)
+    with pytest.raises(RuntimeError):
+        classifier_v04.save_auto_details(tweet("2"), None)
+
+
+def test_preprocess_batch_keeps_failed_tweets_unprocessed(classifier_v04, session):
+    ids = ["1", "2", "3"]
+    for tweet_id in ids:
+        url, params = session.tweet_request_11(tweet_id)
+        session.cache.store(url, jsonlib.dumps([tweet_data(tweet_id, f"texto {tweet_id}")]), params=params)
+    filename = classifier_v04.sqlite_filename
+    add_tweets(filename, ids)
+    reject_tweet(filename, "2")
+    classifier_v04.preprocess_batch(n=3, batch_size=2)
+    assert dict(rows(filename, "SELECT tweet_id, state FROM tweet;")) == {
+        "1": PROCESSING_STAGES.PREPROCESSED.value,
+        "2": PROCESSING_STAGES.UNPROCESSED.value,
+        "3": PROCESSING_STAGES.PREPROCESSED.value,
+    }
+
+
+def test_interrupted_preprocess_batch_leaves_no_tweet_reviewing(classifier_v04, session, monkeypatch):
+    ids = [str(i) for i in range(1, 7)]
+    for tweet_id in ids:
+        url, params = session.tweet_request_11(tweet_id)
+        session.cache.store(url, jsonlib.dumps([tweet_data(tweet_id, f"texto {tweet_id}")]), params=params)
+    filename = classifier_v04.sqlite_filename
+    add_tweets(filename, ids)
+    reject_tweet(filename, "1")
+    has_user_details = classifier_v04.has_user_details
+    calls = []
+
+    def interrupt(tweet_id):
+        calls.append(tweet_id)
+        if len(calls) == 5:
+            raise KeyboardInterrupt
+        return has_user_details(tweet_id)
+
+    monkeypatch.setattr(classifier_v04, "has_user_details", interrupt)
+    with pytest.raises(KeyboardInterrupt):
+        classifier_v04.preprocess_batch(n=6, batch_size=2)
+    states = dict(rows(filename, "SELECT tweet_id, state FROM tweet;"))
+    assert PROCESSING_STAGES.REVIEWING.value not in states.values()
+    # The first two batches were written, the failed tweet and the rest go back.
+    flushed = set(calls[:4]) - {"1"}
+    assert {tweet_id for tweet_id, state in states.items()
+            if state == PROCESSING_STAGES.PREPROCESSED.value} == flushed
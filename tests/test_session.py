@@ -0,0 +1,15 @@
+class RecordingIndex:
+    def __init__(self):
+        self.appended = []
+
+    def append(self, tweets):
+        self.appended.append(tweets)
+
+
+def test_index_never_fails_on_undecodable_text(session):
+    index = RecordingIndex()
+    session.indexes = [index]
+    session._index("{not json")
+    assert index.appended == []
+    session._index('[{"id_str": "1", "full_text": "uno"}]')
+    assert len(index.appended) == 1
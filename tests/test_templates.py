@@ -0,0 +1,21 @@
+from tweet_requester.benchmark import analyzer_auto_detail
+from tweet_requester.mockserver import SyntheticTweets, synthetic_ids
+from tweet_requester.templates import TweetTemplate, AUTO_DETAIL_TEMPLATE
+from conftest import tweet_data
+
+
+def test_auto_detail_template_matches_stored_row():
+    synthetic = SyntheticTweets(seed=0)
+    tweets = [data for data in (synthetic.v1(tweet_id) for tweet_id in synthetic_ids(2000)) if data is not None]
+    template = TweetTemplate(AUTO_DETAIL_TEMPLATE)
+    assert [template.extract(data) for data in tweets] == [analyzer_auto_detail(data) for data in tweets]
+
+
+def test_has_media_of_retweeted_tweet():
+    template = TweetTemplate(AUTO_DETAIL_TEMPLATE)
+    has_media = template.fields.index("has_media")
+    retweet = tweet_data("1")
+    retweet["entities"]["media"] = []
+    retweet["retweeted_status"] = tweet_data("2", media=["100"])
+    assert template.extract(retweet)[has_media] is True
+    assert template.extract(tweet_data("3"))[has_media] is False